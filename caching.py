@@ -0,0 +1,71 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  A small in-process cache used wherever we keep results around.
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+	""" A thread-safe dictionary holding at most `max_size` items, dropping
+	the least recently used ones first.
+	Items older than `ttl` seconds are treated as missing, with a `ttl` of
+	None items stay until they are pushed out.
+	"""
+	
+	def __init__(self, max_size=1000, ttl=None):
+		self.max_size = max_size
+		self.ttl = ttl
+		self.hits = 0
+		self.misses = 0
+		self._items = OrderedDict()
+		self._lock = threading.Lock()
+	
+	def get(self, key, default=None):
+		""" Returns the item for the given key and marks it as recently used,
+		or returns `default` if there is no (valid) item. """
+		with self._lock:
+			item = self._items.pop(key, None)
+			if item is None or self._expired(item):
+				self.misses += 1
+				return default
+			
+			self._items[key] = item
+			self.hits += 1
+			return item[1]
+	
+	def set(self, key, value):
+		with self._lock:
+			self._items.pop(key, None)
+			self._items[key] = (time.time(), value)
+			
+			while len(self._items) > self.max_size:
+				self._items.popitem(last=False)
+	
+	def remove(self, key):
+		with self._lock:
+			self._items.pop(key, None)
+	
+	def clear(self):
+		with self._lock:
+			self._items.clear()
+	
+	def __len__(self):
+		return len(self._items)
+	
+	def _expired(self, item):
+		return self.ttl is not None and item[0] + self.ttl < time.time()
+	
+	def stats(self):
+		""" Returns a dictionary with size and hit/miss counts. """
+		lookups = self.hits + self.misses
+		return {
+			'size': len(self._items),
+			'max_size': self.max_size,
+			'ttl': self.ttl,
+			'hits': self.hits,
+			'misses': self.misses,
+			'hit_rate': float(self.hits) / lookups if lookups > 0 else None
+		}
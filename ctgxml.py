@@ -0,0 +1,91 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  Converting ClinicalTrials.gov study XML into the documents we keep in
+#  MongoDB.
+
+import json
+import hashlib
+from datetime import datetime
+from xml.etree import cElementTree as ET
+
+
+# elements that can appear more than once and always become lists
+REPEATABLE = set([
+	'secondary_id', 'nct_alias', 'collaborator', 'primary_outcome', 'secondary_outcome',
+	'other_outcome', 'condition', 'arm_group', 'intervention', 'arm_group_label', 'other_name',
+	'overall_official', 'location', 'investigator', 'country', 'link', 'reference',
+	'results_reference', 'keyword', 'mesh_term',
+])
+
+# parts of the document that change on every download
+VOLATILE = set(['required_header'])
+
+# the text our NLP pipelines analyze
+ANALYZED = [
+	('eligibility', 'criteria', 'textblock'),
+	('brief_summary', 'textblock'),
+	('detailed_description', 'textblock'),
+]
+
+
+def element_to_value(elem):
+	""" Elements without children become their stripped text, others a
+	dictionary of their children. Attributes are dropped. """
+	if len(elem) == 0:
+		return (elem.text or '').strip()
+	
+	value = {}
+	for child in elem:
+		child_value = element_to_value(child)
+		if child.tag in REPEATABLE:
+			value.setdefault(child.tag, []).append(child_value)
+		elif child.tag in value:
+			prev = value[child.tag]
+			value[child.tag] = prev + [child_value] if isinstance(prev, list) else [prev, child_value]
+		else:
+			value[child.tag] = child_value
+	return value
+
+
+def study_to_doc(study):
+	""" Returns the document for a <clinical_study> element or XML string,
+	with the NCT id as "_id". """
+	if not hasattr(study, 'tag'):
+		study = ET.fromstring(study)
+	
+	doc = element_to_value(study)
+	doc['_id'] = doc.get('id_info', {}).get('nct_id')
+	return doc
+
+
+def content_hash(doc):
+	""" A hash over everything but the volatile parts of a study document. """
+	stable = dict((k, v) for k, v in doc.iteritems() if k not in VOLATILE)
+	return hashlib.md5(json.dumps(stable, sort_keys=True)).hexdigest()
+
+
+def analyzed_text_hash(doc):
+	""" A hash over the texts we run NLP on. """
+	texts = []
+	for path in ANALYZED:
+		value = doc
+		for key in path:
+			value = value.get(key) if isinstance(value, dict) else None
+		texts.append(value or '')
+	return hashlib.md5(json.dumps(texts)).hexdigest()
+
+
+def last_changed(doc):
+	""" The "lastchanged_date" of a study as datetime, None if missing. """
+	return parse_date(doc.get('lastchanged_date'))
+
+
+def parse_date(date_str):
+	""" ClinicalTrials.gov writes dates like "June 5, 2014" or "June 2014". """
+	for fmt in ['%B %d, %Y', '%B %Y']:
+		try:
+			return datetime.strptime(date_str or '', fmt)
+		except ValueError:
+			pass
+	return None
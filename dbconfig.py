@@ -0,0 +1,43 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  Where our MongoDB lives, shared by the web app and the command line tools.
+#  Importing this module sets MNGObject.database_uri:
+#
+#    import dbconfig			# configures MNGObject.database_uri
+
+import os
+import json
+import logging
+
+from ClinicalTrials.mngobject import MNGObject
+
+
+def mongodb_uri():
+	""" Determine our MongoDB URI. """
+	
+	# Heroku/MongoHQ
+	if 'MONGOHQ_URL' in os.environ:
+		return os.environ['MONGOHQ_URL']
+	
+	# AppFog
+	services = json.loads(os.getenv("VCAP_SERVICES", "{}"))
+	if services and 'mongodb-1.8' in services:
+		try:
+			return services['mongodb-1.8'][0]['credentials']['url']
+		except Exception as e:
+			logging.error("Failed getting MongoDB credentials: %s" % e)
+	
+	# default
+	return "mongodb://localhost:27017"
+
+
+def database():
+	""" The MongoDB database at MNGObject.database_uri, "clinicaltrials" if
+	the URI does not name one. """
+	from pymongo import MongoClient, uri_parser
+	db_name = uri_parser.parse_uri(MNGObject.database_uri).get('database') or 'clinicaltrials'
+	return MongoClient(MNGObject.database_uri)[db_name]
+
+
+MNGObject.database_uri = mongodb_uri()
@@ -12,10 +12,17 @@ import logging
 from datetime import date
 
 from ClinicalTrials.runner import Runner
+from ClinicalTrials.ctakes import cTAKES
+from ClinicalTrials.metamap import MetaMap
+from nlpcache import CachedPipeline
+from nlppool import ParallelPipeline
 
 _use_recruiting = False
 _generate_report = True
 
+NLP_WORKERS = 4
+NLP_BATCH_SIZE = 50
+
 
 # main
 if __name__ == "__main__":
@@ -39,8 +46,11 @@ if __name__ == "__main__":
 	run_id = now.isoformat()
 	run_dir = "run-%s-%s" % (re.sub(r'[^\w\d\-]+', '_', term.lower()), run_id)
 	runner = Runner(run_id ,run_dir)
-	runner.run_ctakes = True
-	runner.run_metamap = True
+	
+	# cTAKES and MetaMap run on batches in parallel, text they have seen
+	# before is not run again
+	runner.add_pipeline(CachedPipeline(ParallelPipeline(lambda root: cTAKES({'root': root}), os.path.join(run_dir, 'ctakes'), NLP_WORKERS, NLP_BATCH_SIZE)))
+	runner.add_pipeline(CachedPipeline(ParallelPipeline(lambda root: MetaMap({'root': root}), os.path.join(run_dir, 'metamap'), NLP_WORKERS, NLP_BATCH_SIZE)))
 	runner.term = term
 	runner.log_status = True
 	runner.run()
@@ -3,6 +3,7 @@
 # environment variables
 # copy to "env.sh" and make executable if you change these!
 
+# debug logging, reloading and the /admin routes, set to 0 in production
 export DEBUG=1
 
 export USE_SMART=0
@@ -11,4 +12,17 @@ export USE_APP_ID="clinical-trials@apps.chip.org"
 
 export USE_NLP=0
 
+# push run progress to the browser, needs async workers (e.g. "gunicorn -k gevent")
+export USE_PROGRESS_STREAM=0
+
+# session storage: "file", "memory" (single worker only) or "mongodb" (multiple workers)
+export SESSION_TYPE=file
+
+# concurrently executing trial runs and how many more may wait for them, per server process
+export RUN_WORKERS=2
+export RUN_QUEUE_DEPTH=20
+
+# answer searches from the local trial index instead of ClinicalTrials.gov, see searchindex.py
+export USE_LOCAL_SEARCH=0
+
 export GOOGLE_API_KEY=
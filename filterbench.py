@@ -0,0 +1,104 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  Timing how the demographics filter loads a run's trials and builds its
+#  index: one query per trial with `Trial(nct).load()`, as before, versus the
+#  `Trial.retrieve(ncts)` the app now uses. Uses a synthetic run in a scratch
+#  database on the given server that is dropped afterwards.
+#
+#    $ python filterbench.py [num_trials] [mongodb_uri]
+
+import sys
+import time
+import random
+
+from pymongo import MongoClient, monitoring
+
+from ClinicalTrials.mngobject import MNGObject
+from ClinicalTrials.trial import Trial
+from runindex import DemographicsIndex
+
+
+BENCH_DB = 'filterbench'
+
+
+class QueryCounter(monitoring.CommandListener):
+	""" Counts the queries sent to the server, our round trips. """
+	
+	def __init__(self):
+		self.count = 0
+	
+	def started(self, event):
+		if event.command_name in ('find', 'getMore'):
+			self.count += 1
+	
+	def succeeded(self, event):
+		pass
+	
+	def failed(self, event):
+		pass
+
+
+def synthetic_trial(num, rnd):
+	return {
+		'_id': 'NCT%08d' % num,
+		'title': 'Synthetic trial %d' % num,
+		'eligibility': {
+			'gender': rnd.choice(['Both', 'Male', 'Female']),
+			'minimum_age': rnd.choice(['N/A', '18 Years', '30 Years', '65 Years']),
+			'maximum_age': rnd.choice(['N/A', '40 Years', '70 Years']),
+			'criteria': {'textblock': 'Inclusion Criteria: ' + ' '.join(['lorem'] * 400)},
+		},
+		'location': [{'facility': {'name': 'Site %d' % i}} for i in xrange(rnd.randint(1, 20))],
+	}
+
+
+def load_one_by_one(ncts):
+	trials = []
+	for nct in ncts:
+		trial = Trial(nct)
+		trial.load()
+		trials.append(trial)
+	return DemographicsIndex.from_trials(trials)
+
+
+def load_in_one_query(ncts):
+	return DemographicsIndex.from_trials(Trial.retrieve(ncts))
+
+
+def benchmark(num_trials, db_uri, repeat=3):
+	""" Points MNGObject at the scratch database, so `Trial` reads the
+	synthetic run. """
+	counter = QueryCounter()
+	monitoring.register(counter)
+	client = MongoClient(db_uri)
+	client.drop_database(BENCH_DB)
+	studies = client[BENCH_DB][Trial.collection_name]
+	rnd = random.Random(num_trials)
+	studies.insert_many([synthetic_trial(num, rnd) for num in xrange(num_trials)])
+	ncts = ['NCT%08d' % num for num in xrange(num_trials)]
+	MNGObject.database_uri = '%s/%s' % (db_uri.rstrip('/'), BENCH_DB)
+	print "%d trials at %s" % (num_trials, MNGObject.database_uri)
+	
+	def best_of(func):
+		times = []
+		for i in xrange(repeat):
+			counter.count = 0
+			start = time.time()
+			assert len(func(ncts)) == num_trials
+			times.append(time.time() - start)
+		return min(times), counter.count
+	
+	try:
+		single, single_queries = best_of(load_one_by_one)
+		print "Trial(nct).load():   %7.1f ms, %d queries" % (1000 * single, single_queries)
+		batch, batch_queries = best_of(load_in_one_query)
+		print "Trial.retrieve(ncts): %6.1f ms, %d queries, %.1fx" % (1000 * batch, batch_queries, single / max(batch, 0.000001))
+	finally:
+		client.drop_database(BENCH_DB)
+
+
+if '__main__' == __name__:
+	num_trials = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+	db_uri = sys.argv[2] if len(sys.argv) > 2 else 'mongodb://localhost:27017'
+	benchmark(num_trials, db_uri)
@@ -0,0 +1,249 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  Resolving the addresses of trial facilities to coordinates against a local
+#  gazetteer, the GeoNames postal code and city tables imported with
+#  `termimport.py geonames`, so no geocoding service is needed.
+#
+#  Trials are geocoded when they are ingested or synced, the coordinates are
+#  stored as the location's "geodata" in the cached trial. Locations that can
+#  not be placed get geodata without coordinates (UNPLACED) so they are not
+#  looked up again. To geocode the trials cached before the gazetteer was
+#  imported, or to try the unplaced locations again after importing a newer
+#  one:
+#
+#    $ python geocoder.py [retry]
+
+import os
+import re
+import sys
+import logging
+import sqlite3
+import threading
+import unicodedata
+
+from caching import LRUCache
+
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'databases', 'geonames.db')
+_MISSING = object()
+
+# the geodata of locations the gazetteer could not place
+UNPLACED = {'source': 'geonames', 'latitude': None}
+
+# country names used by ClinicalTrials.gov that differ from GeoNames'
+COUNTRY_ALIASES = {
+	'korea republic of': 'KR',
+	'korea democratic people s republic of': 'KP',
+	'russian federation': 'RU',
+	'iran islamic republic of': 'IR',
+	'taiwan': 'TW',
+	'czech republic': 'CZ',
+	'viet nam': 'VN',
+	'syrian arab republic': 'SY',
+	'libyan arab jamahiriya': 'LY',
+	'moldova republic of': 'MD',
+	'tanzania': 'TZ',
+	'macedonia the former yugoslav republic of': 'MK',
+	'congo the democratic republic of the': 'CD',
+	'cote d ivoire': 'CI',
+	'former serbia and montenegro': 'RS',
+	'lao people s democratic republic': 'LA',
+	'palestinian territory occupied': 'PS',
+}
+
+
+class Gazetteer(object):
+	""" Looks up postal codes and place names in the GeoNames database.
+	
+	Use `shared()` to get the instance of the process, which keeps the last
+	`cache_size` addresses, including unknown ones, in an LRU; many trials
+	share the same facilities and cities. Each thread uses its own read-only
+	connection.
+	"""
+	
+	_shared = None
+	_shared_lock = threading.Lock()
+	
+	@classmethod
+	def shared(cls):
+		with Gazetteer._shared_lock:
+			if Gazetteer._shared is None:
+				Gazetteer._shared = cls()
+			return Gazetteer._shared
+	
+	def __init__(self, db_path=None, cache_size=20000):
+		self.db_path = db_path or DB_PATH
+		self.cache = LRUCache(cache_size)
+		self._local = threading.local()
+	
+	def available(self):
+		return os.path.exists(self.db_path)
+	
+	def connection(self):
+		conn = getattr(self._local, 'conn', None)
+		if conn is None:
+			conn = sqlite3.connect(self.db_path)
+			conn.execute('PRAGMA query_only = ON')
+			self._local.conn = conn
+		return conn
+	
+	def locate(self, address):
+		""" Returns geodata for a facility address, a dictionary with "city",
+		"state", "zip" and "country", or None if it can not be placed. The
+		postal code is used if known, the city otherwise. """
+		address = address or {}
+		parts = [address.get(key) or '' for key in ['city', 'state', 'zip', 'country']]
+		key = tuple([place_key(part) for part in parts[:2]] + [parts[2].strip().upper(), place_key(parts[3])])
+		cached = self.cache.get(key, _MISSING)
+		if cached is not _MISSING:
+			return cached
+		
+		city, state, zip_code, country = key
+		geodata = None
+		code = self.country_code(country)
+		if code is not None:
+			latlng = (zip_code and self._by_postal_code(code, zip_code)) or (city and self._by_place(code, city, state))
+			if latlng:
+				formatted = ', '.join([part.strip() for part in [parts[0], parts[1], parts[3]] if part.strip()])
+				geodata = {
+					'latitude': latlng[0],
+					'longitude': latlng[1],
+					'formatted': formatted,
+					'precision': latlng[2],
+					'source': 'geonames',
+				}
+		
+		self.cache.set(key, geodata)
+		return geodata
+	
+	def country_code(self, country):
+		""" ISO code of a country given as name key, None if unknown. """
+		if not country:
+			return None
+		if country in COUNTRY_ALIASES:
+			return COUNTRY_ALIASES[country]
+		row = self.connection().execute('SELECT code FROM countries WHERE name_key = ?', (country,)).fetchone()
+		return row[0] if row else None
+	
+	def _by_postal_code(self, country, zip_code):
+		""" Postal codes are tried in full and shortened to the part GeoNames
+		has for some countries, like the first five digits of US ZIP+4 codes
+		and the outward code of British and Canadian ones. """
+		candidates = []
+		for candidate in [zip_code, re.split(r'[\s-]', zip_code)[0], zip_code[:5], zip_code[:3]]:
+			if candidate not in candidates:
+				candidates.append(candidate)
+		
+		conn = self.connection()
+		for candidate in candidates:
+			row = conn.execute('SELECT AVG(lat), AVG(lng) FROM postal_codes WHERE country = ? AND code = ?', (country, candidate)).fetchone()
+			if row and row[0] is not None:
+				return (row[0], row[1], 'postal_code')
+		return None
+	
+	def _by_place(self, country, city, state):
+		""" The most populous city of that name, preferring one in the given
+		state, then a place with postal codes of that name. """
+		conn = self.connection()
+		row = conn.execute('''SELECT places.lat, places.lng FROM places
+			LEFT JOIN admin1 ON admin1.country = places.country AND admin1.code = places.admin1_code
+			WHERE places.country = ? AND places.name_key = ?
+			ORDER BY admin1.name_key = ? DESC, places.population DESC LIMIT 1''', (country, city, state)).fetchone()
+		if row:
+			return (row[0], row[1], 'city')
+		
+		row = conn.execute('''SELECT AVG(lat), AVG(lng) FROM postal_codes
+			WHERE country = ? AND place_key = ? AND (? = '' OR admin1_key = ? OR admin1_key = '')''', (country, city, state, state)).fetchone()
+		if row and row[0] is not None:
+			return (row[0], row[1], 'city')
+		return None
+	
+	def stats(self):
+		return self.cache.stats()
+
+
+def place_key(name):
+	""" Lowercase ASCII words of a place name, so that "São Paulo" matches
+	"Sao Paulo" and "Saint Louis" matches "St. Louis". """
+	if not name:
+		return ''
+	if isinstance(name, str):
+		name = name.decode('utf-8', 'replace')
+	plain = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').lower()
+	words = re.findall(r'[a-z0-9]+', plain)
+	return ' '.join(['st' if 'saint' == word else ('ste' if 'sainte' == word else word) for word in words])
+
+
+def geocode_doc(doc, gazetteer=None, retry=False):
+	""" Adds "geodata" to the locations of a trial document that have none,
+	UNPLACED to those that can not be placed. With `retry` unplaced locations
+	are looked up again. Returns the number of locations that changed. """
+	gazetteer = gazetteer or Gazetteer.shared()
+	if not gazetteer.available():
+		return 0
+	
+	count = 0
+	for location in doc.get('location') or []:
+		if not isinstance(location, dict):
+			continue
+		geodata = location.get('geodata')
+		if geodata and (geodata.get('latitude') is not None or not retry):
+			continue
+		
+		facility = location.get('facility')
+		address = facility.get('address') if isinstance(facility, dict) else None
+		placed = gazetteer.locate(address) if isinstance(address, dict) else None
+		placed = dict(placed or UNPLACED)
+		if placed != geodata:
+			location['geodata'] = placed
+			count += 1
+	
+	return count
+
+
+def geocode_cached(studies, gazetteer=None, batch_size=1000, retry=False):
+	""" Geocodes the locations of all trials in the studies collection that
+	have not been geocoded yet, with `retry` also the unplaced ones. """
+	gazetteer = gazetteer or Gazetteer.shared()
+	bulk = studies.initialize_unordered_bulk_op()
+	pending = 0
+	trials = 0
+	locations = 0
+	
+	# a null query also matches locations without geodata
+	missing = {'geodata.latitude': None} if retry else {'geodata': {'$exists': False}}
+	for doc in studies.find({'location': {'$elemMatch': missing}}, {'location': 1}):
+		num = geocode_doc(doc, gazetteer, retry)
+		if num > 0:
+			bulk.find({'_id': doc['_id']}).update({'$set': {'location': doc['location']}})
+			pending += 1
+			trials += 1
+			locations += num
+		
+		if pending >= batch_size:
+			bulk.execute()
+			bulk = studies.initialize_unordered_bulk_op()
+			pending = 0
+			logging.info("Updated the geodata of %d locations of %d trials" % (locations, trials))
+	
+	if pending > 0:
+		bulk.execute()
+	logging.info("Updated the geodata of %d locations of %d trials" % (locations, trials))
+	return locations
+
+
+if '__main__' == __name__:
+	logging.basicConfig(level=logging.INFO)
+	
+	gazetteer = Gazetteer.shared()
+	retry = len(sys.argv) > 1 and 'retry' == sys.argv[1]
+	if (len(sys.argv) > 1 and not retry) or not gazetteer.available():
+		print 'Usage: geocoder.py [retry]  (import the gazetteer with `termimport.py geonames` first)'
+		sys.exit(1)
+	
+	import dbconfig			# configures MNGObject.database_uri
+	from trialsync import TrialSync
+	sync = TrialSync()
+	sync.connect()
+	geocode_cached(sync.studies, gazetteer, retry=retry)
@@ -15,4 +15,9 @@ heroku config:set --app=$app_id \
 	USE_SMART_05=$USE_SMART_05 \
 	USE_APP_ID=$USE_APP_ID \
 	USE_NLP=$USE_NLP \
+	USE_PROGRESS_STREAM=$USE_PROGRESS_STREAM \
+	SESSION_TYPE=$SESSION_TYPE \
+	RUN_WORKERS=$RUN_WORKERS \
+	RUN_QUEUE_DEPTH=$RUN_QUEUE_DEPTH \
+	USE_LOCAL_SEARCH=$USE_LOCAL_SEARCH \
 	GOOGLE_API_KEY=$GOOGLE_API_KEY
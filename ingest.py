@@ -0,0 +1,143 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  Seeding MongoDB from a ClinicalTrials.gov dump, the ZIP archive of one XML
+#  file per study that can be downloaded from ClinicalTrials.gov.
+#
+#    $ python ingest.py path/to/dump.zip [--workers N] [--batch N]
+#
+#  The archive is read in place, every worker opens it itself and parses its
+#  share of the studies incrementally, so memory use does not depend on the
+#  size of the archive. Studies are geocoded against the local gazetteer,
+#  written in bulk, added to the local search index and registered with the
+#  trial sync, so `trialsync.py sync` afterwards only fetches what changed
+#  since the dump.
+
+import sys
+import time
+import logging
+import zipfile
+from datetime import datetime
+from multiprocessing import Pool, cpu_count
+from xml.etree import cElementTree as ET
+
+from ctgxml import study_to_doc, last_changed
+from trialsync import sync_state, LAST_SYNC_ID
+from searchindex import TrialSearchIndex
+from geocoder import geocode_doc
+
+
+# per worker process
+_archive = None
+_studies = None
+_state = None
+_index = None
+
+
+def _collections(db_uri):
+	from pymongo import MongoClient, uri_parser
+	db_name = uri_parser.parse_uri(db_uri).get('database') or 'clinicaltrials'
+	db = MongoClient(db_uri)[db_name]
+	return db['studies'], db['trial_sync']
+
+
+def _init_worker(zip_path, db_uri):
+	global _archive, _studies, _state, _index
+	_archive = zipfile.ZipFile(zip_path)
+	_studies, _state = _collections(db_uri)
+	_index = TrialSearchIndex()
+
+
+def parse_study(handle):
+	""" Parses the study XML from a file-like object and returns its
+	document, None if it holds no study. """
+	for event, elem in ET.iterparse(handle):
+		if 'clinical_study' == elem.tag:
+			return study_to_doc(elem)
+	return None
+
+
+def _ingest_names(names):
+	""" Writes the studies in the given archive members, returns the number
+	of studies written and the newest last-changed date among them. """
+	synced = datetime.utcnow()
+	studies = _studies.initialize_unordered_bulk_op()
+	state = _state.initialize_unordered_bulk_op()
+	count = 0
+	newest = None
+	docs = []
+	
+	for name in names:
+		try:
+			with _archive.open(name) as handle:
+				doc = parse_study(handle)
+		except (SyntaxError, zipfile.BadZipfile) as e:
+			logging.warning("Failed to parse %s: %s" % (name, e))
+			continue
+		if doc is None or doc['_id'] is None:
+			continue
+		
+		state.find({'_id': doc['_id']}).upsert().replace_one(sync_state(doc, synced))
+		geocode_doc(doc)
+		docs.append(dict(doc))
+		nct = doc.pop('_id')
+		studies.find({'_id': nct}).upsert().update({'$set': doc})
+		count += 1
+		
+		changed = last_changed(doc)
+		if changed is not None and (newest is None or changed > newest):
+			newest = changed
+	
+	if count > 0:
+		studies.execute()
+		state.execute()
+		_index.add(docs)
+	return count, newest
+
+
+def ingest(zip_path, db_uri, workers=None, batch_size=500):
+	""" Ingests all studies of the archive at `zip_path` on `workers`
+	processes, writing `batch_size` studies per bulk write. """
+	with zipfile.ZipFile(zip_path) as archive:
+		names = [info.filename for info in archive.infolist() if info.filename.endswith('.xml')]
+	batches = [names[i:i + batch_size] for i in xrange(0, len(names), batch_size)]
+	logging.info("Ingesting %d studies in %d batches" % (len(names), len(batches)))
+	
+	start = time.time()
+	total = 0
+	newest = None
+	pool = Pool(workers or cpu_count(), _init_worker, (zip_path, db_uri))
+	try:
+		for count, batch_newest in pool.imap_unordered(_ingest_names, batches):
+			total += count
+			if batch_newest is not None and (newest is None or batch_newest > newest):
+				newest = batch_newest
+			logging.info("%d of %d studies, %d per second" % (total, len(names), total / max(time.time() - start, 0.001)))
+	finally:
+		pool.close()
+		pool.join()
+	
+	# the next sync only needs to look at trials changed after the dump
+	studies, state = _collections(db_uri)
+	if newest is not None and state.find_one({'_id': LAST_SYNC_ID}) is None:
+		state.save({'_id': LAST_SYNC_ID, 'date': newest})
+	TrialSearchIndex().mark_fresh()
+	
+	logging.info("Ingested %d studies in %.1f seconds" % (total, time.time() - start))
+	return total
+
+
+if '__main__' == __name__:
+	logging.basicConfig(level=logging.INFO)
+	
+	args = sys.argv[1:]
+	if 0 == len(args) or args[0].startswith('--'):
+		print 'Usage: ingest.py dump.zip [--workers N] [--batch N]'
+		sys.exit(1)
+	
+	def option(name, default):
+		return int(args[args.index(name) + 1]) if name in args else default
+	
+	import dbconfig			# configures MNGObject.database_uri
+	from ClinicalTrials.mngobject import MNGObject
+	ingest(args[0], MNGObject.database_uri, option('--workers', None), option('--batch', 500))
@@ -4,7 +4,6 @@
 
 var g_map = null;
 var g_geocoder = null;
-var g_clusterer = null;
 
 var g_pins = [];
 var g_highlighted_pin = null;
@@ -35,11 +34,10 @@ function _geo_initMap() {
 	};
 	g_map = new google.maps.Map($("#g_map").get(0), mapOptions);
 	
-	// init clusterer (REMEMBER we have MODIFIED MarkerClusterer 2.0.9!)
-	g_clusterer = new MarkerClusterer(g_map);
-	g_clusterer.onClick = function(clickedClusterIcon) { 
-		return _geo_multipleMarkersAtSameLocation(clickedClusterIcon.cluster_); 
-	};
+	// pins are clustered on the server for the zoom level and viewport, reload them whenever the map settles
+	google.maps.event.addListener(g_map, 'idle', function() {
+		updateTrialLocations();
+	});
 	
 	// markers
 	g_marker_green = new google.maps.MarkerImage("http://chart.apis.google.com/chart?chst=d_map_pin_letter&chld=%E2%80%A2|33CC22",
@@ -156,35 +154,44 @@ function geo_codeAddress(address, callback) {
 
 
 /**
- *  Adds the given pins to our map.
+ *  Replaces the pins on our map with markers for the given clusters, as returned by the server.
+ *  Single sites get a pin, larger clusters a circle with the number of sites. The click function receives the marker,
+ *  whose "cluster" is the cluster it shows.
  */
-function geo_addPins(pins, animated, click_func) {
-	if (!pins || 0 === pins.length) {
-		return;
-	}
+function geo_showPinClusters(clusters, click_func) {
+	geo_clearAllPins();
 	
-	// add all
-	var markers = [];
-	for (var i = 0; i < pins.length; i++) {
-		var pin = pins[i];
-		var marker = new google.maps.Marker({
-			position: new google.maps.LatLng(pin.lat, pin.lng),
-			trial: pin.trial,
-			location: pin.location,
-			title: pin.trial.title,
-			icon: pin.reason ? g_marker_red : g_marker_green,
-			animation: animated ? google.maps.Animation.DROP : null
-		});
-		markers.push(marker);
-		// g_pins.push(marker);			// let the cluster handle zooming for now
+	for (var i = 0; i < clusters.length; i++) {
+		var cluster = clusters[i];
+		var options = {
+			map: g_map,
+			position: new google.maps.LatLng(cluster.lat, cluster.lng),
+			title: cluster.trials + ' trial' + (1 == cluster.trials ? '' : 's') + ', ' + cluster.count + ' location' + (1 == cluster.count ? '' : 's')
+		};
+		if (1 == cluster.count) {
+			options.icon = g_marker_green;
+		}
+		else {
+			options.icon = {
+				path: google.maps.SymbolPath.CIRCLE,
+				scale: Math.min(30, 10 + 3 * Math.log(cluster.count)),
+				fillColor: '#33CC22',
+				fillOpacity: 0.8,
+				strokeColor: '#FFFFFF',
+				strokeWeight: 2
+			};
+			options.label = {text: String(cluster.count), color: '#FFFFFF', fontSize: '11px'};
+		}
 		
-		// add click handler
+		var marker = new google.maps.Marker(options);
+		marker.cluster = cluster;
 		if (click_func) {
-			google.maps.event.addListener(marker, "click", click_func);
+			google.maps.event.addListener(marker, 'click', function() {
+				click_func(this);
+			});
 		}
+		g_pins.push(marker);
 	}
-	
-	g_clusterer.addMarkers(markers);
 }
 
 /**
@@ -204,22 +211,6 @@ function geo_highlightPin(pin) {
 	g_highlighted_pin = pin;
 }
 
-/**
- *  Called when multiple pins are at the same location.
- *
- *  This is in our MODIFIED MarkerCluster class, as per:
- *  http://stackoverflow.com/questions/3548920/google-maps-api-v3-multiple-markers-on-exact-same-spot
- */
-function _geo_multipleMarkersAtSameLocation(cluster) {
-	if (cluster.getMarkers().length > 1) {
-		var markers = cluster.getMarkers();
-		showTrialsforPins(markers);
-		return false;
-	}
-	return true;
-}
-
-
 /**
  *  Unhighlight the currently highlighted pin, if any.
  */
@@ -314,10 +305,7 @@ function geo_clearAllPins() {
 		g_pins[i].setMap(null);
 	}
 	g_pins = [];
-	
-	if (g_clusterer) {
-		g_clusterer.clearMarkers();
-	}
+	g_highlighted_pin = null;
 }
 
 
@@ -368,13 +356,3 @@ function kmDistanceBetweenLocations(l1, l2) {
 function _geo_deg2rad(deg) {
 	return deg * (Math.PI / 180)
 }
-
-
-
-/**
- *  Enhancements to MarkerCluster (resolution to having multiple objects at the same location)
- */
-MarkerClusterer.prototype.onClick = function() { 
-    return true; 
-};
-
@@ -5,14 +5,6 @@
 
 var Trial = can.Construct({
 	
-	/**
-	 *  Geocode an array of trials.
-	 */
-	geocode: function(trials, to_location) {
-		for (var i = 0; i < trials.length; i++) {
-			trials[i].geocode(to_location);
-		}
-	}
 },
 {
 	reason: null,						// the reason why this trial is not suitable for the patient
@@ -20,8 +12,8 @@ var Trial = can.Construct({
 	trial_phases: null,
 	trial_locations: null,
 	did_add_pins: false,
-	last_loc_distances: null,
-	closest: null,
+	distance: null,						// km from the patient to the closest location, from the server
+	location_count: null,				// number of locations, the server may only send the closest ones
 	
 	init: function(json) {
 		for (var key in json) {
@@ -87,24 +79,7 @@ var Trial = can.Construct({
 			if ('location' in this && this.location) {
 				var locs = [];
 				for (var i = 0; i < this.location.length; i++) {
-					var loc = this.location[i];
-					var loc_parts = ('formatted' in loc.geodata && loc.geodata.formatted && loc.geodata.formatted.length > 0) ? loc.geodata.formatted.split(/,\s+/) : ["Unknown"];
-					var loc_country = loc_parts.pop();
-					var loc_stat_m_recr = loc.status ? loc.status.match(/recruiting/i) : null;
-					var loc_stat_m_not = loc.status ? loc.status.match(/not\s+[\w\s]*\s+recruiting/i) : null;
-					
-					var loc_dict = {
-						'trial': this,
-						'name': ('facility' in loc && loc.facility.name) ? loc.facility.name : '',
-						'city': (loc_parts.length > 0) ? loc_parts.join(', ') : '',
-						'country': loc_country,
-						'geodata': ('geodata' in loc ? loc.geodata : null),
-						'status': loc.status,
-						'status_color': loc_stat_m_not ? 'orange' : (loc_stat_m_recr ? 'green' : 'red'),
-						'contact': ('contact' in loc && loc.contact) ? loc.contact : null
-					}
-					
-					locs.push(new TrialLocation(loc_dict));
+					locs.push(this.makeLocation(this.location[i]));
 				}
 				
 				this.trial_locations = locs;
@@ -115,36 +90,47 @@ var Trial = can.Construct({
 	},
 	
 	/**
-	 *  Sorts the trial locations by distance to the given location object and returns an array with distance-location tuples.
+	 *  Creates the TrialLocation for one of the trial's "location" dictionaries.
 	 */
-	locationsByDistance: function(to_location) {
-		if (!to_location && null !== this.last_loc_distances) {
-			return this.last_loc_distances;
-		}
+	makeLocation: function(loc) {
+		var loc_parts = (loc.geodata && loc.geodata.formatted && loc.geodata.formatted.length > 0) ? loc.geodata.formatted.split(/,\s+/) : ["Unknown"];
+		var loc_country = loc_parts.pop();
+		var loc_stat_m_recr = loc.status ? loc.status.match(/recruiting/i) : null;
+		var loc_stat_m_not = loc.status ? loc.status.match(/not\s+[\w\s]*\s+recruiting/i) : null;
 		
-		var by_dist = [];
-		var locs = this.locations();
-		if (locs) {
-			for (var i = 0; i < locs.length; i++) {
-				var loc = locs[i];
-				by_dist.push([loc.kmDistanceTo(to_location), loc]);
-			}
-			
-			by_dist.sort(function(a, b) { return a[0] - b[0]; });
-			this.last_loc_distances = by_dist;
+		var loc_dict = {
+			'trial': this,
+			'name': ('facility' in loc && loc.facility.name) ? loc.facility.name : '',
+			'city': (loc_parts.length > 0) ? loc_parts.join(', ') : '',
+			'country': loc_country,
+			'geodata': ('geodata' in loc ? loc.geodata : null),
+			'distance': ('distance' in loc ? loc.distance : null),
+			'status': loc.status,
+			'status_color': loc_stat_m_not ? 'orange' : (loc_stat_m_recr ? 'green' : 'red'),
+			'contact': ('contact' in loc && loc.contact) ? loc.contact : null
 		}
-		return by_dist;
+		
+		return new TrialLocation(loc_dict);
 	},
 	
-	
 	/**
-	 *  Geocodes the trial
+	 *  Loads the locations the server did not send with the trial, closest first, and calls the callback once they have been added.
 	 */
-	geocode: function(to_location) {
-		var distances = this.locationsByDistance(to_location);
-		var closest = (distances && distances.length > 0) ? distances[0] : [99999,null];
-		
-		this.closest = closest[0];
+	loadMoreLocations: function(callback) {
+		var trial = this;
+		var have = this.location ? this.location.length : 0;
+		loadJSON(
+			'trial_runs/' + _run_id + '/trials/' + this.nct + '/sites?offset=' + have,
+			function(obj1, status, obj2) {
+				trial.location = (trial.location || []).concat(obj1['location'] || []);
+				trial.location_count = trial.location.length;
+				trial.trial_locations = null;
+				callback();
+			},
+			function(obj1, status, obj2) {
+				console.error('Failed to load locations of ' + trial.nct + ': ', obj2);
+			}
+		);
 	},
 	
 	
@@ -158,38 +144,48 @@ var Trial = can.Construct({
 	 */
 	showClosestLocations: function(to_location, elem, start, num, animated) {
 		var loc_elem = elem.find('.trial_locations');
-		var locs = this.locations();
-		// var locs = this.locationsByDistance(to_location);	// locations() are ordered on the server already
+		var locs = this.locations();		// ordered by distance on the server
+		var total = Math.max(this.location_count || 0, locs ? locs.length : 0);
 		
 		// add locations
 		if (locs && locs.length > 0) {
 			loc_elem.find('.show_more_locations').remove();
 			
 			// determine max number (if we're within 2 of the maximum we show all)
-			var max = Math.min(locs.length - start, num);
-			if (locs.length - start - max < 3) {
-				max = locs.length - start;
+			var max = Math.min(total - start, num);
+			if (total - start - max < 3) {
+				max = total - start;
 			}
 			max += start;
 			
+			// the server only sent the closest locations, get the others first
+			if (max > locs.length) {
+				var trial = this;
+				this.loadMoreLocations(function() {
+					trial.showClosestLocations(to_location, elem, start, num, animated);
+				});
+				return;
+			}
+			
 			// show desired ones
 			var i = start;
 			for (; i < max; i++) {
 				var loc = locs[i];
-				// var loc = locs[i][1];			// the list has tuples, distance and the location object, if we use "locationsByDistance"
-				loc.kmDistanceTo(to_location);
+				if (null === loc.distance) {
+					loc.kmDistanceTo(to_location);
+				}
 				var fragment = can.view('templates/trial_location.ejs', {'loc': loc});
 				loc_elem.append(fragment);
 			}
 			
 			// show link to show the next batch
-			if (i < locs.length) {
+			if (i < total) {
 				var trial = this;
 				var n_max = 10;
-				var next = (locs.length - i - n_max < 3) ? locs.length - i : n_max;
+				var next = (total - i - n_max < 3) ? total - i : n_max;
 				
 				var link = $('<a/>', {'href': 'javascript:void(0)'})
-				.text('Show ' + ((next < locs.length - i) ? 'next ' + next : ' all'))
+				.text('Show ' + ((next < total - i) ? 'next ' + next : ' all'))
 				.click(function(evt) {
 					if (trial) {
 						trial.showClosestLocations(to_location, elem, i, next, true);
@@ -200,7 +196,7 @@ var Trial = can.Construct({
 				});
 				
 				var div = $('<div/>').addClass('trial_location').addClass('show_more_locations');
-				var h3 = $('<h3/>').html('There are ' + (locs.length - i) + ' more locations<br />');
+				var h3 = $('<h3/>').html('There are ' + (total - i) + ' more locations<br />');
 				h3.append(link);
 				div.append(h3);
 				
@@ -228,32 +224,6 @@ var Trial = can.Construct({
 	showLocation: function(elem, location) {
 		var fragment = can.view('templates/trial_location.ejs', {'loc': location});
 		elem.find('.trial_locations').append(fragment);
-	},
-	
-	/**
-	 *  Get pins for all locations.
-	 */
-	locationPins: function() {
-		var locs = this.locations();
-		var pins = [];
-		
-		if (locs && locs.length > 0) {
-			
-			for (var i = 0; i < locs.length; i++) {
-				if ('geodata' in locs[i]) {
-					var loc = {
-						'lat': locs[i].geodata.latitude,
-						'lng': locs[i].geodata.longitude,
-						'location': locs[i],
-						'trial': this
-					};
-					
-					pins.push(loc);
-				}
-			}
-		}
-		
-		return pins;
 	}
 });
 
@@ -19,7 +19,7 @@ var TrialLocation = can.Construct({
 	
 	
 	kmDistanceTo: function(to_location) {
-		if (to_location && 'geodata' in this) {
+		if (to_location && this.geodata && null != this.geodata.latitude) {
 			this.distance = kmDistanceBetweenLocationsLatLng(to_location.lat(), to_location.lng(), this.geodata.latitude, this.geodata.longitude);
 		}
 		else if (to_location) {
@@ -4,15 +4,20 @@
 
 var _trialSearchInterval = null;
 var _trialSearchMustStop = false;
+var _trialStatusSource = null;
 
 var _trialBatchSize = 10;		// 25 might be too much for some computers
 var _trialNumExpected = 0;
 var _trialNumDone = 0;
 var _showGoodTrials = true;
 var _trialsPerPage = 50;
+var _sitesPerTrial = 10;		// the server sends the closest locations of each trial, the others are loaded on demand
 
 var _run_id = null;
-var _trial_locations= null;
+var _trialListQuery = null;		// the filter of the shown trials, map pins are loaded for the same
+var _trialsByNCT = {};
+var _pinLoad = 0;
+var _trialListLoad = 0;			// incremented for every new trial list, so late pages of old lists are ignored
 
 
 /**
@@ -34,10 +39,7 @@ function searchTrialsByCondition(prob_name, gender, age, remember_cond) {
 
 function cancelTrialSearch() {
 	_trialSearchMustStop = true;
-	if (_trialSearchInterval) {
-		window.clearInterval(_trialSearchInterval);
-		_trialSearchInterval = null;
-	}
+	_stopWatchingTrialStatus();
 	
 	showTrialStatus();
 	resetUI();
@@ -62,8 +64,10 @@ function resetShownTrials() {
 }
 
 function cleanMap() {
-	_trial_locations = null;
+	_trialListQuery = null;
+	_trialsByNCT = {};
 	geo_clearAllPins();
+	$('#g_map_toggle > span').text('');
 	$('#selected_trial').empty().hide();
 }
 
@@ -74,7 +78,7 @@ function cleanMap() {
  *  "term" takes precedence over "condition", only one is ever being used.
  */
 function _initTrialSearch(term, condition, gender, age, remember_input) {
-	if (_trialSearchInterval) {
+	if (_trialSearchInterval || _trialStatusSource) {
 		console.warn('Already searching');
 		return;
 	}
@@ -109,10 +113,7 @@ function _initTrialSearch(term, condition, gender, age, remember_input) {
 			}
 			if ('success' == status) {
 				_run_id = obj1;
-				if (_trialSearchInterval) {
-					window.clearInterval(_trialSearchInterval);
-				}
-				_trialSearchInterval = window.setInterval(function() { checkTrialStatus(); }, 1000);
+				_watchTrialStatus();
 			}
 			else {
 				showTrialStatus('Error searching for trials: ' + obj2);
@@ -122,6 +123,48 @@ function _initTrialSearch(term, condition, gender, age, remember_input) {
 }
 
 
+/**
+ *  Starts watching server side progress, via server-sent events if the server pushes progress and the browser supports it,
+ *  otherwise by polling every second.
+ */
+function _watchTrialStatus() {
+	_stopWatchingTrialStatus();
+	
+	if (_useProgressStream && window.EventSource) {
+		_trialStatusSource = new EventSource('trial_runs/' + _run_id + '/progress/stream');
+		_trialStatusSource.onmessage = function(evt) {
+			if (!_trialSearchMustStop) {
+				_trialStatusChanged(evt.data);
+			}
+		};
+		
+		// the server closes the stream when it's done; on real errors fall back to polling
+		_trialStatusSource.onerror = function(evt) {
+			if (_trialStatusSource && EventSource.CLOSED == _trialStatusSource.readyState) {
+				_stopWatchingTrialStatus();
+				if (!_trialSearchMustStop && _run_id) {
+					_trialSearchInterval = window.setInterval(function() { checkTrialStatus(); }, 1000);
+				}
+			}
+		};
+	}
+	else {
+		_trialSearchInterval = window.setInterval(function() { checkTrialStatus(); }, 1000);
+	}
+}
+
+function _stopWatchingTrialStatus() {
+	if (_trialStatusSource) {
+		_trialStatusSource.close();
+		_trialStatusSource = null;
+	}
+	if (_trialSearchInterval) {
+		window.clearInterval(_trialSearchInterval);
+		_trialSearchInterval = null;
+	}
+}
+
+
 /**
  *  This function is called at an interval, checking server side progress until the server signals "done".
  */
@@ -139,35 +182,39 @@ function checkTrialStatus() {
 		}
 		
 		if ('success' == status) {
-			
-			// the run is done, get results
-			if ('done' == obj1) {
-				window.clearInterval(_trialSearchInterval);
-				_trialSearchInterval = null;
-				
-				showTrialStatus('Filtering by demographics...');
-				_filterTrialsByDemographics(_run_id);
-			}
-			
-			// an error occurred
-			else {
-				if (obj1 && obj1.length > 5 && obj1.match(/^error/i)) {
-					window.clearInterval(_trialSearchInterval);
-					_trialSearchInterval = null;
-				}
-				
-				showTrialStatus(obj1);
-			}
+			_trialStatusChanged(obj1);
 		}
 		else {
 			console.error(obj1, status, obj2);
 			showTrialStatus('Error checking trial status: ' + obj2);
-			window.clearInterval(_trialSearchInterval);
-			_trialSearchInterval = null;
+			_stopWatchingTrialStatus();
 		}
 	});
 }
 
+/**
+ *  Handles a new status of the server side run, no matter whether it was pushed or polled.
+ */
+function _trialStatusChanged(run_status) {
+	
+	// the run is done, get results
+	if ('done' == run_status) {
+		_stopWatchingTrialStatus();
+		
+		showTrialStatus('Filtering by demographics...');
+		_filterTrialsByDemographics(_run_id);
+	}
+	
+	// an error occurred
+	else {
+		if (run_status && run_status.length > 5 && run_status.match(/^error/i)) {
+			_stopWatchingTrialStatus();
+		}
+		
+		showTrialStatus(run_status);
+	}
+}
+
 function _filterTrialsByDemographics(run_id) {
 	loadJSON(
 		'trial_runs/' + run_id + '/filter/demographics',
@@ -397,6 +444,7 @@ function updateShownHiddenTrials(from_types) {
 		showTrialStatus("I have lost track of our run, please search again");
 		return;
 	}
+	_trialListLoad++;
 	
 	// inactivate checkboxes
 	showNoTrialsHint('Loading…');
@@ -473,18 +521,53 @@ function updateShownHiddenTrials(from_types) {
 	var qry = qry_parts.join('&');
 	
 	// TODO: locally caching all trials (webSQL?) might be neat?
+	_trialListQuery = qry.replace(/(^|&)reload_phases=1/, '');
+	_loadTrialPage(qry, 0, [], _trialListLoad);
+}
+
+/**
+ *  Loads one page of trials, shows the first page right away and keeps loading the following pages in the background.
+ */
+function _loadTrialPage(qry, offset, trials, load_id) {
+	var page_qry = (0 == offset) ? qry : qry.replace(/(^|&)reload_phases=1/, '');
 	loadJSON(
-		'trial_runs/' + _run_id + '/trials?' + qry,
+		'trial_runs/' + _run_id + '/trials?' + page_qry + '&offset=' + offset + '&limit=' + _trialsPerPage + '&sites=' + _sitesPerTrial + '&fields=list',
 		function(obj1, status, obj2) {
-			hideNoTrialsHint();
-			_showTrials(obj1['trials'], 0);
-			if ('drug_phases' in obj1) {
-				_fillTrialPhases(obj1['drug_phases']);
+			if (load_id != _trialListLoad) {
+				return;
+			}
+			
+			var page = obj1['trials'] || [];
+			trials.push.apply(trials, page);
+			
+			// first page: show
+			if (0 == offset) {
+				hideNoTrialsHint();
+				_showTrials(trials, 0);
+				if ('drug_phases' in obj1) {
+					_fillTrialPhases(obj1['drug_phases']);
+				}
+				$('#trial_selectors').find('input[type="checkbox"]').prop('disabled', false);
+			}
+			
+			// later pages: remember the trials and update the "more" link
+			else {
+				_registerTrials(trials, trials.length - page.length);
+				var shown = $('#trial_list').children('li').not('#show_more_trials').length;
+				_showMoreTrialsLink(trials, shown);
+			}
+			
+			if (null !== obj1['next'] && undefined !== obj1['next']) {
+				_loadTrialPage(qry, obj1['next'], trials, load_id);
+			}
+			else {
+				window.setTimeout(geo_zoomToPins, 100);
 			}
-			$('#trial_selectors').find('input[type="checkbox"]').prop('disabled', false);
-			window.setTimeout(geo_zoomToPins, 100);
 		},
 		function(obj1, status, obj2) {
+			if (load_id != _trialListLoad) {
+				return;
+			}
 			showTrialStatus('Error loading trials: ' + obj2);
 			hideNoTrialsHint();
 			$('#trial_selectors').find('input[type="checkbox"]').prop('disabled', false);
@@ -530,44 +613,56 @@ function _showTrials(trials, start) {
 		// if it's less than 10% more, show them all
 		show_max = trials.length + start;
 	}
-	var has_more = false;
-	var map = $('#g_map');
-	if (!_trial_locations) {
-		_trial_locations = [];
-	}
-	
-	for (var i = start; i < trials.length; i++) {
-		var trial = new Trial(trials[i]);
-		_trial_locations.push.apply(_trial_locations, trial.locationPins());
+	for (var i = start; i < trials.length && i < show_max; i++) {
+		var trial = (trials[i] instanceof Trial) ? trials[i] : new Trial(trials[i]);
+		trials[i] = trial;
 		
 		// add the trial element to the list
-		if (i < show_max) {
-			var li = $('<li/>').append(can.view('templates/trial_item.ejs', {'trial': trial, 'active_keywords': active_keywords}));
-			trial_list.append(li);
-			trial.showClosestLocations(g_patient_location, li, 0, 3);
-		}
-		else {
-			has_more = true;
-		}
+		var li = $('<li/>').append(can.view('templates/trial_item.ejs', {'trial': trial, 'active_keywords': active_keywords}));
+		trial_list.append(li);
+		trial.showClosestLocations(g_patient_location, li, 0, 3);
 	}
 	
-	$('#g_map_toggle > span').text(_trial_locations.length > 1000 ? ' (' + _trial_locations.length + ' trial locations)' : '');
-	if ($('#g_map').is(':visible')) {
-		updateTrialLocations();
+	if (0 == start) {
+		_registerTrials(trials, 0);
+		if ($('#g_map').is(':visible')) {
+			updateTrialLocations();
+		}
 	}
 	hideNoTrialsHint();
 	
 	// are there more?
-	if (has_more) {
-		var more = trials.length - show_max;
+	_showMoreTrialsLink(trials, Math.min(trials.length, show_max));
+}
+
+/**
+ *  Keeps the trials from the given index on by NCT, so map pins can show them.
+ */
+function _registerTrials(trials, start) {
+	for (var i = start; i < trials.length; i++) {
+		if (!(trials[i] instanceof Trial)) {
+			trials[i] = new Trial(trials[i]);
+		}
+		_trialsByNCT[trials[i].nct] = trials[i];
+	}
+}
+
+/**
+ *  Shows (or updates) the link to show more trials if not all are shown.
+ */
+function _showMoreTrialsLink(trials, num_shown) {
+	$('#show_more_trials').remove();
+	
+	var more = trials.length - num_shown;
+	if (more > 0) {
 		var li = $('<li/>', {'id': 'show_more_trials'}).append('<h1>There are ' + more + ' more trials</h1>');
 		var link = $('<a/>', {'href': 'javascript:void(0);'}).text('Show ' + ((_trialsPerPage < more) ? _trialsPerPage + ' more' : 'all'))
 		.click(function(e) {
-			_showTrials(trials, start + _trialsPerPage);
+			_showTrials(trials, num_shown);
 		});
 		
 		li.append($('<h1/>').append(link));
-		trial_list.append(li);
+		$('#trial_list').append(li);
 	}
 }
 
@@ -607,27 +702,63 @@ function toggleTrialMap() {
 	}
 }
 
+/**
+ *  Loads the pins of the shown trials for the map's viewport, the server clusters them for the zoom level.
+ */
 function updateTrialLocations() {
-	if (!_trial_locations || 0 == _trial_locations.length) {
+	if (!g_map || !_run_id || !_trialListQuery || !g_map.getBounds()) {
 		return;
 	}
 	
-	geo_clearAllPins();
-	geo_addPins(_trial_locations, false, function(e) {
-		showTrialsforPins([this]);
-	});
-	geo_zoomToPins();
+	var pin_load = ++_pinLoad;
+	loadJSON(
+		'trial_runs/' + _run_id + '/pins?' + _trialListQuery + '&zoom=' + g_map.getZoom() + '&bbox=' + g_map.getBounds().toUrlValue(),
+		function(obj1, status, obj2) {
+			if (pin_load != _pinLoad) {
+				return;
+			}
+			
+			var total = obj1['total'] || 0;
+			$('#g_map_toggle > span').text(total > 1000 ? ' (' + total + ' trial locations)' : '');
+			geo_showPinClusters(obj1['clusters'] || [], _clickedPinCluster);
+		},
+		function(obj1, status, obj2) {
+			console.error('Failed to load map pins: ', obj2);
+		}
+	);
 }
 
-
 /**
- *  May be called with multiple pins (if they are all clustered).
+ *  Shows the trials of a cluster listing its sites, zooms into larger ones.
  */
-function showTrialsforPins(pins) {
-	if (1 == pins.length) {
-		geo_highlightPin(pins[0]);
+function _clickedPinCluster(marker) {
+	var cluster = marker.cluster;
+	if (!cluster.sites) {
+		var b = cluster.bounds;
+		g_map.fitBounds(new google.maps.LatLngBounds(new google.maps.LatLng(b[0], b[1]), new google.maps.LatLng(b[2], b[3])));
+		return;
+	}
+	
+	var pins = [];
+	for (var i = 0; i < cluster.sites.length; i++) {
+		var trial = _trialsByNCT[cluster.sites[i].nct];
+		if (trial) {
+			pins.push({'trial': trial, 'location': trial.makeLocation(cluster.sites[i].location)});
+		}
+		else {
+			console.warn('Trial ' + cluster.sites[i].nct + ' has not been loaded yet');
+		}
 	}
 	
+	geo_highlightPin(marker);
+	showTrialsforPins(pins);
+}
+
+
+/**
+ *  Shows the trials of the given pins, objects with the "trial" and its "location".
+ */
+function showTrialsforPins(pins) {
 	var map_offset = $('#g_map').offset().top - $(window).scrollTop();
 	var area = $('#selected_trial').empty().show();
 	
@@ -0,0 +1,141 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  Shared, cached code lookups against the SNOMED CT and UMLS databases.
+
+import os
+import re
+import sqlite3
+import threading
+
+from caching import LRUCache
+
+
+DB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'databases')
+
+
+class CodeLookup(object):
+	""" Resolves codes to lists of (name, source, semantic type) tuples, the
+	same shape UMLSLookup.lookup_code() returns.
+	
+	Use `shared()` to get the instance of the process, which keeps the last
+	`cache_size` codes, including unknown ones, in an LRU. Each thread uses
+	its own read-only connection.
+	"""
+	
+	db_name = None
+	max_params = 500			# SQLite allows 999 parameters per statement
+	_instances = {}
+	_instances_lock = threading.Lock()
+	
+	@classmethod
+	def shared(cls):
+		with CodeLookup._instances_lock:
+			instance = CodeLookup._instances.get(cls)
+			if instance is None:
+				instance = cls()
+				CodeLookup._instances[cls] = instance
+			return instance
+	
+	def __init__(self, db_path=None, cache_size=10000):
+		self.db_path = db_path or os.path.join(DB_DIR, self.db_name)
+		self.cache = LRUCache(cache_size)
+		self._local = threading.local()
+	
+	def connection(self):
+		conn = getattr(self._local, 'conn', None)
+		if conn is None:
+			if not os.path.exists(self.db_path):		# connect() would create an empty one
+				raise IOError('The code database "%s" does not exist, see README.md' % self.db_path)
+			conn = sqlite3.connect(self.db_path)
+			conn.execute('PRAGMA query_only = ON')
+			self._local.conn = conn
+		return conn
+	
+	def lookup_code(self, code):
+		return self.lookup_codes([code]).get(code, [])
+	
+	def lookup_codes(self, codes):
+		""" Returns a dictionary with the list of (name, source, semantic type)
+		tuples for every given code, querying the database once for all codes
+		not in the cache. """
+		found = {}
+		missing = []
+		for code in set(codes):
+			cached = self.cache.get(code)
+			if cached is None:
+				missing.append(code)
+			else:
+				found[code] = cached
+		
+		for i in xrange(0, len(missing), self.max_params):
+			chunk = missing[i:i + self.max_params]
+			results = dict((code, []) for code in chunk)
+			for code, tpl in self._query(chunk):
+				results.setdefault(code, []).append(tpl)
+			
+			for code, lst in results.iteritems():
+				self.cache.set(code, lst)
+				found[code] = lst
+		
+		return found
+	
+	def _query(self, codes):
+		""" Yields (code, (name, source, semantic type)) for the given codes
+		with a single query. """
+		raise NotImplementedError()
+	
+	def stats(self):
+		return self.cache.stats()
+
+
+class SNOMEDCodes(CodeLookup):
+	""" Active descriptions of SNOMED concepts, fully specified names first.
+	The semantic type is the tag at the end of the fully specified name, e.g.
+	"disorder" for "Diabetes mellitus (disorder)".
+	"""
+	
+	db_name = 'snomed.db'
+	
+	def _query(self, codes):
+		concept_ids = [int(c) for c in codes if str(c).isdigit()]
+		if 0 == len(concept_ids):
+			return
+		
+		sql = '''SELECT concept_id, term, isa FROM descriptions
+			WHERE concept_id IN (%s) AND active = 1
+			ORDER BY concept_id, isa = 'full' DESC''' % ', '.join(['?'] * len(concept_ids))
+		
+		tags = {}
+		rows = self.connection().execute(sql, concept_ids).fetchall()
+		for concept_id, term, isa in rows:
+			if 'full' == isa:
+				match = re.search(r'\(([^\)]+)\)\s*$', term)
+				tags[concept_id] = match.group(1) if match else None
+		
+		for concept_id, term, isa in rows:
+			yield str(concept_id), (term, 'SNOMEDCT', tags.get(concept_id))
+	
+	def lookup_code_meaning(self, code):
+		""" The preferred name of the concept, an empty string if the code is
+		unknown. """
+		return self.lookup_code_meanings([code]).get(code, '')
+	
+	def lookup_code_meanings(self, codes):
+		""" Preferred names for all given codes, unknown codes are left out. """
+		return dict((code, lst[0][0]) for code, lst in self.lookup_codes(codes).iteritems() if len(lst) > 0)
+
+
+class UMLSCodes(CodeLookup):
+	""" Descriptions of UMLS CUIs from our preferred sources, queried the way
+	UMLSLookup.lookup_code() does. """
+	
+	db_name = 'umls.db'
+	preferred_sources = ['SNOMEDCT', 'MTH']
+	
+	def _query(self, codes):
+		sql = '''SELECT cui, str, sab, sty FROM descriptions
+			WHERE cui IN (%s) AND sab IN (%s)''' % (', '.join(['?'] * len(codes)), ', '.join(['?'] * len(self.preferred_sources)))
+		
+		for cui, name, source, sty in self.connection().execute(sql, list(codes) + self.preferred_sources):
+			yield cui, (name, source, sty)
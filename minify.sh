@@ -0,0 +1,9 @@
+#!/bin/bash
+#
+#  Rebuilds static/main.min.js from the sources in js/, run after changing
+#  them. Needs rjsmin ("pip install rjsmin").
+
+cd "$(dirname "$0")"
+
+cat js/main.js js/smart-utilities.js js/geocode.js js/problems.js js/trial_location.js js/trial.js js/trials.js \
+	| python -m rjsmin > static/main.min.js
@@ -0,0 +1,149 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  Caching the output of NLP pipelines by the text they were given.
+
+import os
+import hashlib
+import logging
+import threading
+import cPickle as pickle
+
+
+class CachedPipeline(object):
+	""" Wraps an NLP pipeline (cTAKES, MetaMap, NLTKTags) and can be added to
+	a Runner in its place.
+	
+	Parsed output is stored on disk under a hash of the pipeline's name, its
+	`version` and the input text, unless it is empty. Cached output is read
+	when the input is written, input found in the cache is not written for
+	the pipeline, so `run()` only processes new text and does not start the
+	pipeline at all if there is none. An entry that can not be read counts as
+	a miss and its text is run. Change `version` when the pipeline or its
+	configuration changes to stop using older output.
+	The least recently used entries are removed once there are more than
+	`max_entries`.
+	"""
+	
+	def __init__(self, pipeline, version='1', cache_dir='nlp_cache', max_entries=100000):
+		self.pipeline = pipeline
+		self.version = version
+		self.cache_dir = cache_dir
+		self.max_entries = max_entries
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self._keys = {}				# input filename -> (cache key, cached output or None)
+		self._num_entries = None
+		self._lock = threading.Lock()
+	
+	def __getattr__(self, name):
+		return getattr(self.pipeline, name)
+	
+	def key(self, text):
+		data = '%s|%s|%s' % (self.pipeline.name, self.version, text.encode('utf-8') if isinstance(text, unicode) else text)
+		return hashlib.sha1(data).hexdigest()
+	
+	def _path(self, key):
+		return os.path.join(self.cache_dir, key[:2], '%s.pickle' % key)
+	
+	def write_input(self, text, filename):
+		key = self.key(text)
+		cached = self._load(key)
+		with self._lock:
+			self._keys[filename] = (key, cached)
+			if cached is not None:
+				self.hits += 1
+			else:
+				self.misses += 1
+		
+		if cached is not None:
+			return True
+		return self.pipeline.write_input(text, filename)
+	
+	def _load(self, key):
+		""" The cached output for the key, marked as recently used, or None. """
+		path = self._path(key)
+		if not os.path.exists(path):
+			return None
+		try:
+			with open(path, 'rb') as handle:
+				result = pickle.load(handle)
+			os.utime(path, None)
+			return result
+		except (IOError, OSError, EOFError, pickle.UnpicklingError) as e:
+			logging.warning("Failed to read NLP cache entry %s: %s" % (path, e))
+		return None
+	
+	def run(self):
+		""" Runs the pipeline if any input was not found in the cache. """
+		with self._lock:
+			pending = len([1 for key, cached in self._keys.itervalues() if cached is None])
+		if 0 == pending:
+			logging.debug("%s: all input found in the NLP cache, not running" % self.pipeline.name)
+			return True
+		return self.pipeline.run()
+	
+	def parse_output(self, filename, *args, **kwargs):
+		with self._lock:
+			key, cached = self._keys.pop(filename, (None, None))
+		if cached is not None:
+			return cached
+		
+		# failed runs give None or nothing, try those again next time
+		result = self.pipeline.parse_output(filename, *args, **kwargs)
+		if key is not None and result:
+			self._store(key, result)
+		return result
+	
+	def _store(self, key, result):
+		path = self._path(key)
+		if not os.path.exists(os.path.dirname(path)):
+			try:
+				os.makedirs(os.path.dirname(path))
+			except OSError:
+				pass			# created by another thread
+		
+		tmp_path = '%s.%d.tmp' % (path, threading.current_thread().ident)
+		with open(tmp_path, 'wb') as handle:
+			pickle.dump(result, handle, pickle.HIGHEST_PROTOCOL)
+		os.rename(tmp_path, path)
+		
+		with self._lock:
+			if self._num_entries is None:
+				self._num_entries = len(self._entries())
+			else:
+				self._num_entries += 1
+			if self._num_entries > self.max_entries:
+				self._evict()
+	
+	def _entries(self):
+		entries = []
+		for root, dirs, files in os.walk(self.cache_dir):
+			entries.extend([os.path.join(root, f) for f in files if f.endswith('.pickle')])
+		return entries
+	
+	def _evict(self):
+		""" Removes the least recently used tenth of the entries. """
+		entries = sorted(self._entries(), key=os.path.getmtime)
+		remove = entries[:len(entries) - int(self.max_entries * 0.9)]
+		for path in remove:
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+		self.evictions += len(remove)
+		self._num_entries = len(entries) - len(remove)
+	
+	def stats(self):
+		lookups = self.hits + self.misses
+		return {
+			'pipeline': self.pipeline.name,
+			'version': self.version,
+			'entries': self._num_entries,
+			'max_entries': self.max_entries,
+			'hits': self.hits,
+			'misses': self.misses,
+			'evictions': self.evictions,
+			'hit_rate': float(self.hits) / lookups if lookups > 0 else None
+		}
@@ -0,0 +1,191 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  Running NLP pipelines on batches of documents in parallel.
+#
+#    $ python nlppool.py benchmark [num_docs]
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+from multiprocessing.pool import ThreadPool
+
+
+class ParallelPipeline(object):
+	""" Collects the input of a pipeline and, when run, splits it into
+	batches of `batch_size` documents that are processed by up to `workers`
+	pipeline instances at once. Each instance gets its own root directory
+	and is run once for its whole batch. The directory is removed once all
+	of its output has been parsed, or right away if the batch failed.
+	
+	`factory` is called with a root directory and must return a pipeline
+	using it, e.g. `lambda root: cTAKES({'root': root})`. The pipelines run
+	their engines as subprocesses, so threads are enough to keep the cores
+	busy. Can be wrapped in a CachedPipeline so that only new text is run.
+	"""
+	
+	def __init__(self, factory, root='nlp_batches', workers=4, batch_size=50):
+		self.factory = factory
+		self.root = root
+		self.workers = workers
+		self.batch_size = batch_size
+		self.prototype = factory(root)
+		self._pending = []			# (text, filename) not yet run
+		self._pipelines = {}		# input filename -> (pipeline that ran it, its root)
+		self._unparsed = {}			# batch root -> set of filenames not yet parsed
+		self._lock = threading.Lock()
+	
+	def __getattr__(self, name):
+		return getattr(self.prototype, name)
+	
+	def write_input(self, text, filename):
+		with self._lock:
+			self._pending.append((text, filename))
+		return True
+	
+	def run(self):
+		""" Runs all input written since the last run, returns True if all
+		batches succeeded. """
+		with self._lock:
+			pending = self._pending
+			self._pending = []
+		batches = [pending[i:i + self.batch_size] for i in xrange(0, len(pending), self.batch_size)]
+		
+		if 0 == len(batches):
+			return True
+		
+		logging.debug("%s: running %d documents in %d batches on %d workers" % (self.prototype.name, len(pending), len(batches), min(self.workers, len(batches))))
+		pool = ThreadPool(min(self.workers, len(batches)))
+		try:
+			results = pool.map(self._run_batch, batches)
+		finally:
+			pool.close()
+			pool.join()
+		
+		return all(results)
+	
+	def _run_batch(self, inputs):
+		if not os.path.exists(self.root):
+			try:
+				os.makedirs(self.root)
+			except OSError:
+				pass			# created by another thread
+		
+		root = tempfile.mkdtemp(prefix='batch-', dir=self.root)
+		success = False
+		try:
+			pipeline = self.factory(root)
+			for text, filename in inputs:
+				pipeline.write_input(text, filename)
+			success = pipeline.run()
+		finally:
+			if success:
+				with self._lock:
+					self._unparsed[root] = set([filename for text, filename in inputs])
+					for text, filename in inputs:
+						self._pipelines[filename] = (pipeline, root)
+			else:
+				shutil.rmtree(root, ignore_errors=True)
+		return success
+	
+	def parse_output(self, filename, *args, **kwargs):
+		with self._lock:
+			pipeline, root = self._pipelines.pop(filename, (None, None))
+		if pipeline is None:
+			logging.warning("%s: %s has not been run or its batch failed" % (self.prototype.name, filename))
+			return None
+		
+		try:
+			return pipeline.parse_output(filename, *args, **kwargs)
+		finally:
+			with self._lock:
+				unparsed = self._unparsed[root]
+				unparsed.discard(filename)
+				if 0 == len(unparsed):
+					del self._unparsed[root]
+			if 0 == len(unparsed):
+				shutil.rmtree(root, ignore_errors=True)
+
+
+class BenchmarkPipeline(object):
+	""" Stands in for a JVM pipeline: every run starts one subprocess with a
+	fixed startup cost, which then spends CPU time on each input file. """
+	
+	name = 'benchmark'
+	startup = 0.5				# seconds
+	work_per_doc = 20000		# hash rounds
+	
+	def __init__(self, root):
+		self.root = root
+		for sub in ['input', 'output']:
+			if not os.path.exists(os.path.join(root, sub)):
+				os.makedirs(os.path.join(root, sub))
+	
+	def write_input(self, text, filename):
+		with open(os.path.join(self.root, 'input', filename), 'wb') as handle:
+			handle.write(text)
+		return True
+	
+	def run(self):
+		return 0 == subprocess.call([sys.executable, os.path.abspath(__file__), 'process', self.root,
+			str(self.startup), str(self.work_per_doc)])
+	
+	def parse_output(self, filename):
+		with open(os.path.join(self.root, 'output', filename), 'rb') as handle:
+			return handle.read()
+
+
+def _process(root, startup, work_per_doc):
+	time.sleep(startup)
+	for filename in os.listdir(os.path.join(root, 'input')):
+		with open(os.path.join(root, 'input', filename), 'rb') as handle:
+			digest = handle.read()
+		for i in xrange(work_per_doc):
+			digest = hashlib.sha1(digest).hexdigest()
+		with open(os.path.join(root, 'output', filename), 'wb') as handle:
+			handle.write(digest)
+
+
+def benchmark(num_docs=400, worker_counts=(1, 2, 4, 8, 16), batch_size=25):
+	""" Runs the same corpus through BenchmarkPipeline in batches on
+	increasing numbers of workers, printing the time taken and the speedup
+	over a single worker. """
+	corpus = [('doc-%d.txt' % i, 'Exclusion criteria of trial %d' % i) for i in xrange(num_docs)]
+	tmp_dir = tempfile.mkdtemp()
+	
+	try:
+		print 'Corpus of %d documents on %d cores, %d per batch' % (num_docs, os.sysconf('SC_NPROCESSORS_ONLN'), batch_size)
+		baseline = None
+		expected = None
+		for workers in worker_counts:
+			pipeline = ParallelPipeline(BenchmarkPipeline, root=os.path.join(tmp_dir, 'w%d' % workers), workers=workers, batch_size=batch_size)
+			start = time.time()
+			for filename, text in corpus:
+				pipeline.write_input(text, filename)
+			pipeline.run()
+			outputs = [pipeline.parse_output(filename) for filename, text in corpus]
+			duration = time.time() - start
+			
+			if baseline is None:
+				baseline = duration
+				expected = outputs
+			assert outputs == expected
+			print '%-24s %7.1f s  %5.1fx' % ('%d worker%s' % (workers, '' if 1 == workers else 's'), duration, baseline / duration)
+	finally:
+		shutil.rmtree(tmp_dir)
+
+
+if '__main__' == __name__:
+	if len(sys.argv) > 1 and 'process' == sys.argv[1]:
+		_process(sys.argv[2], float(sys.argv[3]), int(sys.argv[4]))
+	elif len(sys.argv) > 1 and 'benchmark' == sys.argv[1]:
+		benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 400)
+	else:
+		print 'Usage: nlppool.py benchmark [num_docs]'
+		sys.exit(1)
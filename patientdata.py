@@ -0,0 +1,154 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  Extracting a patient's demographics and problems from the RDF graphs the
+#  SMART container serves, straight from the rdflib graph. Only the subjects
+#  we return are visited, the graph is not serialized to JSON-LD first.
+#
+#  Nodes come out as the compacted JSON-LD the app used to get: properties
+#  and types are CURIEs ("sp:problemName", "vcard:n"), blank nodes are
+#  embedded into their subject and other resources are {"@id": uri}.
+#
+#  To compare with the JSON-LD round trip on large problem lists:
+#
+#    $ python patientdata.py bench [num_problems]
+
+import sys
+import time
+import json
+
+from rdflib.term import URIRef, BNode, Literal
+from rdflib.namespace import RDF, XSD
+
+
+# CURIE prefixes, by namespace rather than by the prefixes the document
+# declares, so SMART 0.5's "v:" properties come out as "vcard:" like 0.6's
+NAMESPACES = [
+	('sp', 'http://smartplatforms.org/terms#'),
+	('spcode', 'http://smartplatforms.org/terms/codes/'),
+	('dcterms', 'http://purl.org/dc/terms/'),
+	('foaf', 'http://xmlns.com/foaf/0.1/'),
+	('vcard', 'http://www.w3.org/2006/vcard/ns#'),
+	('rdf', unicode(RDF)),
+	('rdfs', 'http://www.w3.org/2000/01/rdf-schema#'),
+	('xsd', unicode(XSD)),
+]
+
+SP_DEMOGRAPHICS = URIRef('http://smartplatforms.org/terms#Demographics')
+SP_PROBLEM = URIRef('http://smartplatforms.org/terms#Problem')
+
+
+class GraphExtractor(object):
+	""" Builds dictionaries for subjects of one graph, remembering the CURIEs
+	of the predicates and types it has seen. """
+	
+	def __init__(self, graph):
+		self.graph = graph
+		self._curies = {}
+	
+	def curie(self, uri):
+		curie = self._curies.get(uri)
+		if curie is None:
+			curie = unicode(uri)
+			for prefix, ns in NAMESPACES:
+				if curie.startswith(ns) and len(curie) > len(ns):
+					curie = '%s:%s' % (prefix, curie[len(ns):])
+					break
+			self._curies[uri] = curie
+		return curie
+	
+	def node(self, subject, _seen=None):
+		""" The dictionary of a subject with all its properties, a property
+		with several values has a list. """
+		seen = (_seen or set()) | set([subject])
+		node = {}
+		if isinstance(subject, URIRef):
+			node['@id'] = unicode(subject)
+		
+		for pred, obj in self.graph.predicate_objects(subject):
+			if RDF.type == pred:
+				key = '@type'
+				value = self.curie(obj)
+			else:
+				key = self.curie(pred)
+				value = self.value(obj, seen)
+			
+			if key not in node:
+				node[key] = value
+			elif isinstance(node[key], list):
+				node[key].append(value)
+			else:
+				node[key] = [node[key], value]
+		
+		return node
+	
+	def value(self, obj, seen):
+		if isinstance(obj, Literal):
+			if obj.language:
+				return {'@value': unicode(obj), '@language': obj.language}
+			if obj.datatype is not None and XSD.string != obj.datatype:
+				return {'@value': unicode(obj), '@type': self.curie(obj.datatype)}
+			return unicode(obj)
+		if isinstance(obj, BNode) and obj not in seen:
+			return self.node(obj, seen)
+		return {'@id': unicode(obj)}
+	
+	def nodes_of_type(self, rdf_type):
+		return [self.node(subject) for subject in self.graph.subjects(RDF.type, rdf_type)]
+
+
+def demographics_from_graph(graph):
+	""" The patient's sp:Demographics node, an empty dict if there is none. """
+	if graph is None:
+		return {}
+	extractor = GraphExtractor(graph)
+	for subject in graph.subjects(RDF.type, SP_DEMOGRAPHICS):
+		return extractor.node(subject)
+	return {}
+
+
+def problems_from_graph(graph):
+	""" All sp:Problem nodes of the graph, as {"problems": [...]}. """
+	if graph is None:
+		return {'problems': []}
+	return {'problems': GraphExtractor(graph).nodes_of_type(SP_PROBLEM)}
+
+
+def _jsonld_problems(graph):
+	""" How problems used to be extracted, for the benchmark. """
+	ld = json.loads(graph.serialize(format='json-ld', auto_compact=True))
+	return [node for node in ld.get('@graph', []) if 'sp:Problem' == node.get('@type')]
+
+
+def benchmark(num_problems, repeat=5):
+	from rdflib.graph import Graph
+	from smartstandin import problems_rdf
+	
+	graph = Graph().parse(data=problems_rdf('http://localhost:7000', 'bench', num_problems))
+	print "%d problems, %d triples" % (num_problems, len(graph))
+	
+	def best_of(func):
+		times = []
+		for i in xrange(repeat):
+			start = time.time()
+			func(graph)
+			times.append(time.time() - start)
+		return min(times)
+	
+	direct = best_of(problems_from_graph)
+	print "extracting from the graph: %.1f ms" % (1000 * direct)
+	try:
+		jsonld = best_of(_jsonld_problems)
+		print "JSON-LD round trip:        %.1f ms, %.1fx" % (1000 * jsonld, jsonld / max(direct, 0.000001))
+	except Exception as e:
+		print "JSON-LD round trip not available: %s" % e
+
+
+if '__main__' == __name__:
+	if len(sys.argv) < 2 or 'bench' != sys.argv[1]:
+		print 'Usage: patientdata.py bench [num_problems]'
+		sys.exit(1)
+	
+	counts = [int(sys.argv[2])] if len(sys.argv) > 2 else [10, 100, 1000, 10000]
+	for num in counts:
+		benchmark(num)
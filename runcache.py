@@ -0,0 +1,127 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  Reusing the results of earlier trial runs for identical searches.
+
+import re
+import threading
+
+from ClinicalTrials.runner import Runner
+from caching import LRUCache
+
+
+# the status of a run that waits for an identical run
+FOLLOWING_STATUS = 'Waiting for identical search %s'
+FOLLOWING_PATTERN = r'^Waiting for identical search (\S+)$'
+
+
+class RunCache(object):
+	""" Remembers which run found the trials for a search, so that the same
+	search within `ttl` seconds can reuse its results instead of searching
+	ClinicalTrials.gov and running NLP again.
+	Searches arriving while an identical run is still in flight wait for
+	that run ("follow" it) and get its results once it's done. Which run a
+	run follows is kept in its status, so any worker can settle it.
+	"""
+	
+	def __init__(self, max_size=200, ttl=3600):
+		self._runs = LRUCache(max_size, ttl)
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.joins = 0
+		self.misses = 0
+	
+	@staticmethod
+	def key(condition, term, fields):
+		""" The cache key for a search: the normalized condition or term plus
+		the requested trial fields. """
+		if condition:
+			search = 'cond:%s' % condition
+		else:
+			search = 'term:%s' % (term or '')
+		search = re.sub(r'\s+', ' ', search.strip().lower())
+		
+		return '%s|%s' % (search, ','.join(sorted(fields or [])))
+	
+	def attach(self, runner, fields):
+		""" Looks for a finished or running run of the same search.
+		Returns that Runner, in which case `runner` must not be run: if it's
+		done call `copy_run()`, if it's in flight `runner` now follows it. If
+		None is returned, `runner` is registered as the run for this search
+		and must be started by the caller.
+		"""
+		key = self.key(runner.condition, runner.term, fields)
+		with self._lock:
+			run_id = self._runs.get(key)
+			source = Runner.get(run_id) if run_id is not None else None
+			if source is not None and not run_failed(source):
+				if source.done:
+					self.hits += 1
+				else:
+					self.joins += 1
+					runner.status = FOLLOWING_STATUS % source.run_id
+				return source
+			
+			self.misses += 1
+			self._runs.set(key, runner.run_id)
+			return None
+	
+	def settle(self, runner):
+		""" If `runner` follows another run that has finished, takes over its
+		results (or its error) and stops following. """
+		with self._lock:
+			self._settle(runner)
+	
+	def _settle(self, runner):
+		leader_id = followed_run_id(runner)
+		if leader_id is None:
+			return None
+		
+		leader = Runner.get(leader_id)
+		if leader is None:
+			runner.status = 'Error: the identical search we waited for is gone, please search again'
+		elif leader.done:
+			copy_run(leader, runner)
+		elif run_failed(leader):
+			runner.status = leader.status
+		else:
+			return leader
+		return None
+	
+	def leader_of(self, runner):
+		""" Returns the run `runner` is waiting for, or `runner` itself if it
+		does not follow another run. """
+		with self._lock:
+			return self._settle(runner) or runner
+	
+	def stats(self):
+		lookups = self.hits + self.joins + self.misses
+		return {
+			'size': len(self._runs),
+			'max_size': self._runs.max_size,
+			'ttl': self._runs.ttl,
+			'hits': self.hits,
+			'joins': self.joins,
+			'misses': self.misses,
+			'hit_rate': float(self.hits + self.joins) / lookups if lookups > 0 else None
+		}
+
+
+def followed_run_id(runner):
+	""" The id of the run `runner` follows, None if it does not follow one. """
+	match = re.match(FOLLOWING_PATTERN, runner.status or '')
+	return match.group(1) if match is not None else None
+
+
+def run_failed(runner):
+	""" Runners report errors as status starting with "error". """
+	return re.match(r'^error', runner.status or '', re.I) is not None
+
+
+def copy_run(source, target):
+	""" Makes the `target` runner use the trials found by the finished
+	`source` runner. Filter reasons are not copied, they belong to the
+	session that filtered the source run. """
+	ncts = [tpl[0] for tpl in source.get_ncts(restrict='none')]
+	target.write_ncts(ncts)
+	target.status = 'done'
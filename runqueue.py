@@ -0,0 +1,133 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  Running trial runs on a bounded number of workers.
+#
+#    $ python runqueue.py benchmark [num_runs] [run_seconds]
+
+import sys
+import time
+import logging
+import threading
+from collections import deque
+
+
+class RunQueueFull(Exception):
+	pass
+
+
+class RunQueue(object):
+	""" Executes runners on `num_workers` worker threads. Runs waiting for a
+	worker are kept in a FIFO queue of at most `max_waiting` runs, submitting
+	more raises RunQueueFull.
+	The heavy lifting of a run happens in NLP subprocesses and MongoDB, so
+	threads are enough to keep the workers busy.
+	The queue lives in the process that created it: with several server
+	processes, each runs up to `num_workers` runs, queues up to `max_waiting`
+	and reports positions among its own runs only.
+	"""
+	
+	def __init__(self, num_workers=2, max_waiting=20):
+		self.num_workers = num_workers
+		self.max_waiting = max_waiting
+		self._waiting = deque()
+		self._running = set()
+		self._workers = []
+		self._cond = threading.Condition()
+	
+	def submit(self, runner, fields):
+		""" Queues the runner to be run with the given fields. """
+		with self._cond:
+			if len(self._waiting) >= self.max_waiting:
+				raise RunQueueFull("There are already %d runs waiting" % len(self._waiting))
+			
+			runner.in_background = False
+			self._waiting.append((runner, fields))
+			self._start_workers()
+			self._cond.notify()
+	
+	def position(self, run_id):
+		""" Returns the 1-based position of the run in the queue, None if the
+		run is not waiting (anymore). """
+		with self._cond:
+			for i, (runner, fields) in enumerate(self._waiting):
+				if runner.run_id == run_id:
+					return i + 1
+		return None
+	
+	def stats(self):
+		return {
+			'workers': self.num_workers,
+			'running': len(self._running),
+			'waiting': len(self._waiting),
+			'max_waiting': self.max_waiting
+		}
+	
+	def _start_workers(self):
+		while len(self._workers) < self.num_workers:
+			worker = threading.Thread(target=self._work, name='run-worker-%d' % len(self._workers))
+			worker.daemon = True
+			worker.start()
+			self._workers.append(worker)
+	
+	def _work(self):
+		while True:
+			with self._cond:
+				while 0 == len(self._waiting):
+					self._cond.wait()
+				runner, fields = self._waiting.popleft()
+				self._running.add(runner.run_id)
+			
+			try:
+				runner.run(fields)
+			except Exception as e:
+				logging.error("Run %s failed: %s" % (runner.run_id, e))
+				runner.status = "Error: %s" % e
+			finally:
+				with self._cond:
+					self._running.discard(runner.run_id)
+
+
+class _SleepingRun(object):
+	""" Stands in for a Runner whose run takes `seconds`. """
+	
+	def __init__(self, run_id, seconds):
+		self.run_id = run_id
+		self.seconds = seconds
+		self.submitted = None
+		self.finished = None
+		self.done = threading.Event()
+	
+	def run(self, fields=None):
+		time.sleep(self.seconds)
+		self.finished = time.time()
+		self.done.set()
+
+
+def benchmark(num_runs=40, run_seconds=0.2, worker_counts=(1, 2, 4, 8)):
+	""" Submits a burst of `num_runs` runs taking `run_seconds` each to queues
+	with increasing numbers of workers, printing the throughput and the 95th
+	percentile of the time from submitting a run to its completion. """
+	print '%d runs of %.2f s submitted at once' % (num_runs, run_seconds)
+	for workers in worker_counts:
+		queue = RunQueue(workers, num_runs)
+		runs = [_SleepingRun('run-%d' % i, run_seconds) for i in xrange(num_runs)]
+		start = time.time()
+		for run in runs:
+			run.submitted = time.time()
+			queue.submit(run, None)
+		for run in runs:
+			run.done.wait()
+		duration = max([run.finished for run in runs]) - start
+		
+		latencies = sorted([run.finished - run.submitted for run in runs])
+		p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+		print '%-12s %6.1f runs/s  p95 %6.2f s' % ('%d worker%s' % (workers, '' if 1 == workers else 's'), num_runs / duration, p95)
+
+
+if '__main__' == __name__:
+	if len(sys.argv) > 1 and 'benchmark' == sys.argv[1]:
+		benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 40, float(sys.argv[3]) if len(sys.argv) > 3 else 0.2)
+	else:
+		print 'Usage: runqueue.py benchmark [num_runs] [run_seconds]'
+		sys.exit(1)
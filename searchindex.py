@@ -0,0 +1,186 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  A local full-text index over the trials cached in MongoDB, so searches
+#  can be answered without asking ClinicalTrials.gov.
+#
+#  The index is only complete if all trials are cached, seed it with
+#  `ingest.py`, which also indexes them. `trialsync.py sync` keeps it up to
+#  date, without syncing for `max_age` seconds it is considered stale and
+#  searches go upstream again. To rebuild it from the cached trials:
+#
+#    $ python searchindex.py build
+
+import os
+import re
+import sys
+import time
+import logging
+import sqlite3
+import threading
+
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'databases', 'trials_fts.db')
+TOKEN = re.compile(r'"[^"]*"|\(|\)|[^\s()"]+')
+
+
+class TrialSearchIndex(object):
+	""" An SQLite FTS5 table with one row per trial, the row id being the
+	number of its NCT id. """
+	
+	columns = ['title', 'conditions', 'keywords', 'mesh_terms', 'interventions']
+	condition_columns = ['conditions', 'mesh_terms']
+	
+	def __init__(self, db_path=None, max_age=86400):
+		self.db_path = db_path or DB_PATH
+		self.max_age = max_age
+		self._local = threading.local()
+	
+	def connection(self):
+		conn = getattr(self._local, 'conn', None)
+		if conn is None:
+			conn = sqlite3.connect(self.db_path, timeout=60)
+			conn.execute('PRAGMA journal_mode = WAL')
+			conn.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS trials USING fts5(%s, tokenize = 'porter unicode61')''' % ', '.join(self.columns))
+			conn.execute('CREATE TABLE IF NOT EXISTS index_state (key TEXT PRIMARY KEY, value)')
+			conn.commit()
+			self._local.conn = conn
+		return conn
+	
+	def add(self, docs):
+		""" Indexes the given trial documents, replacing earlier versions. """
+		conn = self.connection()
+		rows = []
+		for doc in docs:
+			rowid = nct_number(doc.get('_id') or doc.get('id_info', {}).get('nct_id'))
+			if rowid is not None:
+				conn.execute('DELETE FROM trials WHERE rowid = ?', (rowid,))
+				rows.append([rowid] + [' \n'.join(values) for values in doc_texts(doc)])
+		
+		conn.executemany('INSERT INTO trials (rowid, %s) VALUES (?, %s)' % (', '.join(self.columns), ', '.join(['?'] * len(self.columns))), rows)
+		conn.commit()
+		return len(rows)
+	
+	def mark_fresh(self):
+		""" Call after all cached trials have been indexed or synced. """
+		conn = self.connection()
+		conn.execute('INSERT OR REPLACE INTO index_state VALUES (?, ?)', ('fresh_since', time.time()))
+		conn.commit()
+	
+	def is_fresh(self):
+		if not os.path.exists(self.db_path):
+			return False
+		row = self.connection().execute('SELECT value FROM index_state WHERE key = ?', ('fresh_since',)).fetchone()
+		return row is not None and row[0] + self.max_age > time.time()
+	
+	def search(self, term=None, condition=None):
+		""" Returns the NCT ids matching the search term or condition, as built
+		by find_trials(), best matches first. Returns None if the index can
+		not answer the search and ClinicalTrials.gov should be asked. """
+		if not self.is_fresh():
+			return None
+		
+		query = fts_query(condition, self.condition_columns) if condition else fts_query(term)
+		if query is None:
+			return None
+		
+		try:
+			rows = self.connection().execute('SELECT rowid FROM trials WHERE trials MATCH ? ORDER BY rank', (query,))
+			return ['NCT%08d' % row[0] for row in rows]
+		except sqlite3.OperationalError as e:
+			logging.info("Can't search the local index for %r: %s" % (query, e))
+			return None
+	
+	def __len__(self):
+		return self.connection().execute('SELECT COUNT(*) FROM trials').fetchone()[0]
+
+
+def nct_number(nct):
+	match = re.match(r'^NCT(\d+)$', nct or '')
+	return int(match.group(1)) if match else None
+
+
+def doc_texts(doc):
+	""" Lists of the texts of a trial document for the index columns, in the
+	order of TrialSearchIndex.columns. """
+	def lst(value):
+		if value is None:
+			return []
+		return value if isinstance(value, list) else [value]
+	
+	titles = [doc.get(key) for key in ['brief_title', 'official_title', 'acronym'] if doc.get(key)]
+	mesh = lst(doc.get('condition_browse', {}).get('mesh_term')) + lst(doc.get('intervention_browse', {}).get('mesh_term'))
+	interventions = []
+	for intervention in lst(doc.get('intervention')):
+		if isinstance(intervention, dict):
+			interventions.extend(lst(intervention.get('intervention_name')) + lst(intervention.get('other_name')))
+	
+	return [titles, lst(doc.get('condition')), lst(doc.get('keyword')), mesh, interventions]
+
+
+def fts_query(query, columns=None):
+	""" Translates a ClinicalTrials.gov search into an FTS5 query: words and
+	quoted phrases become phrases, AND, OR and NOT and parentheses are kept.
+	Returns None for queries FTS5 can not express, like ones starting with
+	NOT. """
+	parts = []
+	expect_operand = True
+	for token in TOKEN.findall(query or ''):
+		if token in ('AND', 'OR', 'NOT'):
+			if expect_operand:
+				if 'NOT' == token:
+					return None
+				continue
+			parts.append(token)
+			expect_operand = True
+		elif '(' == token:
+			parts.append(token)
+		elif ')' == token:
+			parts.append(token)
+			expect_operand = False
+		else:
+			words = re.findall(r'\w+', token.decode('utf-8') if isinstance(token, str) else token, re.UNICODE)
+			if len(words) > 0:
+				parts.append('"%s"' % ' '.join(words))
+				expect_operand = False
+	
+	while len(parts) > 0 and parts[-1] in ('AND', 'OR', 'NOT'):
+		parts.pop()
+	if 0 == len(parts):
+		return None
+	
+	fts = ' '.join(parts)
+	if columns:
+		fts = '{%s} : (%s)' % (' '.join(columns), fts)
+	return fts
+
+
+def build(studies, index=None):
+	""" (Re-)indexes all documents of the studies collection. """
+	index = index if index is not None else TrialSearchIndex()
+	batch = []
+	count = 0
+	for doc in studies.find():
+		batch.append(doc)
+		if len(batch) >= 1000:
+			count += index.add(batch)
+			batch = []
+			logging.info("Indexed %d trials" % count)
+	count += index.add(batch)
+	index.mark_fresh()
+	logging.info("Indexed %d trials" % count)
+	return count
+
+
+if '__main__' == __name__:
+	logging.basicConfig(level=logging.INFO)
+	
+	if len(sys.argv) > 1 and 'build' == sys.argv[1]:
+		import dbconfig			# configures MNGObject.database_uri
+		from trialsync import TrialSync
+		sync = TrialSync()
+		sync.connect()
+		build(sync.studies)
+	else:
+		print 'Usage: searchindex.py build'
+		sys.exit(1)
@@ -0,0 +1,178 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  Session backends for Beaker, selected via SESSION_TYPE:
+#  - "file": Beaker's file store, one file per session in session_data/
+#  - "memory": in-process LRU, only suitable when running a single worker
+#  - "mongodb": shared by all workers, stored in the app's MongoDB
+#
+#  Sessions are only written when they change, so all backends expire them
+#  `lifetime` seconds after they were last saved. Beaker's own "timeout"
+#  would need the access time written on every request.
+
+import os
+import time
+import cPickle as pickle
+import threading
+from datetime import datetime, timedelta
+
+from beaker.container import NamespaceManager, AbstractDictionaryNSManager, FileNamespaceManager
+from beaker.synchronization import null_synchronizer
+from beaker.middleware import SessionMiddleware as BeakerSessionMiddleware
+
+from caching import LRUCache
+
+
+class SessionMiddleware(BeakerSessionMiddleware):
+	""" Beaker's session middleware, bypassed for paths that never use the
+	session, such as static files. """
+	
+	skip_prefixes = ('/static/', '/templates/')
+	
+	def __call__(self, environ, start_response):
+		if environ.get('PATH_INFO', '').startswith(self.skip_prefixes):
+			return self.wrap_app(environ, start_response)
+		return BeakerSessionMiddleware.__call__(self, environ, start_response)
+
+
+class ExpiringFileNamespaceManager(FileNamespaceManager):
+	""" Beaker's file sessions, a session file that has not been saved for
+	`lifetime` seconds is removed when the session is next loaded.
+	"""
+	
+	def __init__(self, namespace, lifetime=None, **kwargs):
+		FileNamespaceManager.__init__(self, namespace, **kwargs)
+		self.lifetime = lifetime
+	
+	def do_open(self, flags, replace):
+		FileNamespaceManager.do_open(self, flags, replace)
+		session = self.hash.get('session')
+		if self.lifetime and isinstance(session, dict):
+			saved = session.get('_accessed_time')		# the time of the request that saved it
+			if saved is not None and time.time() - saved > int(self.lifetime):
+				self.hash = {}
+				try:
+					os.remove(self.file)
+				except OSError:
+					pass
+
+
+class LRUNamespaceManager(AbstractDictionaryNSManager):
+	""" Keeps sessions in process memory. The least recently used sessions
+	are dropped once there are more than `max_sessions`, sessions that have
+	not been saved for `lifetime` seconds are gone.
+	"""
+	
+	sessions = None
+	_lock = threading.Lock()
+	
+	def __init__(self, namespace, max_sessions=1000, lifetime=None, **kwargs):
+		AbstractDictionaryNSManager.__init__(self, namespace)
+		
+		with LRUNamespaceManager._lock:
+			if LRUNamespaceManager.sessions is None:
+				LRUNamespaceManager.sessions = LRUCache(int(max_sessions), lifetime)
+			
+			dictionary = LRUNamespaceManager.sessions.get(namespace)
+			if dictionary is None:
+				dictionary = {}
+				LRUNamespaceManager.sessions.set(namespace, dictionary)
+		
+		self.dictionary = dictionary
+	
+	def release_write_lock(self):
+		# re-insert so the session's lifetime starts over when it's saved
+		LRUNamespaceManager.sessions.set(self.namespace, self.dictionary)
+	
+	def do_remove(self):
+		self.dictionary.clear()
+		LRUNamespaceManager.sessions.remove(self.namespace)
+
+
+class MongoNamespaceManager(NamespaceManager):
+	""" Stores one document per session in the "sessions" collection of the
+	MongoDB at `url`, which defaults to MNGObject.database_uri. A TTL index
+	removes sessions `lifetime` seconds after they were last saved.
+	"""
+	
+	collection_name = 'sessions'
+	_collections = {}
+	_lock = threading.Lock()
+	
+	def __init__(self, namespace, url=None, database='clinicaltrials', lifetime=None, **kwargs):
+		NamespaceManager.__init__(self, namespace)
+		self.url = url
+		self.database = database
+		self.lifetime = lifetime
+		self.dictionary = None
+	
+	def collection(self):
+		url = self.url
+		if url is None:
+			from ClinicalTrials.mngobject import MNGObject
+			url = MNGObject.database_uri
+		
+		with MongoNamespaceManager._lock:
+			coll = MongoNamespaceManager._collections.get(url)
+			if coll is None:
+				from pymongo import MongoClient, uri_parser
+				db_name = uri_parser.parse_uri(url).get('database') or self.database
+				coll = MongoClient(url)[db_name][self.collection_name]
+				coll.create_index('expires', expireAfterSeconds=0)
+				MongoNamespaceManager._collections[url] = coll
+		
+		return coll
+	
+	def _load(self):
+		doc = self.collection().find_one({'_id': self.namespace})
+		self.dictionary = pickle.loads(str(doc['data'])) if doc is not None else {}
+	
+	def get_creation_lock(self, key):
+		# a session is one document, written as a whole
+		return null_synchronizer()
+	
+	def acquire_read_lock(self):
+		self._load()
+	
+	def acquire_write_lock(self, wait=True, replace=False):
+		if replace:
+			self.dictionary = {}
+		else:
+			self._load()
+		return True
+	
+	def release_write_lock(self):
+		from bson.binary import Binary
+		doc = {'_id': self.namespace, 'data': Binary(pickle.dumps(self.dictionary, pickle.HIGHEST_PROTOCOL))}
+		if self.lifetime:
+			doc['expires'] = datetime.utcnow() + timedelta(seconds=int(self.lifetime))
+		self.collection().replace_one({'_id': self.namespace}, doc, upsert=True)
+	
+	def __getitem__(self, key):
+		if self.dictionary is None:
+			self._load()
+		return self.dictionary[key]
+	
+	def __contains__(self, key):
+		if self.dictionary is None:
+			self._load()
+		return key in self.dictionary
+	
+	def __setitem__(self, key, value):
+		if self.dictionary is None:
+			self._load()
+		self.dictionary[key] = value
+	
+	def __delitem__(self, key):
+		if self.dictionary is None:
+			self._load()
+		del self.dictionary[key]
+	
+	def keys(self):
+		if self.dictionary is None:
+			self._load()
+		return self.dictionary.keys()
+	
+	def do_remove(self):
+		self.collection().delete_one({'_id': self.namespace})
+		self.dictionary = {}
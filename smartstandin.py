@@ -0,0 +1,144 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  A stand-in for a SMART 0.6 container, serving one made-up patient with
+#  demographics and a problem list of any length, and counting the requests
+#  it gets so we can see how often the app talks to the container.
+#
+#    $ python smartstandin.py [port] [num_problems]
+#
+#  The default port 7000 is the "Localhost :7000" endpoint in endpoints.py.
+#  Request counts are at /_requests, POST to /_requests/reset to start over.
+
+import sys
+import bottle
+
+
+RDF_HEADER = '''<?xml version="1.0" encoding="utf-8"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+	xmlns:sp="http://smartplatforms.org/terms#"
+	xmlns:dcterms="http://purl.org/dc/terms/"
+	xmlns:foaf="http://xmlns.com/foaf/0.1/"
+	xmlns:vcard="http://www.w3.org/2006/vcard/ns#">
+'''
+
+DEMOGRAPHICS = '''	<sp:Demographics rdf:about="%(base)s/records/%(record_id)s/demographics">
+		<sp:belongsTo rdf:resource="%(base)s/records/%(record_id)s"/>
+		<vcard:n>
+			<vcard:Name>
+				<vcard:given-name>Jane</vcard:given-name>
+				<vcard:family-name>Standin</vcard:family-name>
+			</vcard:Name>
+		</vcard:n>
+		<vcard:adr>
+			<vcard:Address>
+				<vcard:locality>Boston</vcard:locality>
+				<vcard:region>MA</vcard:region>
+				<vcard:country>USA</vcard:country>
+			</vcard:Address>
+		</vcard:adr>
+		<vcard:bday>1961-04-12</vcard:bday>
+		<foaf:gender>female</foaf:gender>
+	</sp:Demographics>
+'''
+
+PROBLEM = '''	<sp:Problem rdf:about="%(base)s/records/%(record_id)s/problems/%(num)d">
+		<sp:belongsTo rdf:resource="%(base)s/records/%(record_id)s"/>
+		<sp:problemName>
+			<sp:CodedValue>
+				<dcterms:title>%(title)s</dcterms:title>
+				<sp:code rdf:resource="http://purl.bioontology.org/ontology/SNOMEDCT/%(code)s"/>
+			</sp:CodedValue>
+		</sp:problemName>
+		<sp:startDate>2009-03-%(day)02d</sp:startDate>
+	</sp:Problem>
+'''
+
+# SNOMED CT codes and names the problems cycle through
+PROBLEM_CODES = [
+	('73211009', 'Diabetes mellitus'),
+	('38341003', 'Hypertensive disorder'),
+	('195967001', 'Asthma'),
+	('69896004', 'Rheumatoid arthritis'),
+	('254837009', 'Malignant neoplasm of breast'),
+	('13645005', 'Chronic obstructive lung disease'),
+	('49436004', 'Atrial fibrillation'),
+	('35489007', 'Depressive disorder'),
+]
+
+
+def demographics_rdf(base, record_id):
+	return RDF_HEADER + DEMOGRAPHICS % {'base': base, 'record_id': record_id} + '</rdf:RDF>\n'
+
+
+def problems_rdf(base, record_id, num_problems):
+	problems = []
+	for num in xrange(num_problems):
+		code, title = PROBLEM_CODES[num % len(PROBLEM_CODES)]
+		problems.append(PROBLEM % {'base': base, 'record_id': record_id, 'num': num, 'title': title, 'code': code, 'day': 1 + num % 28})
+	return RDF_HEADER + ''.join(problems) + '</rdf:RDF>\n'
+
+
+def standin_app(num_problems=8):
+	""" A bottle app serving the records, manifest and OAuth endpoints a
+	SMART client needs. Tokens are not checked. """
+	app = bottle.Bottle()
+	counts = {}
+	
+	def base():
+		return bottle.request.urlparts.scheme + '://' + bottle.request.urlparts.netloc
+	
+	@app.hook('before_request')
+	def count():
+		if not bottle.request.path.startswith('/_requests'):
+			counts[bottle.request.path] = counts.get(bottle.request.path, 0) + 1
+	
+	@app.get('/_requests')
+	def requests():
+		return dict(counts, total=sum(counts.values()))
+	
+	@app.post('/_requests/reset')
+	def reset():
+		counts.clear()
+		return 'ok'
+	
+	@app.get('/manifest')
+	def manifest():
+		return {
+			'smart_version': '0.6',
+			'api_base': base(),
+			'name': 'SMART stand-in',
+			'launch_urls': {
+				'app_launch': base() + '/apps/{{app_id}}/launch',
+				'authorize_token': base() + '/oauth/authorize',
+				'exchange_token': base() + '/oauth/access_token',
+				'request_token': base() + '/oauth/request_token',
+			}
+		}
+	
+	@app.route('/oauth/request_token', method=['GET', 'POST'])
+	def request_token():
+		return 'oauth_token=standin-request&oauth_token_secret=standin-request-secret&oauth_callback_confirmed=true'
+	
+	@app.route('/oauth/access_token', method=['GET', 'POST'])
+	def access_token():
+		return 'oauth_token=standin-access&oauth_token_secret=standin-access-secret'
+	
+	@app.get('/records/<record_id>/demographics')
+	def demographics(record_id):
+		bottle.response.content_type = 'application/rdf+xml'
+		return demographics_rdf(base(), record_id)
+	
+	@app.get('/records/<record_id>/problems')
+	@app.get('/records/<record_id>/problems/')
+	def problems(record_id):
+		bottle.response.content_type = 'application/rdf+xml'
+		return problems_rdf(base(), record_id, num_problems)
+	
+	return app
+
+
+if '__main__' == __name__:
+	port = int(sys.argv[1]) if len(sys.argv) > 1 else 7000
+	num_problems = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+	bottle.run(app=standin_app(num_problems), host='localhost', port=port)
@@ -0,0 +1,195 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  The SNOMED CT IS-A hierarchy, materialized as its transitive closure.
+#
+#  The closure is built offline from the RF2 relationship file that is also
+#  used for SNOMEDLookup (see README.md):
+#
+#    $ python snomedtree.py [databases/snomed_rel.csv] [databases/snomed_closure.db]
+
+import os
+import re
+import sys
+import csv
+import logging
+import sqlite3
+import threading
+
+
+ISA_TYPE_ID = '116680003'
+
+# ancestors with more descendants than this, like "Clinical finding" or
+# "Disease", are too generic to match a problem against exclusion criteria
+MAX_DESCENDANTS = 1000
+
+
+class SNOMEDTree(object):
+	""" Answers hierarchy questions from the closure table, which holds one
+	(descendant, ancestor) row for every concept and each of its direct and
+	indirect parents.
+	"""
+	
+	def __init__(self, db_path=None):
+		self.db_path = db_path or default_db_path()
+		self._local = threading.local()
+	
+	def available(self):
+		""" True if the closure has been built. """
+		return os.path.exists(self.db_path)
+	
+	def connection(self):
+		""" Read-only work only, so every thread gets its own connection. """
+		conn = getattr(self._local, 'conn', None)
+		if conn is None:
+			conn = sqlite3.connect(self.db_path)
+			self._local.conn = conn
+		return conn
+	
+	def ancestors(self, code):
+		""" Returns the set of all codes `code` IS-A, not including itself. """
+		concept = concept_id(code)
+		if concept is None:
+			return set()
+		rows = self.connection().execute('SELECT ancestor FROM closure WHERE descendant = ?', (concept,))
+		return set([str(row[0]) for row in rows])
+	
+	def descendants(self, code):
+		""" Returns the set of all codes that are a `code`. """
+		concept = concept_id(code)
+		if concept is None:
+			return set()
+		rows = self.connection().execute('SELECT descendant FROM closure WHERE ancestor = ?', (concept,))
+		return set([str(row[0]) for row in rows])
+	
+	def is_descendant(self, code, ancestor):
+		""" True if `code` IS-A `ancestor`, directly or indirectly. """
+		concept = concept_id(code)
+		ancestor = concept_id(ancestor)
+		if concept is None or ancestor is None:
+			return False
+		row = self.connection().execute('SELECT 1 FROM closure WHERE descendant = ? AND ancestor = ?', (concept, ancestor)).fetchone()
+		return row is not None
+	
+	def expand(self, codes, max_descendants=MAX_DESCENDANTS):
+		""" Returns the given codes followed by their ancestors that have at
+		most `max_descendants` descendants, in order and without duplicates.
+		Generic concepts near the root are left out, everything is a "Clinical
+		finding" and criteria mentioning one would exclude every patient. Codes
+		that are not SNOMED concept ids are kept but not expanded. """
+		expanded = []
+		seen = set()
+		for code in codes:
+			if code not in seen:
+				seen.add(code)
+				expanded.append(code)
+		
+		conn = self.connection()
+		for code in codes:
+			concept = concept_id(code)
+			if concept is None:
+				continue
+			try:
+				rows = conn.execute('''SELECT closure.ancestor FROM closure
+					JOIN descendant_counts ON descendant_counts.code = closure.ancestor
+					WHERE closure.descendant = ? AND descendant_counts.num <= ?
+					ORDER BY closure.ancestor''', (concept, max_descendants))
+			except sqlite3.OperationalError as e:
+				logging.warning("Not expanding SNOMED codes, rebuild the closure with `python snomedtree.py`: %s" % e)
+				return expanded
+			
+			for row in rows:
+				anc = str(row[0])
+				if anc not in seen:
+					seen.add(anc)
+					expanded.append(anc)
+		
+		return expanded
+
+
+def concept_id(code):
+	""" The SNOMED concept id `code` stands for as integer, None if it is not
+	one (SNOMED ids have at most 18 digits), like codes from other
+	vocabularies or garbled URLs. """
+	code = ('%s' % code).strip() if code is not None else ''
+	return int(code) if re.match(r'^[0-9]{1,18}$', code) else None
+
+
+def default_db_path():
+	return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'databases', 'snomed_closure.db')
+
+
+def active_isa_relationships(rel_path):
+	""" Yields (source_id, destination_id) for all IS-A relationships of an
+	RF2 relationship file that are active in their latest version. Full
+	releases contain every version of a relationship, snapshots only the
+	latest one, both work.
+	"""
+	latest = {}
+	with open(rel_path, 'rb') as handle:
+		reader = csv.reader(handle, delimiter='\t', quoting=csv.QUOTE_NONE)
+		reader.next()		# header
+		for row in reader:
+			if len(row) < 8 or ISA_TYPE_ID != row[7]:
+				continue
+			
+			rel_id, effective = row[0], row[1]
+			prev = latest.get(rel_id)
+			if prev is None or prev[0] < effective:
+				latest[rel_id] = (effective, '1' == row[2], int(row[4]), int(row[5]))
+	
+	for effective, active, source, destination in latest.itervalues():
+		if active:
+			yield (source, destination)
+
+
+def build_closure(rel_path, db_path):
+	""" Reads the IS-A relationships from the RF2 file at `rel_path` and
+	writes their transitive closure into a fresh SQLite database at
+	`db_path`. """
+	tmp_path = db_path + '.tmp'
+	if os.path.exists(tmp_path):
+		os.remove(tmp_path)
+	
+	conn = sqlite3.connect(tmp_path)
+	conn.execute('PRAGMA journal_mode = OFF')
+	conn.execute('PRAGMA synchronous = OFF')
+	conn.execute('CREATE TABLE isa (source INTEGER, destination INTEGER)')
+	conn.executemany('INSERT INTO isa VALUES (?, ?)', active_isa_relationships(rel_path))
+	conn.execute('CREATE INDEX isa_source ON isa (source)')
+	logging.info("Loaded %d active IS-A relationships" % conn.execute('SELECT COUNT(*) FROM isa').fetchone()[0])
+	
+	# walk up from every direct parent, UNION drops paths we already know
+	conn.execute('CREATE TABLE closure (descendant INTEGER, ancestor INTEGER, PRIMARY KEY (descendant, ancestor)) WITHOUT ROWID')
+	conn.execute('''INSERT INTO closure
+		WITH RECURSIVE up(descendant, ancestor) AS (
+			SELECT source, destination FROM isa
+			UNION
+			SELECT up.descendant, isa.destination FROM up JOIN isa ON isa.source = up.ancestor
+		)
+		SELECT descendant, ancestor FROM up''')
+	conn.execute('CREATE INDEX closure_ancestor ON closure (ancestor)')
+	conn.execute('DROP TABLE isa')
+	
+	# how generic a concept is, see SNOMEDTree.expand()
+	conn.execute('CREATE TABLE descendant_counts (code INTEGER PRIMARY KEY, num INTEGER)')
+	conn.execute('INSERT INTO descendant_counts SELECT ancestor, COUNT(*) FROM closure GROUP BY ancestor')
+	conn.commit()
+	logging.info("Wrote %d closure rows" % conn.execute('SELECT COUNT(*) FROM closure').fetchone()[0])
+	
+	conn.execute('VACUUM')
+	conn.close()
+	os.rename(tmp_path, db_path)
+
+
+if __name__ == "__main__":
+	logging.basicConfig(level=logging.INFO)
+	
+	db_dir = os.path.dirname(default_db_path())
+	rel_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(db_dir, 'snomed_rel.csv')
+	db_path = sys.argv[2] if len(sys.argv) > 2 else default_db_path()
+	if not os.path.exists(rel_path):
+		print 'The SNOMED relationship file "%s" does not exist, see README.md' % rel_path
+		sys.exit(1)
+	
+	build_closure(rel_path, db_path)
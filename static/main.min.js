@@ -1 +1,215 @@
-function initApp(){window!=window.top&&$("#back_to_patient").hide();loadDemographics();loadProblemList()}function loadDemographics(){$.ajax({url:"demographics",dataType:"json"}).always(function(e,t,n){var r="success"==t?e:"parsererror"==t?{}:null,i={};r?i=r:console.warn("No good response for demographics",e,n);$("#patient_overview").html(can.view("templates/patient_demographics.ejs",{demo:i}))})}function loadJSON(e,t,n){$.ajax({url:e,dataType:"json"}).always(function(r,i,s){if("success"==i)t?t(r,i,s):console.warn("Successfully loaded",e,"but no success func is set");else{console.error("ERROR loading URL:",e,"RETURNED",r,i,s);t&&n(r,i,s)}})}function sortedKeysFromDict(e){var t=[];for(var n in e)t[t.length]=n;t.sort();return t}function sortChildren(e,t,n){var r=e.children(t).get();r.sort(n);$.each(r,function(t,n){e.append(n)})}function text2html(e){if(!e)return"";var t=e.replace(/(^\s+)|(\s+$)/g,"");t=t.replace(/(\r\n|\n)/g,"<br />");return t}function newUUID(){return"xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx".replace(/[xy]/g,function(e){var t=Math.random()*16|0,n=e=="x"?t:t&3|8;return n.toString(16)})}function hasLocalStorage(){try{return"localStorage"in window&&window.localStorage!==null}catch(e){}return!1}function compareMedByNameASC(e,t){return"sp:drugName"in e?"dcterms:title"in e["sp:drugName"]?"sp:drugName"in t?"dcterms:title"in t["sp:drugName"]?e["sp:drugName"]["dcterms:title"]<t["sp:drugName"]["dcterms:title"]?-1:e["sp:drugName"]["dcterms:title"]>t["sp:drugName"]["dcterms:title"]?1:0:-1:-1:1:1}function compareProblemByNameASC(e,t){return"sp:problemName"in e?"dcterms:title"in e["sp:problemName"]?"sp:problemName"in t?"dcterms:title"in t["sp:problemName"]?e["sp:problemName"]["dcterms:title"]<t["sp:problemName"]["dcterms:title"]?-1:e["sp:problemName"]["dcterms:title"]>t["sp:problemName"]["dcterms:title"]?1:0:-1:-1:1:1}function compareByDateDESC(e,t){return"date"in e?"date"in t?parseInt(e.date)<parseInt(t.date)?1:parseInt(e.date)>parseInt(t.date)?-1:0:-1:1}function _geo_initMap(){if(g_map)return;var e={zoom:4,minZoom:3,maxZoom:15,center:new google.maps.LatLng(38.5,-96.5),mapTypeId:google.maps.MapTypeId.ROADMAP};g_map=new google.maps.Map($("#g_map").get(0),e);g_clusterer=new MarkerClusterer(g_map);g_clusterer.onClick=function(e){return _geo_multipleMarkersAtSameLocation(e.cluster_)};g_marker_green=new google.maps.MarkerImage("http://chart.apis.google.com/chart?chst=d_map_pin_letter&chld=%E2%80%A2|33CC22",new google.maps.Size(21,34),new google.maps.Point(0,0),new google.maps.Point(10,34));g_marker_red=new google.maps.MarkerImage("http://chart.apis.google.com/chart?chst=d_map_pin_letter&chld=%E2%80%A2|AA2200",new google.maps.Size(21,34),new google.maps.Point(0,0),new google.maps.Point(10,34));g_patient_location&&_geo_zoomToPatient()}function geo_showMap(){var e=Math.max(300,Math.round($(window).height()*.4));$("#g_map").css("height",e+"px").show();g_map||_geo_initMap()}function geo_hideMap(){$("#g_map").hide();geo_unhighlightPin()}function geo_locatePatient(e,t){if(!e||0==e.length){g_patient_location=null;t&&t(!1,null,null);return}geo_codeAddress(e,function(e,n){g_patient_location=n;g_map&&n&&_geo_zoomToPatient();t&&t(e,n?n.lat():null,n?n.lng():null)})}function geo_codeAddress(e,t){if(!e){console.warn("No address given, cannot geo-code");t&&t(!1,null);return}g_geocoder||(g_geocoder=new google.maps.Geocoder);g_geocoder.geocode({address:e},function(n,r){var i=null;google.maps.GeocoderStatus.OK==r?i=n[0].geometry.location:google.maps.GeocoderStatus.ZERO_RESULTS?alert('The address "'+e+'" could not be located.'):console.error("Geocode failed: "+r);t&&t(i!=null,i)})}function geo_addPins(e,t,n){if(!e||0===e.length)return;var r=[];for(var i=0;i<e.length;i++){var s=e[i],o=new google.maps.Marker({position:new google.maps.LatLng(s.lat,s.lng),trial:s.trial,location:s.location,title:s.trial.title,icon:s.reason?g_marker_red:g_marker_green,animation:t?google.maps.Animation.DROP:null});r.push(o);n&&google.maps.event.addListener(o,"click",n)}g_clusterer.addMarkers(r)}function geo_highlightPin(e){if(!e){console.error("I need a pin to highlight");return}g_highlighted_pin&&g_highlighted_pin.setAnimation();e.setAnimation(google.maps.Animation.BOUNCE);g_highlighted_pin=e}function _geo_multipleMarkersAtSameLocation(e){if(e.getMarkers().length>1){var t=e.getMarkers();showTrialsforPins(t);return!1}return!0}function geo_unhighlightPin(){if(g_highlighted_pin){g_highlighted_pin.setAnimation();g_highlighted_pin=null}}function geo_zoomToPins(e){return;var t,o,u,a}function geo_clearAllPins(){for(var e=0;e<g_pins.length;e++)g_pins[e].setMap(null);g_pins=[];g_clusterer&&g_clusterer.clearMarkers()}function _geo_zoomToPatient(){if(!g_patient_location)return;if(!g_map){console.error("No map, cannot zoom to patient");return}g_patient_pin&&g_patient_pin.setMap(null);g_patient_pin=new google.maps.Marker({map:g_map,position:g_patient_location});g_map.setCenter(g_patient_location)}function kmDistanceBetweenLocationsLatLng(e,t,n,r){var i=6371,s=_geo_deg2rad(n-e),o=_geo_deg2rad(r-t),u=Math.sin(s/2)*Math.sin(s/2)+Math.cos(_geo_deg2rad(e))*Math.cos(_geo_deg2rad(n))*Math.sin(o/2)*Math.sin(o/2),a=2*Math.asin(Math.sqrt(u));return i*a}function kmDistanceBetweenLocations(e,t){return kmDistanceBetweenLocationsLatLng(e.lat(),e.lng(),t.lat(),t.lng())}function _geo_deg2rad(e){return e*(Math.PI/180)}function loadProblemList(){$.ajax({url:"problems",dataType:"json"}).always(function(e,t,n){var r="success"==t?e:"parsererror"==t?{}:null;if(r)$("#patient_problems").html(can.view("templates/patient_problems.ejs",{data:r,last_manual_input:_last_manual_input}));else{$("#patient_problems").text("Could not load the problem list, see the console for details");console.warn("No good response for problems",e,n)}})}function didClickProblem(e,t){var n=$("#"+e);if(!$("#"+e).is("*")){alert("Error, see Browser console");console.error('didClickProblem("'+e+'") -- no such problem_id');return}t||!n.hasClass("active")?hideProblemsAndStartTrialSearch(e):cancelTrialSearchAndShowProblemList(e)}function hideProblemsAndStartTrialSearch(e){var t="prob_manual"==e,n=$("#"+e).find("div.problem_name").text();t&&(n=$("#manual_problem").val());if(!n){$("#manual_problem").focus();return}var r=$("#"+e);r.addClass("active");$("#problem_list").find("li").each(function(t,n){e!=n.getAttribute("id")&&$(n).slideUp("fast")});if(!t){var i=$("#cancel_trials");i.is("*")||(i=$("<button/>",{type:"button",id:"cancel_trials"}).text("Cancel"));r.prepend(i)}else{$("#manual_cancel").show();$("#manual_submit").hide()}var s=$("#refresh_trials");s.is("*")||(s=$("<button/>",{type:"button",id:"refresh_trials"}).text("Refresh"));s.click(function(t){didClickProblem(e,!0);t.stopPropagation()});r.prepend(s);var o=$("#select_female").is(":checked")?"female":"male",u=1*$("#demo_age").val();t?searchTrialsByTerm(n,o,u,!0):searchTrialsByCondition(n,o,u,!1)}function cancelTrialSearchAndShowProblemList(e){cancelTrialSearch();var t=0;$("#problem_list").find("li").each(function(e,n){$(n).slideDown("fast");t++});$("#refresh_trials").remove();$("#cancel_trials").remove();$("#manual_cancel").hide();$("#manual_submit").show();e&&t>1&&$("#"+e).removeClass("active")}function _toggleTrialLocationContact(e){var t=$(e),n=t.siblings(".loc_contact");if(n.is(":visible"))n.fadeOut("fast");else{n.show();n.css("left",(t.outerWidth()-n.outerWidth())/2+t.position().left)}}function _toggleEligibilityCriteria(e,t){var n=$(e),r=n.closest(".trial"),i=r.find(".formatted_criteria").first();if(i.is(":visible")){i.hide();n.text("Show eligibility criteria")}else{i.show();n.text("Hide eligibility criteria");0==i.text().length&&_loadEligibilityCriteria(i,t)}}function _loadEligibilityCriteria(e,t){var n=$(e);n.text("Loading...");loadJSON("trials/"+t+"/criteria_html",function(e,t,r){if("criteria"in e)n.html(e.criteria);else{console.log('Expected JSON response with a "criteria" dictionary, but got these: ',e,t,r);n.text("(unknown criteria)")}},function(e,r,i){n.html("Error getting criteria: "+i+'.<br /><a href="javascript:void();" onclick="_loadEligibilityCriteria(this.parentNode, \''+t+"')\">Try again</a>.")})}function hideTooManyCategoryTags(e){var t=$(e),n=t.parent(),r=n.height();t.siblings().show().filter(".over_limit").hide();t.hide();var i=n.height()-r;window.scrollBy(0,i)}function searchTrialsByTerm(e,t,n,r){_trialSearchMustStop=!1;_initTrialSearch(e,null,t,n,r)}function searchTrialsByCondition(e,t,n,r){_trialSearchMustStop=!1;_initTrialSearch(null,e,t,n,r)}function cancelTrialSearch(){_trialSearchMustStop=!0;if(_trialSearchInterval){window.clearInterval(_trialSearchInterval);_trialSearchInterval=null}showTrialStatus();resetUI()}function resetUI(){$("#trial_selectors").find(".trial_selector").empty();$("#trial_selectors").find(".trial_opt_selector > ul").empty();$("#trial_selectors").hide();resetShownTrials();hideNoTrialsHint()}function resetShownTrials(){$("#trial_list").empty();showNoTrialsHint();cleanMap();geo_hideMap();$("#g_map_toggle").hide().find("a").text("Show Map")}function cleanMap(){_trial_locations=null;geo_clearAllPins();$("#selected_trial").empty().hide()}function _initTrialSearch(e,t,n,r,i){if(_trialSearchInterval){console.warn("Already searching");return}resetUI();_run_id=null;showTrialStatus("Starting...");geo_locatePatient($("#demo_location").val(),function(s,o,u){var a=s?o+","+u:null,f={gender:n,age:r,latlng:a,remember_input:i?!0:!1},l=e?e:t;f[e?"term":"cond"]=l;$.ajax({url:"trial_runs",data:f}).always(function(e,t,n){if(_trialSearchMustStop)return;if("success"==t){_run_id=e;_trialSearchInterval&&window.clearInterval(_trialSearchInterval);_trialSearchInterval=window.setInterval(function(){checkTrialStatus()},1e3)}else showTrialStatus("Error searching for trials: "+n)})})}function checkTrialStatus(){if(!_run_id)return;$.ajax({url:"trial_runs/"+_run_id+"/progress"}).always(function(e,t,n){if(_trialSearchMustStop)return;if("success"==t)if("done"==e){window.clearInterval(_trialSearchInterval);_trialSearchInterval=null;showTrialStatus("Filtering by demographics...");_filterTrialsByDemographics(_run_id)}else{if(e&&e.length>5&&e.match(/^error/i)){window.clearInterval(_trialSearchInterval);_trialSearchInterval=null}showTrialStatus(e)}else{console.error(e,t,n);showTrialStatus("Error checking trial status: "+n);window.clearInterval(_trialSearchInterval);_trialSearchInterval=null}})}function _filterTrialsByDemographics(e){loadJSON("trial_runs/"+e+"/filter/demographics",function(t,n,r){showTrialStatus("Filtering by problem list...");_filterTrialsByProblems(e)},function(e,t,n){showTrialStatus("Error filtering trials (demographics): "+n)})}function _filterTrialsByProblems(e){loadJSON("trial_runs/"+e+"/filter/problems",function(t,n,r){loadTrialOverview(e)},function(e,t,n){showTrialStatus("Error filtering trials (problems): "+n)})}function loadTrialOverview(e){loadJSON("trial_runs/"+e+"/overview",function(e,t,n){if("intervention_types"in e&&"drug_phases"in e){_fillInterventionTypes(e.intervention_types);_fillTrialPhases(e.drug_phases);showTrialStatus();showNoTrialsHint();$("#trial_selectors").show()}else console.error("Malformed response:",e)},function(e,t,n){showTrialStatus("Error retrieving overview data: "+n)})}function _fillInterventionTypes(e){if(e){var t=$("#selector_inv_type"),n=sortedKeysFromDict(e);for(var r=0;r<n.length;r++){var i=n[r],s=_getOptCheckElement(i,0,!1);s.data("intervention-type",i);t.append(s);s.find(".num_matches").text(e[i])}sortChildren(t,"li",function(e,t){return $(e).text().toLowerCase().localeCompare($(t).text().toLowerCase())})}}function _fillTrialPhases(e){if(e){var t=$("#selector_inv_phase").empty(),n=sortedKeysFromDict(e);for(var r=0;r<n.length;r++){var i=n[r],s=_getOptCheckElement(i,0,!0);s.data("phase",i);t.append(s);s.find(".num_matches").text(e[i])}n.length>0&&sortChildren(t,"li",function(e,t){return $(e).text().toLowerCase().localeCompare($(t).text().toLowerCase())})}}function _getOptRadioElement(e,t,n){var r=$("<li/>",{href:"javascript:void(0)"}),i=newUUID(),s=$("<input/>",{id:i,type:"radio",name:"ugly_hack"});s.change(_toggleShowGoodTrials);r.append(s);r.append($("<label/>",{"for":i}).text(e));r.append($("<span/>").addClass("num_matches").text(t));if(n){r.addClass("active");s.prop("checked",!0)}return r}function _getOptCheckElement(e,t,n){var r=$("<li/>",{href:"javascript:void(0)"}),i=newUUID(),s=$("<input/>",{id:i,type:"checkbox"});r.append(s);r.append($("<label/>",{"for":i}).text(e));r.append($("<span/>").addClass("num_matches").text(t));s.change(_toggleOptCheckElement);if(n){r.addClass("active");s.prop("checked",!0)}return r}function _toggleShowGoodTrials(e){alert("re-implement me!");_showGoodTrials=!_showGoodTrials;updateShownHiddenTrials()}function _toggleOptCheckElement(e){var t=$(this).parent();t.find("input").prop("checked")?t.addClass("active"):t.removeClass("active");var n="selector_inv_type"==t.parent().attr("id");updateShownHiddenTrials(n)}function _toggleKeyword(e){console.warn("keyword selection has been turned off");return;var t,n,r,i,s,o,u,a}function _normalizeKeyword(e){return e?e.toLowerCase():null}function updateShownHiddenTrials(e){if(!_run_id){showTrialStatus("I have lost track of our run, please search again");return}showNoTrialsHint("Loading…");$("#trial_selectors").find('input[type="checkbox"]').prop("disabled",!0);cleanMap();var t=[],n=[];$("#selector_inv_type").children("li").each(function(e,t){var r=$(t);r.hasClass("active")&&n.push(r.data("intervention-type"))});n.length>0&&t.push("intv="+n.join("|"));var r=[],i=[];$("#selector_inv_phase").children("li").each(function(e,t){var n=$(t);r.push(n);n.hasClass("active")&&i.push(n.data("phase"))});i.length>0?i.length<r.length&&t.push("phases="+i.join("|")):$(r).each(function(e,t){t.find("input").prop("checked",!0);t.addClass("active")});r.length>0&&n.length>0?$("#selector_inv_phase_parent").show():$("#selector_inv_phase_parent").hide();var s=[];$("#selector_keywords").children("span").each(function(e,t){s.push($(t).data("normalized"))});if(0==n.length&&0==s.length){resetShownTrials();$("#trial_selectors").find('input[type="checkbox"]').prop("disabled",!1);return}if(e){t.push("reload_phases=1");$("#selector_inv_phase").find(".num_matches").text("…")}var o=t.join("&");loadJSON("trial_runs/"+_run_id+"/trials?"+o,function(e,t,n){hideNoTrialsHint();_showTrials(e.trials,0);"drug_phases"in e&&_fillTrialPhases(e.drug_phases);$("#trial_selectors").find('input[type="checkbox"]').prop("disabled",!1);window.setTimeout(geo_zoomToPins,100)},function(e,t,n){showTrialStatus("Error loading trials: "+n);hideNoTrialsHint();$("#trial_selectors").find('input[type="checkbox"]').prop("disabled",!1)})}function _showTrials(e,t){var n=$("#trial_list");(!t||0==t)&&n.empty();$("#show_more_trials").remove();$("#g_map_toggle").show();if(!e||0==e.length||t>=e.length){e.length>0&&t>=e.length&&console.warn("Cannot show trials starting at: ",t,"trials: ",e);if(!e||0==e.length){$("#g_map_toggle > span").text("");showNoTrialsHint()}return}var r=[];$("#selector_keywords").children("span").each(function(e,t){r.push($(t).data("normalized"))});var i=t+_trialsPerPage;e.length>i&&e.length<t+_trialsPerPage+_trialsPerPage/10&&(i=e.length+t);var s=!1,o=$("#g_map");_trial_locations||(_trial_locations=[]);for(var u=t;u<e.length;u++){var a=new Trial(e[u]);_trial_locations.push.apply(_trial_locations,a.locationPins());if(u<i){var f=$("<li/>").append(can.view("templates/trial_item.ejs",{trial:a,active_keywords:r}));n.append(f);a.showClosestLocations(g_patient_location,f,0,3)}else s=!0}$("#g_map_toggle > span").text(_trial_locations.length>1e3?" ("+_trial_locations.length+" trial locations)":"");$("#g_map").is(":visible")&&updateTrialLocations();hideNoTrialsHint();if(s){var l=e.length-i,f=$("<li/>",{id:"show_more_trials"}).append("<h1>There are "+l+" more trials</h1>"),c=$("<a/>",{href:"javascript:void(0);"}).text("Show "+(_trialsPerPage<l?_trialsPerPage+" more":"all")).click(function(n){_showTrials(e,t+_trialsPerPage)});f.append($("<h1/>").append(c));n.append(f)}}function toggleTrialMap(){var e=$("#g_map");if(e.is(":visible")){var t=$("#g_map_toggle").offset().top-$(window).scrollTop();geo_hideMap();geo_clearAllPins();$("#g_map_toggle > a").text("Show Map");$("#selected_trial").empty().hide();var n=$("#g_map_toggle").offset().top-$(window).scrollTop();Math.abs(t-n)>50&&$(window).scrollTop(Math.max(0,$("#g_map_toggle").offset().top-t))}else{geo_showMap();$("#g_map_toggle > a").text("Hide Map");window.setTimeout(function(){updateTrialLocations()},200)}}function updateTrialLocations(){if(!_trial_locations||0==_trial_locations.length)return;geo_clearAllPins();geo_addPins(_trial_locations,!1,function(e){showTrialsforPins([this])});geo_zoomToPins()}function showTrialsforPins(e){1==e.length&&geo_highlightPin(e[0]);var t=$("#g_map").offset().top-$(window).scrollTop(),n=$("#selected_trial").empty().show();for(var r=0;r<e.length;r++){var i=e[r],s=$("<li/>").append(can.view("templates/trial_item.ejs",{trial:i.trial,active_keywords:null}));s.append('<a class="dismiss_link" href="javascript:void(0);" onclick="dismissShownTrial(this)">dismiss</a>');n.append(s);i.trial.showLocation(s,i.location)}var o=$("#g_map").offset().top-$(window).scrollTop();Math.abs(o-t)>50&&$(window).scrollTop(Math.max(200,$("#g_map").offset().top-t))}function dismissShownTrial(e){var t=$(e).closest("li").slideUp("fast",function(){$(this).remove();var e=$("#selected_trial");0==e.find("li").length&&e.hide()});geo_unhighlightPin()}function showTrialStatus(e){var t=$("#trial_status");if(!e){t.hide();return}t.show().text(e)}function showNoTrialsHint(e){var t=$("#no_trials_hint");if(!t.is("*")){t=$("<h3/>",{id:"no_trials_hint"});$("#trials").prepend(t)}if(e&&e.length>0){t.text(e);return}var n=!1;$("#selector_inv_type").children("li").each(function(e,t){if($(t).find("input").prop("checked")){n=!0;return}});if(n){var r=!1;$("#selector_inv_phase").is(":visible")&&$("#selector_inv_phase").children("li").each(function(e,t){if($(t).find("input").prop("checked")){r=!0;return}});r?t.text("It seems no trials match your criteria"):t.text("Please select at least one trial phase")}else t.text("Please select at least one intervention or observation")}function hideNoTrialsHint(){$("#no_trials_hint").remove()}Array.prototype.contains=function(e){return this.indexOf(e)>=0};"indexOf"in Array.prototype||(Array.prototype.indexOf=function(e){for(var t=0;t<this.length;t++)if(this[t]==e)return t;return-1});Array.prototype.uniqueArray=function(){var e={},t=[];for(var n=0,r=this.length;n<r;++n){if(e.hasOwnProperty(this[n]))continue;t.push(this[n]);e[this[n]]=1}return t};Array.prototype.intersects=function(e){for(var t=0;t<this.length;t++)for(var n=0;n<e.length;n++)if(this[t]===e[n])return!0;return!1};window.console||function(){var e=["log","debug","info","warn","error","assert","dir","dirxml","group","groupEnd","time","timeEnd","count","trace","profile","profileEnd"],t=e.length;window.console={};for(var n=0;n<t;n++)window.console[e[n]]=function(){}}();var g_map=null,g_geocoder=null,g_clusterer=null,g_pins=[],g_highlighted_pin=null,g_patient_pin=null,g_patient_location=null,g_marker_green=null,g_marker_red=null;MarkerClusterer.prototype.onClick=function(){return!0};var TrialLocation=can.Construct({},{distance:null,init:function(e){for(var t in e)e.hasOwnProperty(t)&&(this[t]=e[t])},kmDistanceTo:function(e){if(e&&"geodata"in this)this.distance=kmDistanceBetweenLocationsLatLng(e.lat(),e.lng(),this.geodata.latitude,this.geodata.longitude);else if(e){console.warn("No geodata for trial location: ",this);this.distance=null}return this.distance}}),Trial=can.Construct({geocode:function(e,t){for(var n=0;n<e.length;n++)e[n].geocode(t)}},{reason:null,intervention_types:null,trial_phases:null,trial_locations:null,did_add_pins:!1,last_loc_distances:null,closest:null,init:function(e){for(var t in e)e.hasOwnProperty(t)&&(this[t]=e[t])},interventionTypes:function(){if(null==this.intervention_types){var e=[];if("intervention"in this&&this.intervention){for(var t=0;t<this.intervention.length;t++)"intervention_type"in this.intervention[t]&&e.push(this.intervention[t].intervention_type);e=e.uniqueArray()}e.length<1&&(e=["Observational"]);this.intervention_types=e}return this.intervention_types},trialPhases:function(){if(null==this.trial_phases){if(!1 in this||!this.phase)this.phase="N/A";var e=["N/A"];"N/A"!=this.phase&&(e=this.phase.split("/"));this.trial_phases=e}return this.trial_phases},locations:function(){if(null===this.trial_locations&&"location"in this&&this.location){var e=[];for(var t=0;t<this.location.length;t++){var n=this.location[t],r="formatted"in n.geodata&&n.geodata.formatted&&n.geodata.formatted.length>0?n.geodata.formatted.split(/,\s+/):["Unknown"],i=r.pop(),s=n.status?n.status.match(/recruiting/i):null,o=n.status?n.status.match(/not\s+[\w\s]*\s+recruiting/i):null,u={trial:this,name:"facility"in n&&n.facility.name?n.facility.name:"",city:r.length>0?r.join(", "):"",country:i,geodata:"geodata"in n?n.geodata:null,status:n.status,status_color:o?"orange":s?"green":"red",contact:"contact"in n&&n.contact?n.contact:null};e.push(new TrialLocation(u))}this.trial_locations=e}return this.trial_locations},locationsByDistance:function(e){if(!e&&null!==this.last_loc_distances)return this.last_loc_distances;var t=[],n=this.locations();if(n){for(var r=0;r<n.length;r++){var i=n[r];t.push([i.kmDistanceTo(e),i])}t.sort(function(e,t){return e[0]-t[0]});this.last_loc_distances=t}return t},geocode:function(e){var t=this.locationsByDistance(e),n=t&&t.length>0?t[0]:[99999,null];this.closest=n[0]},showClosestLocations:function(e,t,n,r,i){var s=t.find(".trial_locations"),o=this.locations();if(o&&o.length>0){s.find(".show_more_locations").remove();var u=Math.min(o.length-n,r);o.length-n-u<3&&(u=o.length-n);u+=n;var a=n;for(;a<u;a++){var f=o[a];f.kmDistanceTo(e);var l=can.view("templates/trial_location.ejs",{loc:f});s.append(l)}if(a<o.length){var c=this,h=10,p=o.length-a-h<3?o.length-a:h,d=$("<a/>",{href:"javascript:void(0)"}).text("Show "+(p<o.length-a?"next "+p:" all")).click(function(n){c?c.showClosestLocations(e,t,a,p,!0):console.error("The trial object is undefined")}),v=$("<div/>").addClass("trial_location").addClass("show_more_locations"),m=$("<h3/>").html("There are "+(o.length-a)+" more locations<br />");m.append(d);v.append(m);if(i){v.hide();s.append(v);v.fadeIn("fast")}else s.append(v)}}else{var v=$('<div class="trial_location"><h3>No trial locations available</h3></div>');s.append(v)}},showLocation:function(e,t){var n=can.view("templates/trial_location.ejs",{loc:t});e.find(".trial_locations").append(n)},locationPins:function(){var e=this.locations(),t=[];if(e&&e.length>0)for(var n=0;n<e.length;n++)if("geodata"in e[n]){var r={lat:e[n].geodata.latitude,lng:e[n].geodata.longitude,location:e[n],trial:this};t.push(r)}return t}}),_trialSearchInterval=null,_trialSearchMustStop=!1,_trialBatchSize=10,_trialNumExpected=0,_trialNumDone=0,_showGoodTrials=!0,_trialsPerPage=50,_run_id=null,_trial_locations=null;
\ No newline at end of file
+function initApp(){if(window!=window.top){$('#back_to_patient').hide();}
+loadDemographics();loadProblemList();}
+function loadDemographics(){$.ajax({'url':'demographics','dataType':'json'}).always(function(obj1,status,obj2){var json=('success'==status)?obj1:(('parsererror'==status)?{}:null);var demo={};if(json){demo=json;}
+else{console.warn('No good response for demographics',obj1,obj2);}
+$('#patient_overview').html(can.view('templates/patient_demographics.ejs',{'demo':demo}));});}
+function loadJSON(url,success_func,error_func){$.ajax({'url':url,'dataType':'json'}).always(function(obj1,status,obj2){if('success'==status){if(success_func){success_func(obj1,status,obj2);}
+else{console.warn('Successfully loaded',url,'but no success func is set')}}
+else{console.error('ERROR loading URL:',url,'RETURNED',obj1,status,obj2);if(success_func){error_func(obj1,status,obj2);}}});}
+Array.prototype.contains=function(obj){return(this.indexOf(obj)>=0);};if(!('indexOf'in Array.prototype)){Array.prototype.indexOf=function(obj){for(var i=0;i<this.length;i++){if(this[i]==obj){return i;}}
+return-1;};}
+Array.prototype.uniqueArray=function(){var uniq={};var new_arr=[];for(var i=0,l=this.length;i<l;++i){if(uniq.hasOwnProperty(this[i])){continue;}
+new_arr.push(this[i]);uniq[this[i]]=1;}
+return new_arr;};Array.prototype.intersects=function(other){for(var i=0;i<this.length;i++){for(var j=0;j<other.length;j++){if(this[i]===other[j]){return true;}}}
+return false;};function sortedKeysFromDict(dict){var sorted=[];for(var key in dict){sorted[sorted.length]=key;}
+sorted.sort();return sorted;}
+function sortChildren(parent,selector,sortFunc){var items=parent.children(selector).get();items.sort(sortFunc);$.each(items,function(idx,itm){parent.append(itm);});}
+function text2html(string){if(!string){return'';}
+var conv=string.replace(/(^\s+)|(\s+$)/g,'');conv=conv.replace(/(\r\n|\n)/g,"<br />");return conv;}
+function newUUID(){return'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g,function(c){var r=Math.random()*16|0;var v=c=='x'?r:(r&0x3|0x8);return v.toString(16);});}
+function hasLocalStorage(){try{return'localStorage'in window&&window['localStorage']!==null;}
+catch(e){}
+return false;}
+if(!window.console){(function(){var names=["log","debug","info","warn","error","assert","dir","dirxml","group","groupEnd","time","timeEnd","count","trace","profile","profileEnd"];var l=names.length;window.console={};for(var i=0;i<l;i++){window.console[names[i]]=function(){};}}());}
+function compareMedByNameASC(a,b){if(!('sp:drugName'in a)){return 1;}
+if(!('dcterms:title'in a['sp:drugName'])){return 1;}
+if(!('sp:drugName'in b)){return-1;}
+if(!('dcterms:title'in b['sp:drugName'])){return-1;}
+if(a['sp:drugName']['dcterms:title']<b['sp:drugName']['dcterms:title']){return-1;}
+if(a['sp:drugName']['dcterms:title']>b['sp:drugName']['dcterms:title']){return 1;}
+return 0;}
+function compareProblemByNameASC(a,b){if(!('sp:problemName'in a)){return 1;}
+if(!('dcterms:title'in a['sp:problemName'])){return 1;}
+if(!('sp:problemName'in b)){return-1;}
+if(!('dcterms:title'in b['sp:problemName'])){return-1;}
+if(a['sp:problemName']['dcterms:title']<b['sp:problemName']['dcterms:title']){return-1;}
+if(a['sp:problemName']['dcterms:title']>b['sp:problemName']['dcterms:title']){return 1;}
+return 0;}
+function compareByDateDESC(a,b){if(!('date'in a)){return 1;}
+if(!('date'in b)){return-1;}
+if(parseInt(a.date)<parseInt(b.date)){return 1;}
+if(parseInt(a.date)>parseInt(b.date)){return-1;}
+return 0;}
+var g_map=null;var g_geocoder=null;var g_pins=[];var g_highlighted_pin=null;var g_patient_pin=null;var g_patient_location=null;var g_marker_green=null;var g_marker_red=null;function _geo_initMap(){if(g_map){return;}
+var mapOptions={zoom:4,minZoom:3,maxZoom:15,center:new google.maps.LatLng(38.5,-96.5),mapTypeId:google.maps.MapTypeId.ROADMAP};g_map=new google.maps.Map($("#g_map").get(0),mapOptions);google.maps.event.addListener(g_map,'idle',function(){updateTrialLocations();});g_marker_green=new google.maps.MarkerImage("http://chart.apis.google.com/chart?chst=d_map_pin_letter&chld=%E2%80%A2|33CC22",new google.maps.Size(21,34),new google.maps.Point(0,0),new google.maps.Point(10,34));g_marker_red=new google.maps.MarkerImage("http://chart.apis.google.com/chart?chst=d_map_pin_letter&chld=%E2%80%A2|AA2200",new google.maps.Size(21,34),new google.maps.Point(0,0),new google.maps.Point(10,34));if(g_patient_location){_geo_zoomToPatient();}}
+function geo_showMap(){var h=Math.max(300,Math.round($(window).height()*0.4));$('#g_map').css('height',h+'px').show();if(!g_map){_geo_initMap();}}
+function geo_hideMap(){$('#g_map').hide();geo_unhighlightPin();}
+function geo_locatePatient(address,callback){if(!address||0==address.length){g_patient_location=null;if(callback){callback(false,null,null);}
+return;}
+geo_codeAddress(address,function(success,location){g_patient_location=location;if(g_map&&location){_geo_zoomToPatient();}
+if(callback){callback(success,location?location.lat():null,location?location.lng():null);}});}
+function geo_codeAddress(address,callback){if(!address){console.warn("No address given, cannot geo-code");if(callback){callback(false,null);}
+return;}
+if(!g_geocoder){g_geocoder=new google.maps.Geocoder();}
+g_geocoder.geocode({'address':address},function(results,status){var loc=null;if(google.maps.GeocoderStatus.OK==status){loc=results[0].geometry.location;}
+else if(google.maps.GeocoderStatus.ZERO_RESULTS){alert("The address \""+address+"\" could not be located.");}
+else{console.error("Geocode failed: "+status);}
+if(callback){callback(loc!=null,loc);}});}
+function geo_showPinClusters(clusters,click_func){geo_clearAllPins();for(var i=0;i<clusters.length;i++){var cluster=clusters[i];var options={map:g_map,position:new google.maps.LatLng(cluster.lat,cluster.lng),title:cluster.trials+' trial'+(1==cluster.trials?'':'s')+', '+cluster.count+' location'+(1==cluster.count?'':'s')};if(1==cluster.count){options.icon=g_marker_green;}
+else{options.icon={path:google.maps.SymbolPath.CIRCLE,scale:Math.min(30,10+3*Math.log(cluster.count)),fillColor:'#33CC22',fillOpacity:0.8,strokeColor:'#FFFFFF',strokeWeight:2};options.label={text:String(cluster.count),color:'#FFFFFF',fontSize:'11px'};}
+var marker=new google.maps.Marker(options);marker.cluster=cluster;if(click_func){google.maps.event.addListener(marker,'click',function(){click_func(this);});}
+g_pins.push(marker);}}
+function geo_highlightPin(pin){if(!pin){console.error("I need a pin to highlight");return;}
+if(g_highlighted_pin){g_highlighted_pin.setAnimation();}
+pin.setAnimation(google.maps.Animation.BOUNCE);g_highlighted_pin=pin;}
+function geo_unhighlightPin(){if(g_highlighted_pin){g_highlighted_pin.setAnimation();g_highlighted_pin=null;}}
+function geo_zoomToPins(fit_num){return;if(!g_map||!$('#g_map').is(':visible')){return;}
+if(!fit_num||fit_num<1){fit_num=5;}
+var latlngs=[];if(g_patient_location){latlngs.push(g_patient_location);}
+if(g_pins.length>0){if(!g_patient_location){for(var i=0;i<g_pins.length;i++){latlngs.push(g_pins[i].getPosition());}}
+else{var ll_tuples=[];for(var i=0;i<g_pins.length;i++){var pos=g_pins[i].getPosition();var dist=kmDistanceBetweenLocations(g_patient_location,pos);ll_tuples.push([pos,dist]);}
+ll_tuples.sort(function(a,b){return a[1]-b[1];});for(var i=0;i<Math.min(ll_tuples.length,fit_num);i++){latlngs.push(ll_tuples[i][0]);}}}
+if(latlngs.length<2){if(latlngs.length>0){g_map.setCenter(latlngs[0]);}
+g_map.setZoom(4);return;}
+var sw=new google.maps.LatLng(Math.min(latlngs[0].lat(),latlngs[1].lat())-1,Math.min(latlngs[0].lng(),latlngs[1].lng()));var ne=new google.maps.LatLng(Math.max(latlngs[0].lat(),latlngs[1].lat())+1,Math.max(latlngs[0].lng(),latlngs[1].lng()));var bounds=new google.maps.LatLngBounds(sw,ne);if(!bounds){console.error("Failed to get a bounds object to zoom the map");return;}
+for(var i=2;i<latlngs.length;i++){bounds.extend(latlngs[i]);}
+g_map.fitBounds(bounds);}
+function geo_clearAllPins(){for(var i=0;i<g_pins.length;i++){g_pins[i].setMap(null);}
+g_pins=[];g_highlighted_pin=null;}
+function _geo_zoomToPatient(){if(!g_patient_location){return;}
+if(!g_map){console.error("No map, cannot zoom to patient");return;}
+if(g_patient_pin){g_patient_pin.setMap(null);}
+g_patient_pin=new google.maps.Marker({map:g_map,position:g_patient_location});g_map.setCenter(g_patient_location);}
+function kmDistanceBetweenLocationsLatLng(lat1,lng1,lat2,lng2){var R=6371;var dLat=_geo_deg2rad(lat2-lat1);var dLon=_geo_deg2rad(lng2-lng1);var a=Math.sin(dLat/2)*Math.sin(dLat/2)+Math.cos(_geo_deg2rad(lat1))*Math.cos(_geo_deg2rad(lat2))*Math.sin(dLon/2)*Math.sin(dLon/2);var c=2*Math.asin(Math.sqrt(a));return R*c;}
+function kmDistanceBetweenLocations(l1,l2){return kmDistanceBetweenLocationsLatLng(l1.lat(),l1.lng(),l2.lat(),l2.lng());}
+function _geo_deg2rad(deg){return deg*(Math.PI/180)}
+function loadProblemList(){$.ajax({'url':'problems','dataType':'json'}).always(function(obj1,status,obj2){var json=('success'==status)?obj1:(('parsererror'==status)?{}:null);if(json){$('#patient_problems').html(can.view('templates/patient_problems.ejs',{'data':json,'last_manual_input':_last_manual_input}));}
+else{$('#patient_problems').text('Could not load the problem list, see the console for details');console.warn('No good response for problems',obj1,obj2);}});}
+function didClickProblem(problem_id,is_reload){var prob_elem=$('#'+problem_id);if(!$('#'+problem_id).is('*')){alert('Error, see Browser console');console.error('didClickProblem("'+problem_id+'") -- no such problem_id');return;}
+if(is_reload||!prob_elem.hasClass('active')){hideProblemsAndStartTrialSearch(problem_id);}
+else{cancelTrialSearchAndShowProblemList(problem_id);}}
+function hideProblemsAndStartTrialSearch(problem_id){var is_manual_problem=('prob_manual'==problem_id);var prob_name=$('#'+problem_id).find('div.problem_name').text();if(is_manual_problem){prob_name=$('#manual_problem').val();}
+if(!prob_name){$('#manual_problem').focus();return;}
+var prob_elem=$('#'+problem_id);prob_elem.addClass('active');$('#problem_list').find('li').each(function(idx,elem){if(problem_id!=elem.getAttribute('id')){$(elem).slideUp('fast');}});if(!is_manual_problem){var canc=$('#cancel_trials');if(!canc.is('*')){canc=$('<button/>',{'type':'button','id':'cancel_trials'}).text("Cancel");}
+prob_elem.prepend(canc);}
+else{$('#manual_cancel').show();$('#manual_submit').hide();}
+var refr=$('#refresh_trials');if(!refr.is('*')){refr=$('<button/>',{'type':'button','id':'refresh_trials'}).text("Refresh");}
+refr.click(function(e){didClickProblem(problem_id,true);e.stopPropagation();});prob_elem.prepend(refr);var gender=$('#select_female').is(':checked')?'female':'male';var age=1*$('#demo_age').val();if(is_manual_problem){searchTrialsByTerm(prob_name,gender,age,true);}
+else{searchTrialsByCondition(prob_name,gender,age,false);}}
+function cancelTrialSearchAndShowProblemList(problem_id){cancelTrialSearch();var num_problems=0;$('#problem_list').find('li').each(function(idx,elem){$(elem).slideDown('fast');num_problems++;});$('#refresh_trials').remove();$('#cancel_trials').remove();$('#manual_cancel').hide();$('#manual_submit').show();if(problem_id&&num_problems>1){$('#'+problem_id).removeClass('active');}}
+var TrialLocation=can.Construct({},{distance:null,init:function(json){for(var key in json){if(json.hasOwnProperty(key)){this[key]=json[key];}}},kmDistanceTo:function(to_location){if(to_location&&'geodata'in this){this.distance=kmDistanceBetweenLocationsLatLng(to_location.lat(),to_location.lng(),this.geodata.latitude,this.geodata.longitude);}
+else if(to_location){console.warn("No geodata for trial location: ",this);this.distance=null;}
+return this.distance;}});function _toggleTrialLocationContact(elem){var link=$(elem);var loc=link.siblings('.loc_contact');if(loc.is(':visible')){loc.fadeOut('fast');}
+else{loc.show();loc.css('left',(link.outerWidth()-loc.outerWidth())/2+link.position().left);}}
+var Trial=can.Construct({},{reason:null,intervention_types:null,trial_phases:null,trial_locations:null,did_add_pins:false,distance:null,location_count:null,init:function(json){for(var key in json){if(json.hasOwnProperty(key)){this[key]=json[key];}}},interventionTypes:function(){if(null==this.intervention_types){var types=[];if('intervention'in this&&this.intervention){for(var i=0;i<this.intervention.length;i++){if('intervention_type'in this.intervention[i]){types.push(this.intervention[i].intervention_type);}}
+types=types.uniqueArray();}
+if(types.length<1){types=['Observational'];}
+this.intervention_types=types;}
+return this.intervention_types;},trialPhases:function(){if(null==this.trial_phases){if(!'phase'in this||!this.phase){this.phase='N/A';}
+var phases=['N/A'];if('N/A'!=this.phase){phases=this.phase.split('/');}
+this.trial_phases=phases;}
+return this.trial_phases;},locations:function(){if(null===this.trial_locations){if('location'in this&&this.location){var locs=[];for(var i=0;i<this.location.length;i++){locs.push(this.makeLocation(this.location[i]));}
+this.trial_locations=locs;}}
+return this.trial_locations;},makeLocation:function(loc){var loc_parts=(loc.geodata&&loc.geodata.formatted&&loc.geodata.formatted.length>0)?loc.geodata.formatted.split(/,\s+/):["Unknown"];var loc_country=loc_parts.pop();var loc_stat_m_recr=loc.status?loc.status.match(/recruiting/i):null;var loc_stat_m_not=loc.status?loc.status.match(/not\s+[\w\s]*\s+recruiting/i):null;var loc_dict={'trial':this,'name':('facility'in loc&&loc.facility.name)?loc.facility.name:'','city':(loc_parts.length>0)?loc_parts.join(', '):'','country':loc_country,'geodata':('geodata'in loc?loc.geodata:null),'distance':('distance'in loc?loc.distance:null),'status':loc.status,'status_color':loc_stat_m_not?'orange':(loc_stat_m_recr?'green':'red'),'contact':('contact'in loc&&loc.contact)?loc.contact:null}
+return new TrialLocation(loc_dict);},loadMoreLocations:function(callback){var trial=this;var have=this.location?this.location.length:0;loadJSON('trial_runs/'+_run_id+'/trials/'+this.nct+'/sites?offset='+have,function(obj1,status,obj2){trial.location=(trial.location||[]).concat(obj1['location']||[]);trial.location_count=trial.location.length;trial.trial_locations=null;callback();},function(obj1,status,obj2){console.error('Failed to load locations of '+trial.nct+': ',obj2);});},showClosestLocations:function(to_location,elem,start,num,animated){var loc_elem=elem.find('.trial_locations');var locs=this.locations();var total=Math.max(this.location_count||0,locs?locs.length:0);if(locs&&locs.length>0){loc_elem.find('.show_more_locations').remove();var max=Math.min(total-start,num);if(total-start-max<3){max=total-start;}
+max+=start;if(max>locs.length){var trial=this;this.loadMoreLocations(function(){trial.showClosestLocations(to_location,elem,start,num,animated);});return;}
+var i=start;for(;i<max;i++){var loc=locs[i];if(null===loc.distance){loc.kmDistanceTo(to_location);}
+var fragment=can.view('templates/trial_location.ejs',{'loc':loc});loc_elem.append(fragment);}
+if(i<total){var trial=this;var n_max=10;var next=(total-i-n_max<3)?total-i:n_max;var link=$('<a/>',{'href':'javascript:void(0)'}).text('Show '+((next<total-i)?'next '+next:' all')).click(function(evt){if(trial){trial.showClosestLocations(to_location,elem,i,next,true);}
+else{console.error("The trial object is undefined");}});var div=$('<div/>').addClass('trial_location').addClass('show_more_locations');var h3=$('<h3/>').html('There are '+(total-i)+' more locations<br />');h3.append(link);div.append(h3);if(animated){div.hide();loc_elem.append(div);div.fadeIn('fast');}
+else{loc_elem.append(div);}}}
+else{var div=$('<div class="trial_location"><h3>No trial locations available</h3></div>');loc_elem.append(div);}},showLocation:function(elem,location){var fragment=can.view('templates/trial_location.ejs',{'loc':location});elem.find('.trial_locations').append(fragment);}});function _toggleEligibilityCriteria(elem,trial_nct){var link=$(elem);var trial_elem=link.closest('.trial');var crit_elem=trial_elem.find('.formatted_criteria').first();if(crit_elem.is(':visible')){crit_elem.hide();link.text('Show eligibility criteria');}
+else{crit_elem.show();link.text('Hide eligibility criteria');if(0==crit_elem.text().length){_loadEligibilityCriteria(crit_elem,trial_nct);}}}
+function _loadEligibilityCriteria(into_elem,trial_nct){var crit_elem=$(into_elem);crit_elem.text('Loading...');loadJSON('trials/'+trial_nct+'/criteria_html',function(obj1,status,obj2){if('criteria'in obj1){crit_elem.html(obj1['criteria']);}
+else{console.log('Expected JSON response with a "criteria" dictionary, but got these: ',obj1,status,obj2);crit_elem.text("(unknown criteria)")}},function(obj1,status,obj2){crit_elem.html('Error getting criteria: '+obj2+'.<br /><a href="javascript:void();" onclick="_loadEligibilityCriteria(this.parentNode, \''+trial_nct+'\')">Try again</a>.');});}
+function hideTooManyCategoryTags(link){var elem=$(link);var reference=elem.parent();var before_height=reference.height();elem.siblings().show().filter('.over_limit').hide();elem.hide();var offset=reference.height()-before_height;window.scrollBy(0,offset);}
+var _trialSearchInterval=null;var _trialSearchMustStop=false;var _trialStatusSource=null;var _trialBatchSize=10;var _trialNumExpected=0;var _trialNumDone=0;var _showGoodTrials=true;var _trialsPerPage=50;var _sitesPerTrial=10;var _run_id=null;var _trialListQuery=null;var _trialsByNCT={};var _pinLoad=0;var _trialListLoad=0;function searchTrialsByTerm(prob_term,gender,age,remember_term){_trialSearchMustStop=false;_initTrialSearch(prob_term,null,gender,age,remember_term);}
+function searchTrialsByCondition(prob_name,gender,age,remember_cond){_trialSearchMustStop=false;_initTrialSearch(null,prob_name,gender,age,remember_cond);}
+function cancelTrialSearch(){_trialSearchMustStop=true;_stopWatchingTrialStatus();showTrialStatus();resetUI();}
+function resetUI(){$('#trial_selectors').find('.trial_selector').empty();$('#trial_selectors').find('.trial_opt_selector > ul').empty();$('#trial_selectors').hide();resetShownTrials();hideNoTrialsHint();}
+function resetShownTrials(){$('#trial_list').empty();showNoTrialsHint();cleanMap();geo_hideMap();$('#g_map_toggle').hide().find('a').text('Show Map');}
+function cleanMap(){_trialListQuery=null;_trialsByNCT={};geo_clearAllPins();$('#g_map_toggle > span').text('');$('#selected_trial').empty().hide();}
+function _initTrialSearch(term,condition,gender,age,remember_input){if(_trialSearchInterval||_trialStatusSource){console.warn('Already searching');return;}
+resetUI();_run_id=null;showTrialStatus('Starting...');geo_locatePatient($('#demo_location').val(),function(success,lat,lng){var location=success?(lat+','+lng):null;var data={'gender':gender,'age':age,'latlng':location,'remember_input':remember_input?true:false};var term_or_cond=term?term:condition;data[term?'term':'cond']=term_or_cond;$.ajax({'url':'trial_runs','data':data}).always(function(obj1,status,obj2){if(_trialSearchMustStop){return;}
+if('success'==status){_run_id=obj1;_watchTrialStatus();}
+else{showTrialStatus('Error searching for trials: '+obj2);}});});}
+function _watchTrialStatus(){_stopWatchingTrialStatus();if(_useProgressStream&&window.EventSource){_trialStatusSource=new EventSource('trial_runs/'+_run_id+'/progress/stream');_trialStatusSource.onmessage=function(evt){if(!_trialSearchMustStop){_trialStatusChanged(evt.data);}};_trialStatusSource.onerror=function(evt){if(_trialStatusSource&&EventSource.CLOSED==_trialStatusSource.readyState){_stopWatchingTrialStatus();if(!_trialSearchMustStop&&_run_id){_trialSearchInterval=window.setInterval(function(){checkTrialStatus();},1000);}}};}
+else{_trialSearchInterval=window.setInterval(function(){checkTrialStatus();},1000);}}
+function _stopWatchingTrialStatus(){if(_trialStatusSource){_trialStatusSource.close();_trialStatusSource=null;}
+if(_trialSearchInterval){window.clearInterval(_trialSearchInterval);_trialSearchInterval=null;}}
+function checkTrialStatus(){if(!_run_id){return;}
+$.ajax({'url':'trial_runs/'+_run_id+'/progress'}).always(function(obj1,status,obj2){if(_trialSearchMustStop){return;}
+if('success'==status){_trialStatusChanged(obj1);}
+else{console.error(obj1,status,obj2);showTrialStatus('Error checking trial status: '+obj2);_stopWatchingTrialStatus();}});}
+function _trialStatusChanged(run_status){if('done'==run_status){_stopWatchingTrialStatus();showTrialStatus('Filtering by demographics...');_filterTrialsByDemographics(_run_id);}
+else{if(run_status&&run_status.length>5&&run_status.match(/^error/i)){_stopWatchingTrialStatus();}
+showTrialStatus(run_status);}}
+function _filterTrialsByDemographics(run_id){loadJSON('trial_runs/'+run_id+'/filter/demographics',function(obj1,status,obj2){showTrialStatus('Filtering by problem list...');_filterTrialsByProblems(run_id);},function(obj1,status,obj2){showTrialStatus('Error filtering trials (demographics): '+obj2);});}
+function _filterTrialsByProblems(run_id){loadJSON('trial_runs/'+run_id+'/filter/problems',function(obj1,status,obj2){loadTrialOverview(run_id);},function(obj1,status,obj2){showTrialStatus('Error filtering trials (problems): '+obj2);});}
+function loadTrialOverview(run_id){loadJSON('trial_runs/'+run_id+'/overview',function(obj1,status,obj2){if('intervention_types'in obj1&&'drug_phases'in obj1){_fillInterventionTypes(obj1['intervention_types']);_fillTrialPhases(obj1['drug_phases']);showTrialStatus();showNoTrialsHint();$('#trial_selectors').show();}
+else{console.error('Malformed response:',obj1)}},function(obj1,status,obj2){showTrialStatus('Error retrieving overview data: '+obj2);});}
+function _fillInterventionTypes(num_per_type){if(num_per_type){var opt_type=$('#selector_inv_type');var itypes=sortedKeysFromDict(num_per_type);for(var i=0;i<itypes.length;i++){var type=itypes[i];var elem=_getOptCheckElement(type,0,false);elem.data('intervention-type',type);opt_type.append(elem);elem.find('.num_matches').text(num_per_type[type]);}
+sortChildren(opt_type,'li',function(a,b){return $(a).text().toLowerCase().localeCompare($(b).text().toLowerCase());});}}
+function _fillTrialPhases(num_per_phase){if(num_per_phase){var opt_phase=$('#selector_inv_phase').empty();var phases=sortedKeysFromDict(num_per_phase);for(var i=0;i<phases.length;i++){var phase=phases[i];var elem=_getOptCheckElement(phase,0,true);elem.data('phase',phase);opt_phase.append(elem);elem.find('.num_matches').text(num_per_phase[phase]);}
+if(phases.length>0){sortChildren(opt_phase,'li',function(a,b){return $(a).text().toLowerCase().localeCompare($(b).text().toLowerCase());});}}}
+function _getOptRadioElement(main,accessory,active){var elem=$('<li/>',{'href':'javascript:void(0)'});var uuid=newUUID();var input=$('<input/>',{'id':uuid,'type':'radio','name':'ugly_hack'});input.change(_toggleShowGoodTrials);elem.append(input);elem.append($('<label/>',{'for':uuid}).text(main));elem.append($('<span/>').addClass('num_matches').text(accessory));if(active){elem.addClass('active');input.prop('checked',true);}
+return elem;}
+function _getOptCheckElement(main,accessory,active){var elem=$('<li/>',{'href':'javascript:void(0)'});var uuid=newUUID();var input=$('<input/>',{'id':uuid,'type':'checkbox'});elem.append(input);elem.append($('<label/>',{'for':uuid}).text(main));elem.append($('<span/>').addClass('num_matches').text(accessory));input.change(_toggleOptCheckElement);if(active){elem.addClass('active');input.prop('checked',true);}
+return elem;}
+function _toggleShowGoodTrials(evt){alert('re-implement me!');_showGoodTrials=!_showGoodTrials;updateShownHiddenTrials();}
+function _toggleOptCheckElement(evt){var elem=$(this).parent();if(elem.find('input').prop('checked')){elem.addClass('active');}
+else{elem.removeClass('active');}
+var from_types='selector_inv_type'==elem.parent().attr('id');updateShownHiddenTrials(from_types);}
+function _toggleKeyword(elem){console.warn('keyword selection has been turned off');return;var keyword=$(elem).text();var norm=_normalizeKeyword(keyword);var for_nct=$(elem).parent().data('trial-nct');var offset=$(elem).offset().top;var scroll_top=$(window).scrollTop();var parent=$('#selector_keywords');var present=false;var num=0;parent.children('span').each(function(idx){if(norm==$(this).data('normalized')){present=true;$(this).remove();}
+else{num++;}});if(!present){var span=$('<span/>').addClass('tag').addClass('active').data('normalized',norm).text(keyword).click(function(e){_toggleKeyword(this);});parent.append(span).parent().show();}
+else if(0==num){parent.parent().hide();}
+if(offset>0){offset-=144;var new_elem=null;$('#trial_list').children().each(function(idx){var trial=$(this).find('.trial').data('trial');if(trial&&trial.nct==for_nct){new_elem=$(this);return false;}});if(new_elem){var new_top=new_elem.offset().top-(offset-scroll_top);$(window).scrollTop(new_top);}}}
+function _normalizeKeyword(keyword){return keyword?keyword.toLowerCase():null;}
+function updateShownHiddenTrials(from_types){if(!_run_id){showTrialStatus("I have lost track of our run, please search again");return;}
+_trialListLoad++;showNoTrialsHint('Loading…');$('#trial_selectors').find('input[type="checkbox"]').prop('disabled',true);cleanMap();var qry_parts=[];var active_types=[];$('#selector_inv_type').children('li').each(function(idx,item){var elem=$(item);if(elem.hasClass('active')){active_types.push(elem.data('intervention-type'));}});if(active_types.length>0){qry_parts.push('intv='+active_types.join('|'));}
+var all_phases=[];var active_phases=[];$('#selector_inv_phase').children('li').each(function(idx,item){var elem=$(item);all_phases.push(elem);if(elem.hasClass('active')){active_phases.push(elem.data('phase'));}});if(active_phases.length>0){if(active_phases.length<all_phases.length){qry_parts.push('phases='+active_phases.join('|'));}}
+else{$(all_phases).each(function(idx,elem){elem.find('input').prop('checked',true);elem.addClass('active');});}
+if(all_phases.length>0&&active_types.length>0){$('#selector_inv_phase_parent').show();}
+else{$('#selector_inv_phase_parent').hide();}
+var active_keywords=[];$('#selector_keywords').children('span').each(function(idx,item){active_keywords.push($(item).data('normalized'));});if(0==active_types.length&&0==active_keywords.length){resetShownTrials();$('#trial_selectors').find('input[type="checkbox"]').prop('disabled',false);return;}
+if(from_types){qry_parts.push('reload_phases=1');$('#selector_inv_phase').find('.num_matches').text('…');}
+var qry=qry_parts.join('&');_trialListQuery=qry.replace(/(^|&)reload_phases=1/,'');_loadTrialPage(qry,0,[],_trialListLoad);}
+function _loadTrialPage(qry,offset,trials,load_id){var page_qry=(0==offset)?qry:qry.replace(/(^|&)reload_phases=1/,'');loadJSON('trial_runs/'+_run_id+'/trials?'+page_qry+'&offset='+offset+'&limit='+_trialsPerPage+'&sites='+_sitesPerTrial+'&fields=list',function(obj1,status,obj2){if(load_id!=_trialListLoad){return;}
+var page=obj1['trials']||[];trials.push.apply(trials,page);if(0==offset){hideNoTrialsHint();_showTrials(trials,0);if('drug_phases'in obj1){_fillTrialPhases(obj1['drug_phases']);}
+$('#trial_selectors').find('input[type="checkbox"]').prop('disabled',false);}
+else{_registerTrials(trials,trials.length-page.length);var shown=$('#trial_list').children('li').not('#show_more_trials').length;_showMoreTrialsLink(trials,shown);}
+if(null!==obj1['next']&&undefined!==obj1['next']){_loadTrialPage(qry,obj1['next'],trials,load_id);}
+else{window.setTimeout(geo_zoomToPins,100);}},function(obj1,status,obj2){if(load_id!=_trialListLoad){return;}
+showTrialStatus('Error loading trials: '+obj2);hideNoTrialsHint();$('#trial_selectors').find('input[type="checkbox"]').prop('disabled',false);});}
+function _showTrials(trials,start){var trial_list=$('#trial_list');if(!start||0==start){trial_list.empty();}
+$('#show_more_trials').remove();$('#g_map_toggle').show();if(!trials||0==trials.length||start>=trials.length){if(trials.length>0&&start>=trials.length){console.warn('Cannot show trials starting at: ',start,'trials: ',trials);}
+if(!trials||0==trials.length){$('#g_map_toggle > span').text('');showNoTrialsHint();}
+return;}
+var active_keywords=[];$('#selector_keywords').children('span').each(function(idx,item){active_keywords.push($(item).data('normalized'));});var show_max=start+_trialsPerPage;if(trials.length>show_max&&trials.length<start+_trialsPerPage+(_trialsPerPage/10)){show_max=trials.length+start;}
+for(var i=start;i<trials.length&&i<show_max;i++){var trial=(trials[i]instanceof Trial)?trials[i]:new Trial(trials[i]);trials[i]=trial;var li=$('<li/>').append(can.view('templates/trial_item.ejs',{'trial':trial,'active_keywords':active_keywords}));trial_list.append(li);trial.showClosestLocations(g_patient_location,li,0,3);}
+if(0==start){_registerTrials(trials,0);if($('#g_map').is(':visible')){updateTrialLocations();}}
+hideNoTrialsHint();_showMoreTrialsLink(trials,Math.min(trials.length,show_max));}
+function _registerTrials(trials,start){for(var i=start;i<trials.length;i++){if(!(trials[i]instanceof Trial)){trials[i]=new Trial(trials[i]);}
+_trialsByNCT[trials[i].nct]=trials[i];}}
+function _showMoreTrialsLink(trials,num_shown){$('#show_more_trials').remove();var more=trials.length-num_shown;if(more>0){var li=$('<li/>',{'id':'show_more_trials'}).append('<h1>There are '+more+' more trials</h1>');var link=$('<a/>',{'href':'javascript:void(0);'}).text('Show '+((_trialsPerPage<more)?_trialsPerPage+' more':'all')).click(function(e){_showTrials(trials,num_shown);});li.append($('<h1/>').append(link));$('#trial_list').append(li);}}
+function toggleTrialMap(){var map=$('#g_map');if(map.is(':visible')){var link_offset=$('#g_map_toggle').offset().top-$(window).scrollTop();geo_hideMap();geo_clearAllPins();$('#g_map_toggle > a').text('Show Map');$('#selected_trial').empty().hide();var new_offset=$('#g_map_toggle').offset().top-$(window).scrollTop();if(Math.abs(link_offset-new_offset)>50){$(window).scrollTop(Math.max(0,$('#g_map_toggle').offset().top-link_offset));}}
+else{geo_showMap();$('#g_map_toggle > a').text('Hide Map');window.setTimeout(function(){updateTrialLocations();},200);}}
+function updateTrialLocations(){if(!g_map||!_run_id||!_trialListQuery||!g_map.getBounds()){return;}
+var pin_load=++_pinLoad;loadJSON('trial_runs/'+_run_id+'/pins?'+_trialListQuery+'&zoom='+g_map.getZoom()+'&bbox='+g_map.getBounds().toUrlValue(),function(obj1,status,obj2){if(pin_load!=_pinLoad){return;}
+var total=obj1['total']||0;$('#g_map_toggle > span').text(total>1000?' ('+total+' trial locations)':'');geo_showPinClusters(obj1['clusters']||[],_clickedPinCluster);},function(obj1,status,obj2){console.error('Failed to load map pins: ',obj2);});}
+function _clickedPinCluster(marker){var cluster=marker.cluster;if(!cluster.sites){var b=cluster.bounds;g_map.fitBounds(new google.maps.LatLngBounds(new google.maps.LatLng(b[0],b[1]),new google.maps.LatLng(b[2],b[3])));return;}
+var pins=[];for(var i=0;i<cluster.sites.length;i++){var trial=_trialsByNCT[cluster.sites[i].nct];if(trial){pins.push({'trial':trial,'location':trial.makeLocation(cluster.sites[i].location)});}
+else{console.warn('Trial '+cluster.sites[i].nct+' has not been loaded yet');}}
+geo_highlightPin(marker);showTrialsforPins(pins);}
+function showTrialsforPins(pins){var map_offset=$('#g_map').offset().top-$(window).scrollTop();var area=$('#selected_trial').empty().show();for(var i=0;i<pins.length;i++){var pin=pins[i];var li=$('<li/>').append(can.view('templates/trial_item.ejs',{'trial':pin.trial,'active_keywords':null}));li.append('<a class="dismiss_link" href="javascript:void(0);" onclick="dismissShownTrial(this)">dismiss</a>');area.append(li);pin.trial.showLocation(li,pin.location);}
+var new_offset=$('#g_map').offset().top-$(window).scrollTop();if(Math.abs(new_offset-map_offset)>50){$(window).scrollTop(Math.max(200,$('#g_map').offset().top-map_offset));}}
+function dismissShownTrial(link){var elem=$(link).closest('li').slideUp('fast',function(){$(this).remove();var area=$('#selected_trial');if(0==area.find('li').length){area.hide();}});geo_unhighlightPin();}
+function showTrialStatus(status){var stat=$('#trial_status');if(!status){stat.hide();return;}
+stat.show().text(status);}
+function showNoTrialsHint(override_text){var hint=$('#no_trials_hint');if(!hint.is('*')){hint=$('<h3/>',{'id':'no_trials_hint'});$('#trials').prepend(hint);}
+if(override_text&&override_text.length>0){hint.text(override_text);return;}
+var has_type=false;$('#selector_inv_type').children('li').each(function(idx,item){if($(item).find('input').prop('checked')){has_type=true;return;}});if(has_type){var has_phase=false;if($('#selector_inv_phase').is(':visible')){$('#selector_inv_phase').children('li').each(function(idx,item){if($(item).find('input').prop('checked')){has_phase=true;return;}});}
+if(!has_phase){hint.text("Please select at least one trial phase");}
+else{hint.text("It seems no trials match your criteria");}}
+else{hint.text("Please select at least one intervention or observation");}}
+function hideNoTrialsHint(){$('#no_trials_hint').remove();}
\ No newline at end of file
@@ -0,0 +1,408 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  Streaming import of the SNOMED CT (RF2) and RxNorm (RRF) release files
+#  into the SQLite databases used by the lookup classes, and of the GeoNames
+#  gazetteer used by geocoder.py.
+#
+#  Rows are inserted in large transactions with indexes created only once all
+#  rows are in. Every batch stores a checkpoint (the byte offset in the source
+#  file) in the same transaction, so an interrupted import picks up where it
+#  stopped when started again.
+#
+#    $ python termimport.py snomed [databases/snomed_desc.csv databases/snomed_rel.csv]
+#    $ python termimport.py rxnorm path/to/rrf
+#    $ python termimport.py geonames path/to/geonames
+#    $ python termimport.py benchmark [num_rows]
+
+import os
+import sys
+import time
+import random
+import logging
+import sqlite3
+import tempfile
+
+from geocoder import place_key
+
+
+DB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'databases')
+PRAGMAS = [
+	'PRAGMA journal_mode = WAL',
+	'PRAGMA synchronous = NORMAL',
+	'PRAGMA cache_size = -200000',
+	'PRAGMA temp_store = MEMORY',
+]
+
+
+class BulkImport(object):
+	""" Streams one delimited file into `table`. Subclasses define the table,
+	how a line becomes a row and the statements that turn the imported rows
+	into the final tables.
+	"""
+	
+	name = None				# unique per database, used for the checkpoint
+	table = None
+	columns = None
+	create_sql = None
+	delimiter = '\t'
+	has_header = True
+	finish_sql = []
+	min_sqlite_version = None		# of the SQLite library, for newer SQL
+	
+	def __init__(self, source_path, db_path, batch_size=20000):
+		self.source_path = source_path
+		self.db_path = db_path
+		self.batch_size = batch_size
+		self.rows_imported = 0
+		self.rows_skipped = 0
+		self.duration = 0
+	
+	def row(self, fields):
+		""" Returns the tuple to insert for the fields of one line, None to
+		skip the line. """
+		raise NotImplementedError()
+	
+	@property
+	def insert_sql(self):
+		return 'INSERT INTO %s VALUES (%s)' % (self.table, ', '.join(['?'] * len(self.columns)))
+	
+	def connect(self):
+		# we handle transactions ourselves, also around schema changes
+		conn = sqlite3.connect(self.db_path, isolation_level=None)
+		for pragma in PRAGMAS:
+			conn.execute(pragma)
+		conn.execute('''CREATE TABLE IF NOT EXISTS import_checkpoints
+			(name TEXT PRIMARY KEY, source_size INTEGER, source_mtime INTEGER,
+			offset INTEGER, rows INTEGER, finished INTEGER)''')
+		return conn
+	
+	def run(self, force=False):
+		""" Imports the file, resuming a previous import of the same file if
+		there is one. Returns False if the file had already been imported. """
+		if self.min_sqlite_version is not None and sqlite3.sqlite_version_info < self.min_sqlite_version:
+			raise RuntimeError("%s: needs SQLite %s or newer, Python uses SQLite %s" % (self.name, '.'.join([str(v) for v in self.min_sqlite_version]), sqlite3.sqlite_version))
+		
+		conn = self.connect()
+		stat = os.stat(self.source_path)
+		source = (stat.st_size, int(stat.st_mtime))
+		
+		offset = 0
+		row = conn.execute('SELECT source_size, source_mtime, offset, rows, finished FROM import_checkpoints WHERE name = ?', (self.name,)).fetchone()
+		if row is not None and source == tuple(row[:2]) and not force:
+			if row[4]:
+				logging.info("%s: already imported from %s" % (self.name, self.source_path))
+				conn.close()
+				return False
+			offset = row[2]
+			self.rows_imported = row[3]
+			logging.info("%s: resuming at row %d" % (self.name, self.rows_imported))
+		else:
+			conn.execute('DROP TABLE IF EXISTS %s' % self.table)
+		
+		conn.execute(self.create_sql)
+		conn.execute('INSERT OR REPLACE INTO import_checkpoints VALUES (?, ?, ?, ?, ?, 0)', (self.name, source[0], source[1], offset, self.rows_imported))
+		
+		start = time.time()
+		started_at = self.rows_imported
+		with open(self.source_path, 'rb') as handle:
+			handle.seek(offset)
+			if 0 == offset and self.has_header:
+				offset += len(handle.readline())
+			
+			batch = []
+			for line in handle:
+				offset += len(line)
+				row = self.row(line.rstrip('\r\n').split(self.delimiter))
+				if row is None:
+					self.rows_skipped += 1
+					continue
+				
+				batch.append(row)
+				if len(batch) >= self.batch_size:
+					self._commit_batch(conn, batch, offset, stat.st_size, start, started_at)
+					batch = []
+			
+			self._commit_batch(conn, batch, offset, stat.st_size, start, started_at)
+		
+		# build the final tables and indexes now that all rows are in
+		logging.info("%s: finishing" % self.name)
+		conn.execute('BEGIN')
+		for sql in self.finish_sql:
+			conn.execute(sql)
+		conn.execute('UPDATE import_checkpoints SET finished = 1 WHERE name = ?', (self.name,))
+		conn.execute('COMMIT')
+		conn.close()
+		
+		self.duration = time.time() - start
+		logging.info("%s: imported %d rows in %.1f seconds" % (self.name, self.rows_imported, self.duration))
+		return True
+	
+	def _commit_batch(self, conn, batch, offset, size, start, started_at):
+		conn.execute('BEGIN')
+		if len(batch) > 0:
+			conn.executemany(self.insert_sql, batch)
+		self.rows_imported += len(batch)
+		conn.execute('UPDATE import_checkpoints SET offset = ?, rows = ? WHERE name = ?', (offset, self.rows_imported, self.name))
+		conn.execute('COMMIT')
+		
+		elapsed = max(time.time() - start, 0.001)
+		logging.info("%s: %d rows (%.1f%%), %d rows/s" % (self.name, self.rows_imported, 100.0 * offset / max(size, 1), (self.rows_imported - started_at) / elapsed))
+
+
+class RF2Import(BulkImport):
+	""" RF2 "Full" releases contain every version of every component. Rows
+	are staged keyed by component id, keeping only the latest version, and
+	only the ones active in that version make it into the final table.
+	The UPSERT doing so needs SQLite 3.24.
+	"""
+	
+	min_sqlite_version = (3, 24, 0)
+	
+	@property
+	def insert_sql(self):
+		updates = ', '.join(['%s = excluded.%s' % (c, c) for c in self.columns[1:]])
+		return '''INSERT INTO %s VALUES (%s) ON CONFLICT (id) DO UPDATE SET %s
+			WHERE excluded.effective > %s.effective''' % (self.table, ', '.join(['?'] * len(self.columns)), updates, self.table)
+
+
+class SNOMEDDescriptionImport(RF2Import):
+	name = 'snomed_descriptions'
+	table = 'rf2_descriptions'
+	columns = ['id', 'effective', 'active', 'concept_id', 'lang', 'type_id', 'term']
+	create_sql = '''CREATE TABLE IF NOT EXISTS rf2_descriptions
+		(id INTEGER PRIMARY KEY, effective TEXT, active INTEGER, concept_id INTEGER,
+		lang TEXT, type_id INTEGER, term TEXT)'''
+	finish_sql = [
+		'DROP TABLE IF EXISTS descriptions',
+		'CREATE TABLE descriptions (concept_id INTEGER, lang TEXT, term TEXT, isa VARCHAR, active INTEGER)',
+		'''INSERT INTO descriptions
+			SELECT concept_id, lang, term, CASE type_id WHEN 900000000000003001 THEN 'full' ELSE 'synonym' END, active
+			FROM rf2_descriptions WHERE active = 1''',
+		'CREATE INDEX descriptions_concept ON descriptions (concept_id)',
+		'DROP TABLE rf2_descriptions',
+	]
+	
+	def row(self, f):
+		if len(f) < 8:
+			return None
+		return (int(f[0]), f[1], int(f[2]), int(f[4]), f[5], int(f[6]), f[7].decode('utf-8'))
+
+
+class SNOMEDRelationshipImport(RF2Import):
+	name = 'snomed_relationships'
+	table = 'rf2_relationships'
+	columns = ['id', 'effective', 'active', 'source_id', 'destination_id', 'type_id']
+	create_sql = '''CREATE TABLE IF NOT EXISTS rf2_relationships
+		(id INTEGER PRIMARY KEY, effective TEXT, active INTEGER, source_id INTEGER,
+		destination_id INTEGER, type_id INTEGER)'''
+	finish_sql = [
+		'DROP TABLE IF EXISTS relationships',
+		'''CREATE TABLE relationships (relationship_id INTEGER PRIMARY KEY, source_id INTEGER,
+			destination_id INTEGER, rel_type INTEGER, rel_text VARCHAR, active INTEGER)''',
+		'''INSERT INTO relationships
+			SELECT id, source_id, destination_id, type_id, CASE type_id WHEN 116680003 THEN 'isa' END, active
+			FROM rf2_relationships WHERE active = 1''',
+		'CREATE INDEX relationships_source ON relationships (source_id)',
+		'CREATE INDEX relationships_destination ON relationships (destination_id)',
+		'DROP TABLE rf2_relationships',
+	]
+	
+	def row(self, f):
+		if len(f) < 8:
+			return None
+		return (int(f[0]), f[1], int(f[2]), int(f[4]), int(f[5]), int(f[7]))
+
+
+class RRFImport(BulkImport):
+	""" RxNorm's RRF files hold the current release only, suppressed rows
+	(SUPPRESS other than "N") are skipped. """
+	
+	delimiter = '|'
+	has_header = False
+	
+	@property
+	def create_sql(self):
+		return 'CREATE TABLE IF NOT EXISTS %s (%s)' % (self.table, ', '.join(['%s TEXT' % c for c in self.columns]))
+	
+	def row(self, f):
+		suppress = self.columns.index('SUPPRESS')
+		if len(f) <= suppress or 'N' != f[suppress]:
+			return None
+		return [v.decode('utf-8') for v in f[:len(self.columns)]]
+
+
+class RXNCONSOImport(RRFImport):
+	name = 'rxnorm_rxnconso'
+	table = 'RXNCONSO'
+	columns = ['RXCUI', 'LAT', 'TS', 'LUI', 'STT', 'SUI', 'ISPREF', 'RXAUI', 'SAUI', 'SCUI',
+		'SDUI', 'SAB', 'TTY', 'CODE', 'STR', 'SRL', 'SUPPRESS', 'CVF']
+	finish_sql = [
+		'CREATE INDEX IF NOT EXISTS X_RXNCONSO_RXCUI ON RXNCONSO (RXCUI)',
+		'CREATE INDEX IF NOT EXISTS X_RXNCONSO_RXAUI ON RXNCONSO (RXAUI)',
+		'CREATE INDEX IF NOT EXISTS X_RXNCONSO_CODE ON RXNCONSO (SAB, CODE)',
+	]
+
+
+class RXNRELImport(RRFImport):
+	name = 'rxnorm_rxnrel'
+	table = 'RXNREL'
+	columns = ['RXCUI1', 'RXAUI1', 'STYPE1', 'REL', 'RXCUI2', 'RXAUI2', 'STYPE2', 'RELA',
+		'RUI', 'SRUI', 'SAB', 'SL', 'DIR', 'RG', 'SUPPRESS', 'CVF']
+	finish_sql = [
+		'CREATE INDEX IF NOT EXISTS X_RXNREL_RXCUI1 ON RXNREL (RXCUI1)',
+		'CREATE INDEX IF NOT EXISTS X_RXNREL_RXCUI2 ON RXNREL (RXCUI2)',
+	]
+
+
+class GeoNamesImport(BulkImport):
+	""" GeoNames dumps are tab-separated UTF-8 without a header, lines
+	starting with "#" are comments. """
+	
+	has_header = False
+	
+	def row(self, f):
+		if len(f) < self.min_fields or f[0].startswith('#'):
+			return None
+		try:
+			return self.geonames_row([v.decode('utf-8') for v in f])
+		except ValueError:
+			return None
+
+
+class PostalCodeImport(GeoNamesImport):
+	name = 'geonames_postal_codes'
+	table = 'postal_codes'
+	columns = ['country', 'code', 'place', 'place_key', 'admin1', 'admin1_key', 'lat', 'lng']
+	create_sql = '''CREATE TABLE IF NOT EXISTS postal_codes
+		(country TEXT, code TEXT, place TEXT, place_key TEXT, admin1 TEXT, admin1_key TEXT,
+		lat REAL, lng REAL)'''
+	finish_sql = [
+		'CREATE INDEX IF NOT EXISTS postal_codes_code ON postal_codes (country, code)',
+		'CREATE INDEX IF NOT EXISTS postal_codes_place ON postal_codes (country, place_key)',
+	]
+	min_fields = 11
+	
+	def geonames_row(self, f):
+		return (f[0], f[1].upper(), f[2], place_key(f[2]), f[3], place_key(f[3]), float(f[9]), float(f[10]))
+
+
+class PlaceImport(GeoNamesImport):
+	name = 'geonames_places'
+	table = 'places'
+	columns = ['geoname_id', 'country', 'name', 'name_key', 'admin1_code', 'population', 'lat', 'lng']
+	create_sql = '''CREATE TABLE IF NOT EXISTS places
+		(geoname_id INTEGER, country TEXT, name TEXT, name_key TEXT, admin1_code TEXT,
+		population INTEGER, lat REAL, lng REAL)'''
+	finish_sql = [
+		'CREATE INDEX IF NOT EXISTS places_name ON places (country, name_key)',
+	]
+	min_fields = 15
+	
+	def geonames_row(self, f):
+		return (int(f[0]), f[8], f[1], place_key(f[1]), f[10], int(f[14] or 0), float(f[4]), float(f[5]))
+
+
+class CountryImport(GeoNamesImport):
+	name = 'geonames_countries'
+	table = 'countries'
+	columns = ['code', 'name', 'name_key']
+	create_sql = 'CREATE TABLE IF NOT EXISTS countries (code TEXT, name TEXT, name_key TEXT)'
+	finish_sql = [
+		'CREATE INDEX IF NOT EXISTS countries_name ON countries (name_key)',
+	]
+	min_fields = 5
+	
+	def geonames_row(self, f):
+		return (f[0], f[4], place_key(f[4]))
+
+
+class Admin1Import(GeoNamesImport):
+	name = 'geonames_admin1'
+	table = 'admin1'
+	columns = ['country', 'code', 'name', 'name_key']
+	create_sql = 'CREATE TABLE IF NOT EXISTS admin1 (country TEXT, code TEXT, name TEXT, name_key TEXT)'
+	finish_sql = [
+		'CREATE INDEX IF NOT EXISTS admin1_code ON admin1 (country, code)',
+	]
+	min_fields = 2
+	
+	def geonames_row(self, f):
+		if '.' not in f[0]:
+			raise ValueError('Not an admin1 code: %s' % f[0])
+		country, code = f[0].split('.', 1)
+		return (country, code, f[1], place_key(f[1]))
+
+
+def import_snomed(desc_path, rel_path, db_path=None, force=False):
+	db_path = db_path or os.path.join(DB_DIR, 'snomed.db')
+	SNOMEDDescriptionImport(desc_path, db_path).run(force)
+	SNOMEDRelationshipImport(rel_path, db_path).run(force)
+
+
+def import_rxnorm(rrf_dir, db_path=None, force=False):
+	db_path = db_path or os.path.join(DB_DIR, 'rxnorm.db')
+	RXNCONSOImport(os.path.join(rrf_dir, 'RXNCONSO.RRF'), db_path).run(force)
+	RXNRELImport(os.path.join(rrf_dir, 'RXNREL.RRF'), db_path).run(force)
+
+
+def import_geonames(geonames_dir, db_path=None, force=False):
+	""" Expects "countryInfo.txt", "admin1CodesASCII.txt", "cities1000.txt"
+	and the postal codes as "zip/allCountries.txt", as extracted from the
+	GeoNames downloads. """
+	db_path = db_path or os.path.join(DB_DIR, 'geonames.db')
+	CountryImport(os.path.join(geonames_dir, 'countryInfo.txt'), db_path).run(force)
+	Admin1Import(os.path.join(geonames_dir, 'admin1CodesASCII.txt'), db_path).run(force)
+	PlaceImport(os.path.join(geonames_dir, 'cities1000.txt'), db_path).run(force)
+	PostalCodeImport(os.path.join(geonames_dir, 'zip', 'allCountries.txt'), db_path).run(force)
+
+
+def benchmark(num_rows=500000, batch_sizes=(1000, 20000, 100000)):
+	""" Imports a generated RF2 description file with `num_rows` rows, one
+	in ten of them an older version, and prints rows per second for each
+	batch size. """
+	tmp_dir = tempfile.mkdtemp()
+	source_path = os.path.join(tmp_dir, 'desc.csv')
+	rnd = random.Random(1)
+	with open(source_path, 'wb') as handle:
+		handle.write('id\teffectiveTime\tactive\tmoduleId\tconceptId\tlanguageCode\ttypeId\tterm\tcaseSignificanceId\n')
+		for i in xrange(num_rows):
+			desc_id = i if i % 10 else i - 1
+			handle.write('%d\t%d\t%d\t900000000000207008\t%d\ten\t900000000000013009\tTerm number %d\t900000000000448009\n'
+				% (desc_id, 20020131 + i % 10, rnd.random() > 0.1, 100000 + i // 3, i))
+	
+	for batch_size in batch_sizes:
+		db_path = os.path.join(tmp_dir, 'bench-%d.db' % batch_size)
+		imp = SNOMEDDescriptionImport(source_path, db_path, batch_size=batch_size)
+		imp.run()
+		print '%8d rows  batch %6d  %6.1f s  %8d rows/s' % (imp.rows_imported, batch_size, imp.duration, imp.rows_imported / max(imp.duration, 0.001))
+		for suffix in ['', '-wal', '-shm']:
+			if os.path.exists(db_path + suffix):
+				os.remove(db_path + suffix)
+	
+	os.remove(source_path)
+	os.rmdir(tmp_dir)
+
+
+if '__main__' == __name__:
+	args = [a for a in sys.argv[1:] if not a.startswith('--')]
+	force = '--force' in sys.argv
+	what = args[0] if len(args) > 0 else None
+	
+	if 'benchmark' == what:
+		logging.basicConfig(level=logging.WARNING)
+		benchmark(int(args[1]) if len(args) > 1 else 500000)
+	elif 'snomed' == what:
+		logging.basicConfig(level=logging.INFO)
+		desc_path = args[1] if len(args) > 1 else os.path.join(DB_DIR, 'snomed_desc.csv')
+		rel_path = args[2] if len(args) > 2 else os.path.join(DB_DIR, 'snomed_rel.csv')
+		import_snomed(desc_path, rel_path, force=force)
+	elif 'rxnorm' == what and len(args) > 1:
+		logging.basicConfig(level=logging.INFO)
+		import_rxnorm(args[1], force=force)
+	elif 'geonames' == what and len(args) > 1:
+		logging.basicConfig(level=logging.INFO)
+		import_geonames(args[1], force=force)
+	else:
+		print 'Usage: termimport.py snomed [desc_file rel_file] | rxnorm rrf_dir | geonames geonames_dir | benchmark [num_rows]  [--force]'
+		sys.exit(1)
@@ -3,18 +3,24 @@
 
 import logging
 from ClinicalTrials.runner import Runner
-from ClinicalTrials.umls import UMLSLookup
+from lookups import UMLSCodes
 from ClinicalTrials.ctakes import cTAKES
 from ClinicalTrials.metamap import MetaMap
 from ClinicalTrials.nltktags import NLTKTags
+from nlpcache import CachedPipeline
+from nlppool import ParallelPipeline
 
 logging.basicConfig(level=logging.DEBUG)
 
-# setup NLP pipelines
-nlp_ctakes = cTAKES()
-nlp_metamap = MetaMap()
-nlp_nltkt = NLTKTags()
-#nlp_nltkt.cleanup = False
+NLP_WORKERS = 4
+NLP_BATCH_SIZE = 50
+
+# setup NLP pipelines, reusing output for text they have already seen and
+# running the JVM ones on batches in parallel
+nlp_ctakes = CachedPipeline(ParallelPipeline(lambda root: cTAKES({'root': root}), 'run-test/ctakes', NLP_WORKERS, NLP_BATCH_SIZE))
+nlp_metamap = CachedPipeline(ParallelPipeline(lambda root: MetaMap({'root': root}), 'run-test/metamap', NLP_WORKERS, NLP_BATCH_SIZE))
+nlp_nltkt = CachedPipeline(NLTKTags())
+#nlp_nltkt.pipeline.cleanup = False
 
 # setup the runner
 run = Runner(666, 'run-test')
@@ -33,7 +39,7 @@ run.add_pipeline(nlp_metamap)
 # create a callback
 def cb(success, trials):
 	if success:
-		lookup = UMLSLookup()
+		lookup = UMLSCodes.shared()
 		
 		# loop trials
 		for trial in trials:
@@ -74,8 +80,9 @@ def cb(success, trials):
 						if 'cui' == code_type:
 							codes = set(codes)
 							code_names = []
+							found = lookup.lookup_codes(codes)
 							for cui in codes:
-								lu = lookup.lookup_code(cui)
+								lu = found.get(cui, [])
 								if len(lu) > 0:
 									(name, src, hier) = lu[0]
 									if hier in sem_want:
@@ -89,6 +96,8 @@ def cb(success, trials):
 
 # run!
 run.run(callback=cb)
+print 'UMLS lookups: %s' % UMLSCodes.shared().stats()
+print 'NLP cache: %s' % nlp_metamap.stats()
 
 
 # ct = cTAKES({'root': 'run-server', 'cleanup': False})
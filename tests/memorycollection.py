@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#
+#  A MongoDB collection in a dictionary, answering the calls trialsync.py and
+#  ingest.py make.
+
+
+class MemoryCollection(object):
+	""" Documents by "_id". Queries can only select by "_id" or "_id" "$in",
+	projections are ignored. """
+	
+	def __init__(self, docs=None):
+		self.docs = dict((doc['_id'], dict(doc)) for doc in (docs or []))
+	
+	def find(self, query=None, projection=None):
+		ncts = ((query or {}).get('_id') or {}).get('$in')
+		return [dict(doc) for _id, doc in sorted(self.docs.items()) if ncts is None or _id in ncts]
+	
+	def find_one(self, query):
+		doc = self.docs.get(query['_id'])
+		return dict(doc) if doc is not None else None
+	
+	def update(self, query, update, upsert=False):
+		if query['_id'] in self.docs or upsert:
+			self.docs.setdefault(query['_id'], {'_id': query['_id']}).update(update['$set'])
+	
+	def save(self, doc):
+		self.docs[doc['_id']] = dict(doc)
+	
+	def initialize_unordered_bulk_op(self):
+		return BulkOperation(self)
+
+
+class BulkOperation(object):
+	""" Collects upserts and applies them on `execute()`. """
+	
+	def __init__(self, collection):
+		self.collection = collection
+		self.operations = []
+	
+	def find(self, query):
+		return BulkSelection(self, query)
+	
+	def execute(self):
+		for func, args in self.operations:
+			func(*args)
+		self.operations = []
+
+
+class BulkSelection(object):
+	
+	def __init__(self, bulk, query):
+		self.bulk = bulk
+		self.query = query
+		self.is_upsert = False
+	
+	def upsert(self):
+		self.is_upsert = True
+		return self
+	
+	def update(self, update):
+		self.bulk.operations.append((self.bulk.collection.update, (self.query, update, self.is_upsert)))
+	
+	def replace_one(self, doc):
+		self.bulk.operations.append((self.bulk.collection.save, (dict(doc, _id=self.query['_id']),)))
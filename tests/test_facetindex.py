@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import unittest
+import subprocess
+from distutils.spawn import find_executable
+
+from runindex import FacetIndex
+
+
+JS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'js')
+
+TRIALS = [
+	{'nct': 'NCT00000001', 'phase': 'Phase 2', 'intervention': [{'intervention_type': 'Drug'}]},
+	{'nct': 'NCT00000002', 'phase': 'Phase 1/Phase 2', 'intervention': [{'intervention_type': 'Drug'}, {'intervention_type': 'Drug'}]},
+	{'nct': 'NCT00000003', 'phase': 'Phase 2/Phase 3', 'intervention': [{'intervention_type': 'Drug'}, {'intervention_type': 'Device'}]},
+	{'nct': 'NCT00000004', 'phase': 'N/A', 'intervention': [{'intervention_type': 'Behavioral'}]},
+	{'nct': 'NCT00000005', 'phase': 'Phase 4'},
+	{'nct': 'NCT00000006', 'intervention': []},
+	{'nct': 'NCT00000007', 'phase': '', 'intervention': [{'intervention_name': 'Counseling'}]},
+]
+
+# counts trials per type and phase with the client's Trial class
+CLIENT_COUNTS = '''
+var fs = require('fs');
+var can = { Construct: function(statics, proto) {
+	var cls = function(json) { this.init(json); };
+	cls.prototype = proto;
+	return cls;
+} };
+eval(fs.readFileSync('%(js_dir)s/main.js', 'utf8').match(/Array\\.prototype\\.uniqueArray = [\\s\\S]*?\\n\\};/)[0]);
+eval(fs.readFileSync('%(js_dir)s/trial.js', 'utf8'));
+
+var types = {}, phases = {};
+JSON.parse(fs.readFileSync(0, 'utf8')).forEach(function(json) {
+	var trial = new Trial(json);
+	trial.interventionTypes().forEach(function(t) { types[t] = (types[t] || 0) + 1; });
+	trial.trialPhases().forEach(function(p) { phases[p] = (phases[p] || 0) + 1; });
+});
+console.log(JSON.stringify({types: types, phases: phases}));
+'''
+
+
+class FacetIndexTest(unittest.TestCase):
+	
+	def test_rules(self):
+		facets = FacetIndex(TRIALS)
+		self.assertEqual({'Drug': 3, 'Device': 1, 'Behavioral': 1, 'Observational': 3}, facets.type_counts())
+		self.assertEqual({'Phase 1': 1, 'Phase 2': 3, 'Phase 3': 1, 'Phase 4': 1, 'N/A': 3}, facets.phase_counts(facets.types.keys()))
+		self.assertEqual(['NCT00000001', 'NCT00000002', 'NCT00000003'], facets.filter(['Drug'], ['Phase 2']))
+		self.assertEqual(['NCT00000005', 'NCT00000006', 'NCT00000007'], facets.filter(['Observational']))
+	
+	def test_counts_match_client(self):
+		node = find_executable('node') or find_executable('nodejs')
+		if node is None:
+			self.skipTest("node is not installed")
+		
+		proc = subprocess.Popen([node, '-e', CLIENT_COUNTS % {'js_dir': JS_DIR}], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+		out, err = proc.communicate(json.dumps(TRIALS))
+		self.assertEqual(0, proc.returncode)
+		client = json.loads(out)
+		
+		facets = FacetIndex(TRIALS)
+		self.assertEqual(client['types'], facets.type_counts())
+		self.assertEqual(client['phases'], facets.phase_counts(facets.types.keys()))
+
+
+if '__main__' == __name__:
+	unittest.main()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from geocoder import Gazetteer, UNPLACED, place_key, geocode_doc, geocode_cached
+from termimport import CountryImport, Admin1Import, PlaceImport, PostalCodeImport
+
+
+# a few rows of each GeoNames table, as termimport.py stores them
+COUNTRIES = [('US', u'United States'), ('GB', u'United Kingdom'), ('CA', u'Canada'), ('KR', u'South Korea')]
+ADMIN1 = [('US', 'MA', u'Massachusetts'), ('US', 'ME', u'Maine'), ('US', 'OR', u'Oregon')]
+PLACES = [
+	(4930956, 'US', u'Boston', 'MA', 617594, 42.358, -71.060),
+	(4975802, 'US', u'Portland', 'ME', 66194, 43.661, -70.255),
+	(5746545, 'US', u'Portland', 'OR', 632309, 45.523, -122.676),
+	(4407066, 'US', u'St. Louis', 'MO', 319294, 38.627, -90.198),
+	(1835848, 'KR', u'Seoul', '11', 10349312, 37.566, 126.978),
+]
+POSTAL_CODES = [
+	('US', '02115', u'Boston', u'Massachusetts', 42.343, -71.092),
+	('GB', 'SW1A', u'London', u'England', 51.501, -0.142),
+	('CA', 'H3A', u'Montréal', u'Quebec', 45.504, -73.577),
+	('CA', 'H3B', u'Montréal', u'Quebec', 45.500, -73.570),
+	('US', '01003', u'Amherst', u'Massachusetts', 42.392, -72.525),
+]
+
+
+def build_gazetteer(db_path):
+	conn = sqlite3.connect(db_path)
+	tables = [
+		(CountryImport, [(code, name, place_key(name)) for code, name in COUNTRIES]),
+		(Admin1Import, [(country, code, name, place_key(name)) for country, code, name in ADMIN1]),
+		(PlaceImport, [(gid, country, name, place_key(name), admin1, pop, lat, lng) for gid, country, name, admin1, pop, lat, lng in PLACES]),
+		(PostalCodeImport, [(country, code, place, place_key(place), admin1, place_key(admin1), lat, lng) for country, code, place, admin1, lat, lng in POSTAL_CODES]),
+	]
+	for importer, rows in tables:
+		conn.execute(importer.create_sql)
+		conn.executemany(importer(None, db_path).insert_sql, rows)
+	conn.commit()
+	conn.close()
+
+
+def address(city='', state='', zip_code='', country='United States'):
+	return {'city': city, 'state': state, 'zip': zip_code, 'country': country}
+
+
+class CountingGazetteer(Gazetteer):
+	""" Counts the lookups that were not answered from the cache. """
+	
+	def __init__(self, db_path):
+		super(CountingGazetteer, self).__init__(db_path)
+		self.lookups = 0
+	
+	def country_code(self, country):
+		self.lookups += 1
+		return super(CountingGazetteer, self).country_code(country)
+
+
+class Studies(object):
+	""" The studies collection as geocode_cached() uses it, the query is
+	matched by a function. """
+	
+	def __init__(self, docs, matches):
+		self.docs = docs
+		self.matches = matches
+		self.queries = []
+		self.updates = {}
+	
+	def find(self, query, projection):
+		self.queries.append(query)
+		return [{'_id': doc['_id'], 'location': [dict(loc) for loc in doc['location']]} for doc in self.docs if self.matches(query, doc)]
+	
+	def initialize_unordered_bulk_op(self):
+		studies = self
+		
+		class Bulk(object):
+			def find(self, query):
+				class Found(object):
+					def update(self, update):
+						studies.write(query['_id'], update['$set']['location'])
+				return Found()
+			
+			def execute(self):
+				pass
+		return Bulk()
+	
+	def write(self, nct, locations):
+		self.updates[nct] = locations
+		for doc in self.docs:
+			if nct == doc['_id']:
+				doc['location'] = locations
+
+
+class GazetteerTest(unittest.TestCase):
+	
+	def setUp(self):
+		self.tmp_dir = tempfile.mkdtemp()
+		self.db_path = os.path.join(self.tmp_dir, 'geonames.db')
+		build_gazetteer(self.db_path)
+		self.gazetteer = CountingGazetteer(self.db_path)
+	
+	def tearDown(self):
+		shutil.rmtree(self.tmp_dir)
+	
+	def test_place_key(self):
+		self.assertEqual('sao paulo', place_key(u'São Paulo'))
+		self.assertEqual('sao paulo', place_key('S\xc3\xa3o Paulo'))
+		self.assertEqual(place_key('St. Louis'), place_key('Saint Louis'))
+		self.assertEqual('ste foy', place_key(u'Sainte-Foy'))
+		self.assertEqual('korea republic of', place_key('Korea, Republic of'))
+		self.assertEqual('', place_key(None))
+	
+	def test_postal_codes(self):
+		geo = self.gazetteer.locate(address('Boston', 'Massachusetts', '02115'))
+		self.assertEqual((42.343, -71.092, 'postal_code', 'geonames'), (geo['latitude'], geo['longitude'], geo['precision'], geo['source']))
+		self.assertEqual('Boston, Massachusetts, United States', geo['formatted'])
+		
+		# ZIP+4 and the outward codes GeoNames has for Britain and Canada
+		self.assertEqual(42.343, self.gazetteer.locate(address('Boston', zip_code='02115-5727'))['latitude'])
+		self.assertEqual(51.501, self.gazetteer.locate(address('London', zip_code='sw1a 2aa', country='United Kingdom'))['latitude'])
+		self.assertEqual(45.500, self.gazetteer.locate(address(u'Montréal', zip_code='H3B 4W8', country='Canada'))['latitude'])
+	
+	def test_cities(self):
+		""" Without a known postal code the city is used, in the given state
+		or else the most populous one. """
+		self.assertEqual((42.358, 'city'), self.position(address('Boston', zip_code='02999')))
+		self.assertEqual((43.661, 'city'), self.position(address('Portland', 'Maine')))
+		self.assertEqual((45.523, 'city'), self.position(address('Portland')))
+		self.assertEqual((38.627, 'city'), self.position(address('Saint Louis', 'Missouri')))
+		self.assertEqual((42.392, 'city'), self.position(address('Amherst', 'Massachusetts')))
+		self.assertEqual((37.566, 'city'), self.position(address('Seoul', country='Korea, Republic of')))
+	
+	def position(self, addr):
+		geo = self.gazetteer.locate(addr)
+		return (geo['latitude'], geo['precision'])
+	
+	def test_unknown_places_are_cached(self):
+		for addr in [address('Atlantis'), address('Boston', country='Narnia'), address('Boston', country=''), {}]:
+			self.assertIsNone(self.gazetteer.locate(addr))
+		lookups = self.gazetteer.lookups
+		self.assertIsNone(self.gazetteer.locate(address('Atlantis')))
+		self.assertEqual(lookups, self.gazetteer.lookups)
+	
+	def test_unplaced_locations_are_marked(self):
+		doc = {'location': [
+			{'facility': {'address': address('Boston', zip_code='02115')}},
+			{'facility': {'address': address('Atlantis')}},
+			{'facility': {'name': 'No address'}},
+		]}
+		self.assertEqual(3, geocode_doc(doc, self.gazetteer))
+		self.assertEqual('postal_code', doc['location'][0]['geodata']['precision'])
+		self.assertEqual(UNPLACED, doc['location'][1]['geodata'])
+		self.assertEqual(UNPLACED, doc['location'][2]['geodata'])
+		
+		# not looked up again, unless retrying
+		self.gazetteer.cache.clear()
+		self.assertEqual(0, geocode_doc(doc, self.gazetteer))
+		self.assertEqual(2, self.gazetteer.lookups)
+		self.assertEqual(0, geocode_doc(doc, self.gazetteer, retry=True))
+		self.assertEqual(3, self.gazetteer.lookups)
+	
+	def test_geocode_cached(self):
+		""" Only locations without any geodata are queried, unplaced ones are
+		stored with the marker and not queried the next time. """
+		def without_geodata(query, doc):
+			return any(['geodata' not in loc for loc in doc['location']])
+		
+		docs = [
+			{'_id': 'NCT00000001', 'location': [{'facility': {'address': address('Atlantis')}}]},
+			{'_id': 'NCT00000002', 'location': [{'facility': {'address': address('Portland', 'Maine')}, 'geodata': UNPLACED}]},
+		]
+		studies = Studies(docs, without_geodata)
+		self.assertEqual(1, geocode_cached(studies, self.gazetteer))
+		self.assertEqual({'location': {'$elemMatch': {'geodata': {'$exists': False}}}}, studies.queries[-1])
+		self.assertEqual({'NCT00000001': [{'facility': {'address': address('Atlantis')}, 'geodata': UNPLACED}]}, studies.updates)
+		
+		# retrying places what a newer gazetteer knows
+		studies = Studies(studies.docs, lambda query, doc: True)
+		self.assertEqual(1, geocode_cached(studies, self.gazetteer, retry=True))
+		self.assertEqual({'location': {'$elemMatch': {'geodata.latitude': None}}}, studies.queries[-1])
+		self.assertEqual(['NCT00000002'], studies.updates.keys())
+		self.assertEqual(43.661, studies.updates['NCT00000002'][0]['geodata']['latitude'])
+
+
+if '__main__' == __name__:
+	unittest.main()
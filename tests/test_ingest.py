@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import zipfile
+import tempfile
+import itertools
+import unittest
+from datetime import datetime
+
+import ingest
+from searchindex import TrialSearchIndex
+from trialsync import LAST_SYNC_ID
+from tests.memorycollection import MemoryCollection
+from tests.test_trialsync import study_xml
+
+
+class InlinePool(object):
+	""" A multiprocessing.Pool doing the work in this process. """
+	
+	def __init__(self, processes, initializer, initargs):
+		initializer(*initargs)
+	
+	def imap_unordered(self, func, items):
+		return itertools.imap(func, items)
+	
+	def close(self):
+		pass
+	
+	def join(self):
+		pass
+
+
+class IngestTest(unittest.TestCase):
+	""" Ingests a ZIP dump like the one from ClinicalTrials.gov into memory
+	collections, in batches of two studies. """
+	
+	def setUp(self):
+		self.tmp_dir = tempfile.mkdtemp()
+		self.zip_path = os.path.join(self.tmp_dir, 'search_result.zip')
+		with zipfile.ZipFile(self.zip_path, 'w') as archive:
+			archive.writestr('NCT00000001.xml', study_xml('NCT00000001', changed='June 5, 2014'))
+			archive.writestr('NCT00000002.xml', study_xml('NCT00000002', title='Methotrexate in RA', changed='March 2, 2015'))
+			archive.writestr('NCT00000003.xml', study_xml('NCT00000003', changed='January 9, 2015'))
+			archive.writestr('NCT00000004.xml', study_xml('NCT00000004')[:400])
+			archive.writestr('empty.xml', '<?xml version="1.0"?><search_results count="0"/>')
+			archive.writestr('Contents.txt', 'Studies found by the search')
+		
+		self.studies = MemoryCollection()
+		self.state = MemoryCollection()
+		self.index = TrialSearchIndex(os.path.join(self.tmp_dir, 'trials_fts.db'))
+		self._saved = (ingest.Pool, ingest._collections, ingest.TrialSearchIndex)
+		ingest.Pool = InlinePool
+		ingest._collections = lambda db_uri: (self.studies, self.state)
+		ingest.TrialSearchIndex = lambda: self.index
+	
+	def tearDown(self):
+		ingest.Pool, ingest._collections, ingest.TrialSearchIndex = self._saved
+		if ingest._archive is not None:
+			ingest._archive.close()
+		ingest._archive = ingest._studies = ingest._state = ingest._index = None
+		shutil.rmtree(self.tmp_dir)
+	
+	def test_ingest(self):
+		self.assertEqual(3, ingest.ingest(self.zip_path, 'mongodb://localhost/test', workers=1, batch_size=2))
+		self.assertEqual(['NCT00000001', 'NCT00000002', 'NCT00000003'], sorted(self.studies.docs.keys()))
+		self.assertEqual('Methotrexate in RA', self.studies.docs['NCT00000002']['brief_title'])
+		self.assertEqual(['Boston', 'Portland'], [loc['facility']['address']['city'] for loc in self.studies.docs['NCT00000002']['location']])
+		
+		# registered with the sync, which continues after the newest trial
+		self.assertEqual(datetime(2015, 1, 9), self.state.docs['NCT00000003']['last_changed'])
+		self.assertEqual(datetime(2015, 3, 2), self.state.docs[LAST_SYNC_ID]['date'])
+		
+		# and searchable
+		self.assertTrue(self.index.is_fresh())
+		self.assertEqual(['NCT00000002'], self.index.search('"methotrexate in ra"'))
+	
+	def test_keeps_sync_cursor(self):
+		""" Ingesting an older dump does not move the cursor of a database that
+		is already synced. """
+		synced = datetime(2016, 1, 1)
+		self.state.save({'_id': LAST_SYNC_ID, 'date': synced})
+		ingest.ingest(self.zip_path, 'mongodb://localhost/test', workers=1, batch_size=2)
+		self.assertEqual(synced, self.state.docs[LAST_SYNC_ID]['date'])
+	
+	def test_parse_study(self):
+		with zipfile.ZipFile(self.zip_path) as archive:
+			with archive.open('NCT00000001.xml') as handle:
+				self.assertEqual('NCT00000001', ingest.parse_study(handle)['_id'])
+			with archive.open('empty.xml') as handle:
+				self.assertIsNone(ingest.parse_study(handle))
+
+
+if '__main__' == __name__:
+	unittest.main()
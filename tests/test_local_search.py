@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import wsgi
+from ClinicalTrials.runner import Runner
+from ClinicalTrials.trial import Trial
+from runcache import RunCache
+from tests.wsgiclient import WSGIClient
+
+
+LOCAL_NCTS = ['NCT00000001', 'NCT00000002', 'NCT00000003']
+RHEUMATOID_ARTHRITIS = '69896004'
+
+
+class LocalIndex(object):
+	""" A freshly synced local index that finds LOCAL_NCTS for any search. """
+	
+	def search(self, term=None, condition=None):
+		return list(LOCAL_NCTS)
+
+
+class AnalyzingQueue(object):
+	""" Runs submitted runners right away, as a run does finding LOCAL_NCTS
+	and analyzing their exclusion criteria. """
+	
+	def __init__(self):
+		self.submitted = []
+	
+	def submit(self, runner, fields):
+		self.submitted.append(runner)
+		runner.write_ncts(LOCAL_NCTS)
+		runner.status = 'done'
+	
+	def position(self, run_id):
+		return None
+
+
+class AnalyzedTrial(object):
+	""" A trial whose exclusion criteria NLP has analyzed. Only the second
+	trial excludes rheumatoid arthritis. """
+	
+	def __init__(self, nct):
+		self.nct = nct
+	
+	def analyzable_results(self):
+		codes = [RHEUMATOID_ARTHRITIS] if 'NCT00000002' == self.nct else ['38341003']
+		return {'eligibility_exclusion': {'ctakes': {'codes': {'snomed': codes}}}}
+
+
+class Meanings(object):
+	
+	@classmethod
+	def shared(cls):
+		return cls()
+	
+	def lookup_code_meanings(self, codes):
+		return dict((code, 'Rheumatoid arthritis') for code in codes if RHEUMATOID_ARTHRITIS == code)
+
+
+class LocalSearchTest(unittest.TestCase):
+	
+	def setUp(self):
+		self._saved = dict((name, getattr(wsgi, name)) for name in ['USE_NLP', 'USE_LOCAL_SEARCH', '_search_index', '_run_queue', '_run_cache', 'problems', 'SNOMEDCodes'])
+		self._retrieve = Trial.__dict__['retrieve']
+		wsgi.USE_LOCAL_SEARCH = 1
+		wsgi._search_index = LocalIndex()
+		wsgi._run_queue = AnalyzingQueue()
+		wsgi._run_cache = RunCache()
+		wsgi.problems = lambda: {'problems': [{'sp:problemName': {'sp:code': {'@id': 'http://purl.bioontology.org/ontology/SNOMEDCT/%s' % RHEUMATOID_ARTHRITIS}}}]}
+		wsgi.SNOMEDCodes = Meanings
+		Trial.retrieve = classmethod(lambda cls, ncts: [AnalyzedTrial(nct) for nct in ncts])
+		self.client = WSGIClient(wsgi.app)
+	
+	def tearDown(self):
+		for name, value in self._saved.items():
+			setattr(wsgi, name, value)
+		Trial.retrieve = self._retrieve
+	
+	def search(self):
+		status, headers, run_id = self.client.request('/trial_runs?cond=Rheumatoid+arthritis')
+		self.assertEqual(200, status)
+		return Runner.get(run_id)
+	
+	def test_served_locally_without_nlp(self):
+		wsgi.USE_NLP = 0
+		runner = self.search()
+		self.assertTrue(runner.done)
+		self.assertEqual(LOCAL_NCTS, [tpl[0] for tpl in runner.get_ncts(restrict='none')])
+		self.assertEqual([], wsgi._run_queue.submitted)
+	
+	def test_filter_by_problem(self):
+		""" With NLP, the search is run so that the exclusion criteria of its
+		trials are analyzed, and filtering by the patient's problems works. """
+		wsgi.USE_NLP = 1
+		runner = self.search()
+		self.assertEqual([runner], wsgi._run_queue.submitted)
+		
+		status, headers, body = self.client.request('/trial_runs/%s/filter/problems' % runner.run_id)
+		self.assertEqual('{"status": "ok"}', body)
+		reasons = dict((nct, reason) for nct, reason in runner.get_ncts(restrict='none') if reason)
+		self.assertEqual(['NCT00000002'], reasons.keys())
+		self.assertIn('SNOMED %s' % RHEUMATOID_ARTHRITIS, reasons['NCT00000002'])
+
+
+if '__main__' == __name__:
+	unittest.main()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from lookups import SNOMEDCodes
+
+
+class SNOMEDCodesTest(unittest.TestCase):
+	
+	def setUp(self):
+		self.tmp_dir = tempfile.mkdtemp()
+		self.db_path = os.path.join(self.tmp_dir, 'snomed.db')
+	
+	def tearDown(self):
+		shutil.rmtree(self.tmp_dir)
+	
+	def test_lookup(self):
+		conn = sqlite3.connect(self.db_path)
+		conn.execute('CREATE TABLE descriptions (concept_id INTEGER, term TEXT, isa TEXT, active INTEGER)')
+		conn.executemany('INSERT INTO descriptions VALUES (?, ?, ?, ?)', [
+			(69896004, 'Rheumatoid arthritis', 'synonym', 1),
+			(69896004, 'Rheumatoid arthritis (disorder)', 'full', 1),
+		])
+		conn.commit()
+		conn.close()
+		
+		codes = SNOMEDCodes(self.db_path)
+		self.assertEqual([('Rheumatoid arthritis (disorder)', 'SNOMEDCT', 'disorder'), ('Rheumatoid arthritis', 'SNOMEDCT', 'disorder')], codes.lookup_code('69896004'))
+		self.assertEqual({'69896004': 'Rheumatoid arthritis (disorder)'}, codes.lookup_code_meanings(['69896004', '1234']))
+	
+	def test_missing_database(self):
+		""" A missing database is reported, not created empty. """
+		codes = SNOMEDCodes(self.db_path)
+		with self.assertRaises(IOError) as ctx:
+			codes.lookup_code('69896004')
+		self.assertIn(self.db_path, str(ctx.exception))
+		self.assertFalse(os.path.exists(self.db_path))
+
+
+if '__main__' == __name__:
+	unittest.main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import shutil
+import tempfile
+import unittest
+
+from nlpcache import CachedPipeline
+
+
+class FakePipeline(object):
+	""" Tags input text with its length, or fails while `failing` is set. """
+	
+	name = 'fake'
+	
+	def __init__(self):
+		self.failing = False
+		self.inputs = {}
+		self.runs = 0
+	
+	def write_input(self, text, filename):
+		self.inputs[filename] = text
+		return True
+	
+	def run(self):
+		self.runs += 1
+		return not self.failing
+	
+	def parse_output(self, filename, filter_sty=None):
+		text = self.inputs.pop(filename)
+		return None if self.failing else {'length': len(text)}
+
+
+class CachedPipelineTest(unittest.TestCase):
+	
+	def setUp(self):
+		self.cache_dir = tempfile.mkdtemp()
+		self.pipeline = FakePipeline()
+		self.cached = CachedPipeline(self.pipeline, cache_dir=self.cache_dir)
+	
+	def tearDown(self):
+		shutil.rmtree(self.cache_dir)
+	
+	def process(self, text):
+		self.cached.write_input(text, 'input.txt')
+		self.cached.run()
+		return self.cached.parse_output('input.txt')
+	
+	def test_cached_output(self):
+		self.assertEqual({'length': 6}, self.process('asthma'))
+		self.assertEqual({'length': 6}, self.process('asthma'))
+		self.assertEqual(1, self.pipeline.runs)
+		self.assertEqual(1, self.cached.stats()['hits'])
+	
+	def test_unreadable_entry_is_run(self):
+		""" An entry that can not be read is a miss, its text goes to the
+		pipeline before it runs. """
+		self.process('asthma')
+		with open(self.cached._path(self.cached.key('asthma')), 'wb') as handle:
+			handle.write('not a pickle')
+		
+		self.assertEqual({'length': 6}, self.process('asthma'))
+		self.assertEqual(2, self.pipeline.runs)
+		self.assertEqual(0, self.cached.stats()['hits'])
+		self.assertEqual({'length': 6}, self.process('asthma'))
+		self.assertEqual(2, self.pipeline.runs)
+	
+	def test_failed_run_is_retried(self):
+		self.pipeline.failing = True
+		self.assertIsNone(self.process('asthma'))
+		
+		self.pipeline.failing = False
+		self.assertEqual({'length': 6}, self.process('asthma'))
+		self.assertEqual(2, self.pipeline.runs)
+		self.assertEqual(0, self.cached.stats()['hits'])
+
+
+if '__main__' == __name__:
+	unittest.main()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from nlppool import ParallelPipeline, BenchmarkPipeline
+
+
+class QuickPipeline(BenchmarkPipeline):
+	startup = 0
+	work_per_doc = 10
+
+
+class FailingPipeline(QuickPipeline):
+	
+	def run(self):
+		return False
+
+
+class ParallelPipelineTest(unittest.TestCase):
+	
+	def setUp(self):
+		self.tmp_dir = tempfile.mkdtemp()
+		self.root = os.path.join(self.tmp_dir, 'batches')
+	
+	def tearDown(self):
+		shutil.rmtree(self.tmp_dir)
+	
+	def batch_dirs(self):
+		return [name for name in os.listdir(self.root) if name.startswith('batch-')]
+	
+	def test_batches_are_removed_once_parsed(self):
+		pipeline = ParallelPipeline(QuickPipeline, root=self.root, workers=3, batch_size=4)
+		docs = [('doc-%d.txt' % i, 'Criteria %d' % i) for i in xrange(10)]
+		for filename, text in docs:
+			pipeline.write_input(text, filename)
+		self.assertTrue(pipeline.run())
+		self.assertEqual(3, len(self.batch_dirs()))
+		
+		outputs = [pipeline.parse_output(filename) for filename, text in docs]
+		self.assertEqual(10, len(set(outputs)))
+		self.assertEqual([], self.batch_dirs())
+	
+	def test_failed_batches_are_removed(self):
+		pipeline = ParallelPipeline(FailingPipeline, root=self.root, workers=2, batch_size=2)
+		for i in xrange(4):
+			pipeline.write_input('Criteria %d' % i, 'doc-%d.txt' % i)
+		self.assertFalse(pipeline.run())
+		self.assertEqual([], self.batch_dirs())
+		self.assertIsNone(pipeline.parse_output('doc-0.txt'))
+
+
+if '__main__' == __name__:
+	unittest.main()
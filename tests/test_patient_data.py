@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import json
+import urllib2
+import threading
+import unittest
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+
+import wsgi
+from caching import LRUCache
+from smartstandin import standin_app
+from tests.wsgiclient import WSGIClient
+
+
+class QuietHandler(WSGIRequestHandler):
+	
+	def log_message(self, format, *args):
+		pass
+
+
+class Session(dict):
+	""" A session that already went through the SMART launch. """
+	
+	def save(self):
+		pass
+
+
+class PatientDataCacheTest(unittest.TestCase):
+	""" Patient data is fetched from the container once per record and token. """
+	
+	def setUp(self):
+		self.server = make_server('localhost', 0, standin_app(), handler_class=QuietHandler)
+		self.base = 'http://localhost:%d' % self.server.server_port
+		thread = threading.Thread(target=self.server.serve_forever)
+		thread.daemon = True
+		thread.start()
+		
+		# wsgi only imports the SMART client if USE_SMART is set on import
+		from smart_client_python.client import SMARTClient
+		from rdflib.graph import Graph
+		from endpoints import ENDPOINTS
+		from patientdata import demographics_from_graph, problems_from_graph
+		patched = {
+			'USE_SMART': 1,
+			'USE_SMART_05': 0,
+			'SMARTClient': SMARTClient,
+			'Graph': Graph,
+			'ENDPOINTS': ENDPOINTS,
+			'demographics_from_graph': demographics_from_graph,
+			'problems_from_graph': problems_from_graph,
+			'_smart_clients': LRUCache(10, 60),
+			'_patient_data': LRUCache(10, 60),
+		}
+		self._saved = dict((name, getattr(wsgi, name, None)) for name in patched.keys() + ['_get_session', 'DEBUG'])
+		for name, value in patched.items():
+			setattr(wsgi, name, value)
+		
+		self.session = Session({
+			'api_base': self.base,
+			'record_id': '1540505',
+			'consumer_key': 'smart-app',
+			'consumer_secret': 'smartapp-secret',
+			'token': {'oauth_token': 'token-1', 'oauth_token_secret': 'secret-1'},
+		})
+		wsgi._get_session = lambda: self.session
+		self.client = WSGIClient(wsgi.app)
+	
+	def tearDown(self):
+		for name, value in self._saved.items():
+			setattr(wsgi, name, value)
+		self.server.shutdown()
+		self.server.server_close()
+	
+	def container_requests(self, kind):
+		counts = json.loads(urllib2.urlopen(self.base + '/_requests').read())
+		return sum([num for path, num in counts.items() if path.startswith('/records/1540505/%s' % kind)])
+	
+	def get(self, path):
+		status, headers, body = self.client.request(path)
+		self.assertEqual(200, status)
+		return json.loads(body)
+	
+	def test_same_token_is_not_refetched(self):
+		demographics = self.get('/demographics')
+		problems = self.get('/problems')
+		self.assertTrue(len(demographics) > 0)
+		self.assertEqual(8, len(problems['problems']))
+		
+		self.assertEqual(demographics, self.get('/demographics'))
+		self.assertEqual(problems, self.get('/problems'))
+		self.assertEqual(1, self.container_requests('demographics'))
+		self.assertEqual(1, self.container_requests('problems'))
+	
+	def test_other_token_is_fetched(self):
+		self.get('/problems')
+		self.session['token'] = {'oauth_token': 'token-2', 'oauth_token_secret': 'secret-2'}
+		self.get('/problems')
+		self.assertEqual(2, self.container_requests('problems'))
+		
+		# back to the first token, still cached
+		self.session['token'] = {'oauth_token': 'token-1', 'oauth_token_secret': 'secret-1'}
+		self.get('/problems')
+		self.assertEqual(2, self.container_requests('problems'))
+	
+	def test_cache_stats_only_with_debug(self):
+		self.get('/problems')
+		self.get('/problems')
+		wsgi.DEBUG = 0
+		self.assertEqual(404, self.client.request('/admin/caches')[0])
+		
+		wsgi.DEBUG = 1
+		stats = self.get('/admin/caches')
+		self.assertEqual((1, 1), (stats['patient_data']['hits'], stats['patient_data']['misses']))
+
+
+if '__main__' == __name__:
+	unittest.main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import json
+import unittest
+
+from rdflib.graph import Graph
+
+from patientdata import demographics_from_graph, problems_from_graph
+from smartstandin import demographics_rdf, problems_rdf
+
+
+# SMART 0.5 demographics, with the "v:" vcard prefix and typed literals
+DEMOGRAPHICS_05 = '''<?xml version="1.0" encoding="utf-8"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+	xmlns:sp="http://smartplatforms.org/terms#"
+	xmlns:foaf="http://xmlns.com/foaf/0.1/"
+	xmlns:v="http://www.w3.org/2006/vcard/ns#">
+	<sp:Demographics rdf:about="http://sandbox-api-v05.smartplatforms.org/records/2169591/demographics">
+		<sp:belongsTo rdf:resource="http://sandbox-api-v05.smartplatforms.org/records/2169591"/>
+		<v:n>
+			<v:Name>
+				<v:given-name>Rush</v:given-name>
+				<v:family-name>Fitzgerald</v:family-name>
+			</v:Name>
+		</v:n>
+		<v:adr>
+			<v:Address>
+				<v:postal-code>02115</v:postal-code>
+				<v:locality>Boston</v:locality>
+			</v:Address>
+		</v:adr>
+		<v:bday rdf:datatype="http://www.w3.org/2001/XMLSchema#date">1948-01-18</v:bday>
+		<foaf:gender>male</foaf:gender>
+		<sp:medicalRecordNumber>
+			<sp:Code>
+				<foaf:title xml:lang="en">Record number</foaf:title>
+				<sp:identifier>2169591</sp:identifier>
+			</sp:Code>
+		</sp:medicalRecordNumber>
+	</sp:Demographics>
+</rdf:RDF>
+'''
+
+
+def old_extraction(kind, rdf, version='0.6'):
+	""" How wsgi.py extracted patient data before patientdata.py: rewrite 0.5's
+	"v:" prefix, round-trip through compacted JSON-LD and pick the nodes by
+	type. The JSON-LD serializer the app used embedded blank nodes into the
+	node referencing them, current ones list them separately, so they are
+	embedded here. """
+	if '0.5' == version and 'demographics' == kind:
+		rdf = rdf.replace('xmlns:v=', 'xmlns:vcard=')
+		rdf = rdf.replace('<v:', '<vcard:')
+		rdf = rdf.replace('</v:', '</vcard:')
+	ld = json.loads(Graph().parse(data=rdf).serialize(format='json-ld', auto_compact=True))
+	nodes = ld.get('@graph', [ld])
+	blank = dict((node['@id'], node) for node in nodes if node.get('@id', '').startswith('_:'))
+	
+	def embed(value):
+		if isinstance(value, list):
+			return [embed(item) for item in value]
+		if isinstance(value, dict):
+			if 1 == len(value) and value.get('@id') in blank:
+				value = dict((k, v) for k, v in blank[value['@id']].items() if '@id' != k)
+			return dict((k, embed(v)) for k, v in value.items())
+		return value
+	
+	if 'demographics' == kind:
+		for node in nodes:
+			if 'sp:Demographics' == node.get('@type'):
+				return embed(node)
+		return {}
+	return {'problems': [embed(node) for node in nodes if 'sp:Problem' == node.get('@type')]}
+
+
+class PatientDataTest(unittest.TestCase):
+	""" patientdata.py gives the dictionaries the JSON-LD round trip gave. """
+	
+	def test_demographics_05(self):
+		new = demographics_from_graph(Graph().parse(data=DEMOGRAPHICS_05))
+		self.assertEqual(old_extraction('demographics', DEMOGRAPHICS_05, '0.5'), new)
+		self.assertEqual({'@type': 'vcard:Name', 'vcard:given-name': 'Rush', 'vcard:family-name': 'Fitzgerald'}, new['vcard:n'])
+		self.assertEqual({'@value': '1948-01-18', '@type': 'xsd:date'}, new['vcard:bday'])
+		self.assertEqual({'@value': 'Record number', '@language': 'en'}, new['sp:medicalRecordNumber']['foaf:title'])
+	
+	def test_demographics_06(self):
+		rdf = demographics_rdf('http://localhost:7000', '1540505')
+		new = demographics_from_graph(Graph().parse(data=rdf))
+		self.assertEqual(old_extraction('demographics', rdf), new)
+		self.assertEqual('Standin', new['vcard:n']['vcard:family-name'])
+	
+	def test_problems(self):
+		rdf = problems_rdf('http://localhost:7000', '1540505', 3)
+		new = problems_from_graph(Graph().parse(data=rdf))
+		key = lambda node: node['@id']
+		self.assertEqual(sorted(old_extraction('problems', rdf)['problems'], key=key), sorted(new['problems'], key=key))
+		self.assertEqual(3, len(new['problems']))
+		first = [node for node in new['problems'] if node['@id'].endswith('/problems/0')][0]
+		self.assertEqual({'@id': 'http://purl.bioontology.org/ontology/SNOMEDCT/73211009'}, first['sp:problemName']['sp:code'])
+	
+	def test_no_graph(self):
+		self.assertEqual({}, demographics_from_graph(None))
+		self.assertEqual({'problems': []}, problems_from_graph(None))
+
+
+if '__main__' == __name__:
+	unittest.main()
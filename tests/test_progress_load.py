@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+#  Load test of following a run's progress: 100 clients polling
+#  /trial_runs/<run_id>/progress every second versus 100 clients listening to
+#  /trial_runs/<run_id>/progress/stream. Counts requests and the CPU time the
+#  process spends until all clients have seen the run finish.
+
+import time
+import resource
+import threading
+import unittest
+
+import wsgi
+from ClinicalTrials.runner import Runner
+from tests.wsgiclient import WSGIClient
+
+
+NUM_CLIENTS = 100
+RUN_SECONDS = 3.0
+POLL_INTERVAL = 1.0			# what js/trials.js uses
+
+
+class TimedRun(object):
+	""" A run that moves through a few states and is done after `seconds`. """
+	
+	STATES = ['Searching for trials', 'Downloading trials', 'Running NLP', 'Filtering']
+	
+	def __init__(self, run_id, seconds):
+		self.run_id = run_id
+		self.condition = None
+		self.term = None
+		self.started = time.time()
+		self.seconds = seconds
+	
+	@property
+	def status(self):
+		elapsed = time.time() - self.started
+		if elapsed >= self.seconds:
+			return 'done'
+		return self.STATES[int(len(self.STATES) * elapsed / self.seconds)]
+	
+	@property
+	def done(self):
+		return 'done' == self.status
+
+
+def cpu_seconds():
+	usage = resource.getrusage(resource.RUSAGE_SELF)
+	return usage.ru_utime + usage.ru_stime
+
+
+class ProgressLoadTest(unittest.TestCase):
+	
+	def setUp(self):
+		self.run = None
+		self._runner_get = Runner.__dict__['get']
+		self._use_stream = wsgi.USE_PROGRESS_STREAM
+		wsgi.USE_PROGRESS_STREAM = 1
+		test = self
+		Runner.get = classmethod(lambda cls, run_id: test.run if test.run is not None and run_id == test.run.run_id else None)
+	
+	def tearDown(self):
+		Runner.get = self._runner_get
+		wsgi.USE_PROGRESS_STREAM = self._use_stream
+	
+	def follow(self, client_func):
+		""" Runs NUM_CLIENTS clients with a session each until the run is
+		done, returns the number of requests and CPU seconds. """
+		clients = []
+		for i in xrange(NUM_CLIENTS):
+			client = WSGIClient(wsgi.app)
+			client.request('/session', 'PUT', 'last_manual_input=load%d' % i)
+			clients.append(client)
+		
+		self.run = TimedRun('load-test-run', RUN_SECONDS)
+		requests = [0] * NUM_CLIENTS
+		def follow_one(i):
+			requests[i] = client_func(clients[i], '/trial_runs/%s' % self.run.run_id)
+		
+		cpu = cpu_seconds()
+		threads = [threading.Thread(target=follow_one, args=(i,)) for i in xrange(NUM_CLIENTS)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		
+		return sum(requests), cpu_seconds() - cpu
+	
+	def poll(self, client, run_path):
+		num = 0
+		while True:
+			status, headers, body = client.request(run_path + '/progress')
+			num += 1
+			self.assertEqual(200, status)
+			if 'done' == body:
+				return num
+			time.sleep(POLL_INTERVAL)
+	
+	def stream(self, client, run_path):
+		num = 0
+		while True:
+			status, headers, body = client.request(run_path + '/progress/stream')
+			num += 1
+			self.assertEqual(200, status)
+			if 'data: done\n' in body:
+				return num
+	
+	def test_polling_versus_stream(self):
+		poll_requests, poll_cpu = self.follow(self.poll)
+		stream_requests, stream_cpu = self.follow(self.stream)
+		print "\n%d clients following a %.0f second run:" % (NUM_CLIENTS, RUN_SECONDS)
+		print "  polling: %5d requests, %.2f s CPU" % (poll_requests, poll_cpu)
+		print "  stream:  %5d requests, %.2f s CPU" % (stream_requests, stream_cpu)
+		
+		# every client polls about once per second, but opens one stream
+		self.assertGreaterEqual(poll_requests, NUM_CLIENTS * int(RUN_SECONDS))
+		self.assertEqual(NUM_CLIENTS, stream_requests)
+
+
+if '__main__' == __name__:
+	unittest.main()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+import json
+import unittest
+
+import wsgi
+from ClinicalTrials.runner import Runner
+from tests.wsgiclient import WSGIClient
+
+
+class FinishedRun(object):
+	""" A run that is done and found `num_trials` trials. Its filter reasons
+	are stored, every worker sees the same. """
+	
+	def __init__(self, run_id, num_trials):
+		self.run_id = run_id
+		self.status = 'done'
+		self.reference_location = ('42.358', '-71.06')
+		self.reasons = {}
+		self.trials = [{
+			'nct': 'NCT%08d' % i,
+			'phase': 'Phase 2',
+			'intervention': [{'intervention_type': 'Drug'}],
+			'location': [{'facility': {'name': 'Site %d' % j}, 'geodata': {'latitude': 42.0 + j, 'longitude': -71.0}} for j in xrange(3)],
+		} for i in xrange(num_trials)]
+	
+	@property
+	def done(self):
+		return 'done' == self.status
+	
+	def overview(self):
+		return {'intervention_types': {'Drug': len(self.trials)}, 'drug_phases': {}}
+	
+	def trials_json(self, types, phases):
+		return [dict(trial, reason=self.reasons.get(trial['nct'])) for trial in self.trials]
+	
+	def get_ncts(self, restrict='reason'):
+		return [(trial['nct'], self.reasons.get(trial['nct'])) for trial in self.trials]
+
+
+class RunStudies(object):
+	""" The studies collection holding the trials of a run. """
+	
+	def __init__(self, run):
+		self.run = run
+		self.projections = []
+	
+	def find(self, query, projection):
+		self.projections.append(projection)
+		ncts = query['_id']['$in']
+		return [dict([(key, trial[key]) for key in projection if key in trial], _id=trial['nct']) for trial in self.run.trials if trial['nct'] in ncts]
+
+
+class StoredTrial(object):
+	""" A Trial loaded from the trials of `run`. """
+	
+	run = None
+	
+	def __init__(self, nct, doc=None):
+		self.nct = nct
+		self.doc = doc
+	
+	@classmethod
+	def retrieve(cls, ncts):
+		docs = dict((trial['nct'], trial) for trial in cls.run.trials)
+		return [cls(nct, docs[nct]) for nct in ncts if nct in docs]
+	
+	def json(self, fields=None):
+		return dict([(k, v) for k, v in self.doc.items() if fields is None or k in fields], nct=self.nct)
+
+
+class RunTrialsTest(unittest.TestCase):
+	
+	def setUp(self):
+		self.run = FinishedRun('run-trials-test', 10)
+		self._runner_get = Runner.__dict__['get']
+		Runner.get = classmethod(lambda cls, run_id: self.run if run_id == self.run.run_id else None)
+		self._trial = (wsgi.Trial, wsgi._studies)
+		StoredTrial.run = self.run
+		wsgi.Trial = StoredTrial
+		wsgi._studies = RunStudies(self.run)
+		wsgi._run_facets.clear()
+		self.client = WSGIClient(wsgi.app)
+	
+	def tearDown(self):
+		Runner.get = self._runner_get
+		wsgi.Trial, wsgi._studies = self._trial
+		wsgi._run_facets.clear()
+	
+	def get(self, query):
+		status, headers, body = self.client.request('/trial_runs/%s/trials?intv=Drug&%s' % (self.run.run_id, query))
+		return status, json.loads(body) if 200 == status else body
+	
+	def test_pages(self):
+		status, data = self.get('offset=0&limit=4')
+		self.assertEqual(200, status)
+		self.assertEqual(['NCT%08d' % i for i in xrange(4)], [trial['nct'] for trial in data['trials']])
+		self.assertEqual(4, data['next'])
+		
+		status, data = self.get('offset=8&limit=4')
+		self.assertEqual(['NCT00000008', 'NCT00000009'], [trial['nct'] for trial in data['trials']])
+		self.assertIsNone(data['next'])
+	
+	def test_distance_and_fields(self):
+		status, data = self.get('limit=2&sites=1&fields=phase,location')
+		trial = data['trials'][0]
+		self.assertEqual(set(['nct', 'phase', 'location', 'distance', 'location_count']), set(trial.keys()))
+		self.assertEqual(1, len(trial['location']))
+		self.assertEqual(3, trial['location_count'])
+	
+	def test_list_profile(self):
+		""" Only the fields of the profile are read from MongoDB. """
+		self.run.reasons['NCT00000000'] = 'Patient is too old (max age 40)'
+		status, data = self.get('limit=1&fields=list')
+		self.assertEqual(set(['nct', 'reason', 'phase', 'location', 'intervention']), set(data['trials'][0].keys()))
+		self.assertEqual(['acronym', 'brief_title', 'intervention', 'keyword', 'location', 'official_title', 'phase'], sorted(wsgi._studies.projections[-1].keys()))
+	
+	def test_unknown_field(self):
+		status, body = self.get('fields=phase,secret_notes')
+		self.assertEqual(400, status)
+		self.assertIn('Unknown field', body)
+	
+	def test_index_keeps_no_trials(self):
+		self.get('limit=2')
+		facets = wsgi._run_facets.get(self.run.run_id)
+		self.assertEqual(10, len(facets.ncts))
+		self.assertFalse(hasattr(facets, 'trials'))
+		self.assertFalse(hasattr(facets.sites, 'trials'))
+		self.assertFalse(hasattr(facets.pins, 'trials'))
+	
+	def test_filtered_by_another_worker(self):
+		""" Reasons written through another worker show up in the next page
+		and the index is rebuilt, with no invalidation in this worker. """
+		self.get('limit=2')
+		facets = wsgi._run_facets.get(self.run.run_id)
+		
+		self.run.reasons['NCT00000001'] = 'Patient is too old (max age 40)'
+		status, data = self.get('limit=2')
+		self.assertEqual([None, 'Patient is too old (max age 40)'], [trial.get('reason') for trial in data['trials']])
+		self.assertIsNot(facets, wsgi._run_facets.get(self.run.run_id))
+	
+	def test_negative_numbers_are_rejected(self):
+		for query in ['offset=-2', 'offset=-2&limit=2', 'limit=-1', 'sites=-1', 'sort=distance&sites=-3']:
+			status, body = self.get(query)
+			self.assertEqual(400, status, query)
+		
+		status, headers, body = self.client.request('/trial_runs/%s/trials/NCT00000001/sites?offset=-1' % self.run.run_id)
+		self.assertEqual(400, status)
+
+
+if '__main__' == __name__:
+	unittest.main()
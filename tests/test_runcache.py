@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import unittest
+
+from ClinicalTrials.runner import Runner
+from runcache import RunCache, followed_run_id
+
+
+FIELDS = ['id', 'brief_title', 'eligibility']
+
+
+class StoredRun(object):
+	""" A run as Runner.get() returns it, with its status and trials in a
+	store all workers share. """
+	
+	store = {}
+	
+	def __init__(self, run_id, condition=None, term=None):
+		self.run_id = run_id
+		self.condition = condition
+		self.term = term
+		self.status = 'Initializing'
+		self.ncts = []
+		StoredRun.store[run_id] = self
+	
+	@property
+	def done(self):
+		return 'done' == self.status
+	
+	def write_ncts(self, ncts):
+		self.ncts = list(ncts)
+	
+	def get_ncts(self, restrict='reason'):
+		return [(nct, None) for nct in self.ncts]
+	
+	def finish(self, ncts):
+		self.write_ncts(ncts)
+		self.status = 'done'
+
+
+class RunCacheTest(unittest.TestCase):
+	
+	def setUp(self):
+		StoredRun.store = {}
+		self._runner_get = Runner.__dict__['get']
+		Runner.get = classmethod(lambda cls, run_id: StoredRun.store.get(run_id))
+	
+	def tearDown(self):
+		Runner.get = self._runner_get
+	
+	def test_single_flight(self):
+		""" Of many identical searches arriving at once exactly one runs, the
+		others follow it and get its trials once it's done. """
+		cache = RunCache()
+		runs = [StoredRun('run-%02d' % i, condition='Juvenile Arthritis') for i in xrange(50)]
+		sources = [None] * len(runs)
+		start = threading.Event()
+		
+		def attach(i):
+			start.wait()
+			sources[i] = cache.attach(runs[i], FIELDS)
+		
+		threads = [threading.Thread(target=attach, args=(i,)) for i in xrange(len(runs))]
+		for thread in threads:
+			thread.start()
+		start.set()
+		for thread in threads:
+			thread.join()
+		
+		leaders = [run for run, source in zip(runs, sources) if source is None]
+		self.assertEqual(1, len(leaders))
+		leader = leaders[0]
+		followers = [run for run in runs if run is not leader]
+		for run, source in zip(runs, sources):
+			if run is not leader:
+				self.assertIs(leader, source)
+				self.assertEqual(leader.run_id, followed_run_id(run))
+		self.assertEqual(len(followers), cache.stats()['joins'])
+		
+		# while the leader runs, followers report its progress
+		leader.status = 'Downloading trials'
+		for run in followers:
+			self.assertIs(leader, cache.leader_of(run))
+		
+		# once done, followers settling concurrently all get its trials
+		leader.finish(['NCT00000001', 'NCT00000002'])
+		threads = [threading.Thread(target=cache.leader_of, args=(run,)) for run in followers]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		
+		for run in followers:
+			self.assertTrue(run.done)
+			self.assertIsNone(followed_run_id(run))
+			self.assertEqual(['NCT00000001', 'NCT00000002'], run.ncts)
+	
+	def test_settled_by_another_worker(self):
+		""" A follower is settled by a worker that did not see it attach. """
+		worker_a = RunCache()
+		worker_b = RunCache()
+		leader = StoredRun('run-leader', term='asthma')
+		follower = StoredRun('run-follower', term='asthma')
+		self.assertIsNone(worker_a.attach(leader, FIELDS))
+		self.assertIs(leader, worker_a.attach(follower, FIELDS))
+		
+		self.assertIs(leader, worker_b.leader_of(follower))
+		leader.finish(['NCT00000003'])
+		worker_b.settle(follower)
+		self.assertTrue(follower.done)
+		self.assertEqual(['NCT00000003'], follower.ncts)
+	
+	def test_failed_or_gone_leader(self):
+		cache = RunCache()
+		leader = StoredRun('run-leader', term='asthma')
+		follower = StoredRun('run-follower', term='asthma')
+		gone_follower = StoredRun('run-gone', term='asthma')
+		cache.attach(leader, FIELDS)
+		cache.attach(follower, FIELDS)
+		cache.attach(gone_follower, FIELDS)
+		
+		leader.status = 'Error: ClinicalTrials.gov is down'
+		cache.settle(follower)
+		self.assertEqual('Error: ClinicalTrials.gov is down', follower.status)
+		
+		del StoredRun.store['run-leader']
+		self.assertIs(gone_follower, cache.leader_of(gone_follower))
+		self.assertTrue(gone_follower.status.startswith('Error'))
+		
+		# a failed run is not reused
+		retry = StoredRun('run-retry', term='asthma')
+		StoredRun.store['run-leader'] = leader
+		self.assertIsNone(cache.attach(retry, FIELDS))
+
+
+if '__main__' == __name__:
+	unittest.main()
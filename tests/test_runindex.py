@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from runindex import DemographicsIndex, ExclusionIndex, SiteIndex, PinIndex, cell_xy
+
+
+def site(lat, lng):
+	return {'geodata': {'latitude': lat, 'longitude': lng}}
+
+
+# sites around a reference in Boston, about 160 km to Portland (ME), 300 km
+# to New York and 1,400 km to Chicago
+BOSTON = (42.358, -71.060)
+PORTLAND = site(43.661, -70.255)
+NEW_YORK = site(40.713, -74.006)
+CHICAGO = site(41.878, -87.630)
+SITE_TRIALS = [
+	{'nct': 'NCT00000001', 'location': [CHICAGO, NEW_YORK]},
+	{'nct': 'NCT00000002', 'location': [{'facility': {'name': 'Not geocoded'}}, PORTLAND]},
+	{'nct': 'NCT00000003', 'location': [CHICAGO]},
+	{'nct': 'NCT00000004', 'location': [{'geodata': {'source': 'geonames', 'latitude': None}}]},
+	{'nct': 'NCT00000005'},
+]
+
+
+class Eligibility(object):
+	
+	def __init__(self, gender, min_age, max_age):
+		self.gender = gender
+		self.min_age = min_age
+		self.max_age = max_age
+
+
+class EligibleTrial(object):
+	""" A loaded trial with the given eligibility, None if it has none. """
+	
+	def __init__(self, nct, eligibility):
+		self.nct = nct
+		self.eligibility = eligibility
+
+
+class DemographicsIndexTest(unittest.TestCase):
+	
+	def setUp(self):
+		self.index = DemographicsIndex.from_trials([
+			EligibleTrial('NCT00000001', Eligibility(0, 18, 65)),
+			EligibleTrial('NCT00000002', Eligibility(2, 18, None)),
+			EligibleTrial('NCT00000003', Eligibility(1, None, 17)),
+			EligibleTrial('NCT00000004', None),
+			EligibleTrial('NCT00000005', Eligibility(None, 70, 0)),
+		])
+	
+	def test_columns(self):
+		""" Missing limits are stored as 0, missing eligibility as no limit at
+		all. """
+		self.assertEqual(5, len(self.index))
+		self.assertEqual(['NCT00000001', 'NCT00000002', 'NCT00000003', 'NCT00000004', 'NCT00000005'], self.index.ncts)
+		self.assertEqual([0, 2, 1, 0, 0], list(self.index.genders))
+		self.assertEqual([18, 18, 0, 0, 70], list(self.index.min_ages))
+		self.assertEqual([65, 0, 17, 0, 0], list(self.index.max_ages))
+	
+	def test_rejected(self):
+		self.assertEqual([], self.index.rejected())
+		self.assertEqual([('NCT00000002', "Limited to women")], self.index.rejected('male'))
+		self.assertEqual([('NCT00000003', "Limited to men")], self.index.rejected('female'))
+		self.assertEqual([
+			('NCT00000001', "Patient is too young (min age 18)"),
+			('NCT00000002', "Patient is too young (min age 18)"),
+			('NCT00000005', "Patient is too young (min age 70)"),
+		], self.index.rejected(age=12))
+		self.assertEqual([
+			('NCT00000001', "Patient is too old (max age 65)"),
+			('NCT00000003', "Patient is too old (max age 17)"),
+		], self.index.rejected(age=75))
+	
+	def test_age_before_gender(self):
+		""" A trial rejected for both reports the age. """
+		self.assertEqual([
+			('NCT00000001', "Patient is too young (min age 18)"),
+			('NCT00000002', "Patient is too young (min age 18)"),
+			('NCT00000005', "Patient is too young (min age 70)"),
+		], self.index.rejected('male', 12))
+		self.assertEqual([
+			('NCT00000002', "Limited to women"),
+			('NCT00000003', "Patient is too old (max age 17)"),
+			('NCT00000005', "Patient is too young (min age 70)"),
+		], self.index.rejected('male', 40))
+
+
+class AnalyzedTrial(object):
+	""" A trial with the given SNOMED codes found in its exclusion criteria,
+	by pipeline. """
+	
+	def __init__(self, nct, codes_by_pipeline):
+		self.nct = nct
+		self.codes_by_pipeline = codes_by_pipeline
+	
+	def analyzable_results(self):
+		if self.codes_by_pipeline is None:
+			return None
+		return {'eligibility_exclusion': dict((name, {'codes': {'snomed': codes}} if codes is not None else None) for name, codes in self.codes_by_pipeline.items())}
+
+
+class ExclusionIndexTest(unittest.TestCase):
+	
+	def setUp(self):
+		self.index = ExclusionIndex.from_trials([
+			AnalyzedTrial('NCT00000003', {'ctakes': ['69896004'], 'metamap': ['69896004', '73211009']}),
+			AnalyzedTrial('NCT00000001', {'ctakes': ['73211009']}),
+			AnalyzedTrial('NCT00000002', {'ctakes': [], 'metamap': None}),
+			AnalyzedTrial('NCT00000004', None),
+			AnalyzedTrial('NCT00000005', {'ctakes': ['69896004']}),
+		])
+	
+	def test_from_trials(self):
+		""" Codes of all pipelines are indexed, trials without results are
+		not. """
+		self.assertEqual({
+			'69896004': set(['NCT00000003', 'NCT00000005']),
+			'73211009': set(['NCT00000001', 'NCT00000003']),
+		}, self.index.ncts_by_code)
+		self.assertEqual(2, len(self.index))
+	
+	def test_matches(self):
+		""" Trials are reported once, with the first code they match, in the
+		order of the codes and then by NCT. """
+		self.assertEqual([('NCT00000003', '69896004'), ('NCT00000005', '69896004')], self.index.matches(['69896004']))
+		self.assertEqual([('NCT00000001', '73211009'), ('NCT00000003', '73211009'), ('NCT00000005', '69896004')], self.index.matches(['73211009', '69896004']))
+		self.assertEqual([], self.index.matches(['38341003']))
+		self.assertEqual([], self.index.matches([]))
+
+
+class SiteIndexTest(unittest.TestCase):
+	
+	def setUp(self):
+		self.sites = SiteIndex(SITE_TRIALS, BOSTON)
+	
+	def test_sort(self):
+		""" Trials are ordered by their closest site, those without one come
+		last in run order. """
+		self.assertEqual([1, 0, 2, 3, 4], self.sites.sort(range(5)))
+		self.assertEqual([0, 2, 4], self.sites.sort([4, 2, 0]))
+		self.assertAlmostEqual(159, self.sites.closest[1], delta=5)
+		self.assertAlmostEqual(306, self.sites.closest[0], delta=5)
+	
+	def test_max_km(self):
+		self.assertEqual([1, 0], self.sites.sort(range(5), 500))
+		self.assertEqual([1], self.sites.sort(range(5), 200))
+		self.assertEqual([], self.sites.sort(range(5), 100))
+		self.assertEqual([1, 0, 2], self.sites.sort(range(5), 2000))
+		self.assertEqual([0, 1], self.sites.within(range(5), 500))
+		self.assertEqual([2, 0], self.sites.within([4, 2, 0], 2000))
+	
+	def test_nearest(self):
+		trial = self.sites.nearest(0, SITE_TRIALS[0], 1)
+		self.assertEqual(([NEW_YORK['geodata']], 2), ([loc['geodata'] for loc in trial['location']], trial['location_count']))
+		self.assertEqual(trial['location'][0]['distance'], trial['distance'])
+		
+		# sites without coordinates come last and have no distance
+		trial = self.sites.nearest(1, SITE_TRIALS[1])
+		self.assertEqual([True, False], ['distance' in loc for loc in trial['location']])
+		self.assertNotIn('distance', self.sites.nearest(4, SITE_TRIALS[4]))
+	
+	def test_for_reference(self):
+		self.assertEqual((42.358, -71.06), SiteIndex.for_reference(SITE_TRIALS, ['42.358', '-71.06']).reference)
+		self.assertIsNone(SiteIndex.for_reference(SITE_TRIALS, ['north', '-71.06']))
+		self.assertIsNone(SiteIndex.for_reference(SITE_TRIALS, None))
+
+
+# two hospitals in Boston, 4 km apart
+LONGWOOD = site(42.336, -71.107)
+ALLSTON = site(42.363, -71.135)
+PIN_TRIALS = [
+	{'nct': 'NCT00000001', 'location': [LONGWOOD, NEW_YORK]},
+	{'nct': 'NCT00000002', 'location': [ALLSTON, {'facility': {'name': 'Not geocoded'}}, CHICAGO]},
+	{'nct': 'NCT00000003'},
+	{'nct': 'NCT00000004', 'location': [PORTLAND]},
+]
+ALL_TRIALS = 0b1111
+
+
+class PinIndexTest(unittest.TestCase):
+	
+	def setUp(self):
+		self.pins = PinIndex(PIN_TRIALS)
+	
+	def counts(self, zoom, mask=ALL_TRIALS, bbox=None):
+		clusters, total = self.pins.clusters(zoom, mask, bbox)
+		return sorted([cluster['count'] for cluster in clusters]), total
+	
+	def test_cell_xy(self):
+		self.assertEqual((2, 2), cell_xy(0, 0, 4))
+		self.assertEqual((1, 1), cell_xy(42.358, -71.060, 4))
+		self.assertEqual((0, 0), cell_xy(90, -180, 4))
+		self.assertEqual((3, 3), cell_xy(-90, 180, 4))
+		self.assertEqual((0, 0), cell_xy(-85, 180, 1))
+		
+		# a cell per 64 pixels of the map's 256 pixel tiles
+		self.assertEqual(4, self.pins.cells_per_axis(0))
+		self.assertEqual(4096, self.pins.cells_per_axis(10))
+	
+	def test_zoom(self):
+		""" All of the US is one cluster on the whole world map, Boston's
+		sites are one until zooming into the city. """
+		self.assertEqual(5, len(self.pins))
+		self.assertEqual(([5], 5), self.counts(0))
+		self.assertEqual(([1, 1, 1, 2], 5), self.counts(8))
+		self.assertEqual(([1, 1, 1, 1, 1], 5), self.counts(14))
+		self.assertEqual(self.counts(20), self.counts(25))
+		self.assertEqual([0, 8, 14, 20], sorted(self.pins._grids.keys()))
+	
+	def test_sites(self):
+		clusters, total = self.pins.clusters(8, ALL_TRIALS, (42, -72, 43, -71))
+		self.assertEqual(1, len(clusters))
+		self.assertEqual((2, 2), (clusters[0]['count'], clusters[0]['trials']))
+		self.assertAlmostEqual(42.3495, clusters[0]['lat'])
+		self.assertEqual([{'nct': 'NCT00000001', 'site': 0}, {'nct': 'NCT00000002', 'site': 0}], sorted(clusters[0]['sites']))
+		
+		# larger clusters have bounds instead
+		self.pins.max_listed = 4
+		clusters, total = self.pins.clusters(0, ALL_TRIALS)
+		self.assertNotIn('sites', clusters[0])
+		self.assertEqual([40.713, -87.630, 43.661, -70.255], clusters[0]['bounds'])
+	
+	def test_mask(self):
+		""" Only the sites of the trials in the mask are clustered and
+		counted, the clusters of unfiltered cells are kept. """
+		self.assertEqual(([1, 1], 2), self.counts(8, 0b0001))
+		self.assertEqual(([1, 1, 1], 3), self.counts(8, 0b1010))
+		self.assertEqual(([], 0), self.counts(8, 0b0100))
+		
+		first = self.pins.clusters(8, ALL_TRIALS)[0]
+		self.assertTrue(all([a is b for a, b in zip(first, self.pins.clusters(8, ALL_TRIALS)[0])]))
+		boston = self.pins.grid(8)[cell_xy(42.336, -71.107, 1024)]
+		self.assertEqual(2, boston[2]['count'])
+		self.pins.clusters(8, 0b0001)
+		self.assertEqual(2, boston[2]['count'])
+	
+	def test_bbox(self):
+		""" Only clusters in the viewport are returned, the total counts all
+		sites of the trials. """
+		self.assertEqual(([1, 2], 5), self.counts(8, bbox=(42, -72, 44, -70)))
+		self.assertEqual(([1, 1, 1, 2], 5), self.counts(8, bbox=(-85, -180, 85, 180)))
+		
+		# a viewport across the antimeridian, from Japan to Illinois
+		self.assertEqual(([1], 5), self.counts(8, bbox=(30, 140, 50, -80)))
+
+
+if '__main__' == __name__:
+	unittest.main()
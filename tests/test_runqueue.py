@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import unittest
+
+import wsgi
+from runcache import RunCache
+from runqueue import RunQueue, RunQueueFull
+from tests.wsgiclient import WSGIClient
+
+
+class GatedRun(object):
+	""" A run that takes until it is released. """
+	
+	def __init__(self, run_id, log=None, error=None):
+		self.run_id = run_id
+		self.status = 'Initializing'
+		self.log = log if log is not None else []
+		self.error = error
+		self.started = threading.Event()
+		self.release = threading.Event()
+		self.finished = threading.Event()
+	
+	def run(self, fields=None):
+		self.log.append(self.run_id)
+		self.started.set()
+		try:
+			self.release.wait(5)
+			if self.error is not None:
+				raise self.error
+			self.status = 'done'
+		finally:
+			self.finished.set()
+
+
+class RunQueueTest(unittest.TestCase):
+	
+	def test_fifo_and_positions(self):
+		queue = RunQueue(num_workers=1, max_waiting=3)
+		log = []
+		runs = [GatedRun('run-%d' % i, log) for i in xrange(4)]
+		queue.submit(runs[0], None)
+		self.assertTrue(runs[0].started.wait(5))
+		for run in runs[1:]:
+			queue.submit(run, None)
+		
+		self.assertIsNone(queue.position('run-0'))
+		self.assertEqual([1, 2, 3], [queue.position(run.run_id) for run in runs[1:]])
+		self.assertEqual({'workers': 1, 'running': 1, 'waiting': 3, 'max_waiting': 3}, queue.stats())
+		
+		# full: rejected, and the queue is unchanged
+		self.assertRaises(RunQueueFull, queue.submit, GatedRun('run-4'), None)
+		self.assertEqual(3, queue.stats()['waiting'])
+		
+		for run in runs:
+			run.release.set()
+			self.assertTrue(run.finished.wait(5))
+		self.assertEqual(['run-0', 'run-1', 'run-2', 'run-3'], log)
+		self.assertEqual(['done'] * 4, [run.status for run in runs])
+	
+	def test_failing_run(self):
+		queue = RunQueue(num_workers=1, max_waiting=1)
+		run = GatedRun('run-error', error=ValueError('no trials'))
+		run.release.set()
+		queue.submit(run, None)
+		self.assertTrue(run.finished.wait(5))
+		
+		# the worker survives the error
+		later = GatedRun('run-later')
+		later.release.set()
+		queue.submit(later, None)
+		self.assertTrue(later.finished.wait(5))
+		self.assertEqual('done', later.status)
+		self.assertEqual('Error: no trials', run.status)
+
+
+class FindTrialsQueueTest(unittest.TestCase):
+	""" How /trial_runs reports the queue. """
+	
+	def setUp(self):
+		self._saved = (wsgi._run_queue, wsgi._run_cache)
+		wsgi._run_cache = RunCache()
+		self.client = WSGIClient(wsgi.app)
+		self.busy = GatedRun('run-busy')
+	
+	def tearDown(self):
+		self.busy.release.set()
+		wsgi._run_queue, wsgi._run_cache = self._saved
+	
+	def occupy(self, queue):
+		wsgi._run_queue = queue
+		queue.submit(self.busy, None)
+		self.assertTrue(self.busy.started.wait(5))
+	
+	def test_position_in_progress(self):
+		self.occupy(RunQueue(num_workers=1, max_waiting=5))
+		status, headers, first = self.client.request('/trial_runs?term=asthma')
+		status, headers, second = self.client.request('/trial_runs?term=arthritis')
+		
+		self.assertEqual("Waiting for a free slot, we're next", self.client.request('/trial_runs/%s/progress' % first)[2])
+		self.assertEqual("Waiting for a free slot, 1 search ahead of us", self.client.request('/trial_runs/%s/progress' % second)[2])
+	
+	def test_full_queue_is_503(self):
+		self.occupy(RunQueue(num_workers=1, max_waiting=1))
+		self.assertEqual(200, self.client.request('/trial_runs?term=asthma')[0])
+		
+		status, headers, body = self.client.request('/trial_runs?term=arthritis')
+		self.assertEqual(503, status)
+		self.assertEqual('60', headers.get('Retry-After'))
+		self.assertTrue(body.startswith('Error'))
+
+
+if '__main__' == __name__:
+	unittest.main()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+import bottle
+
+from sessionstore import SessionMiddleware, ExpiringFileNamespaceManager, LRUNamespaceManager, MongoNamespaceManager
+from tests.wsgiclient import WSGIClient
+
+
+LIFETIME = 1
+
+
+def session_app(namespace_class, data_dir):
+	""" An app that stores and reads one session value, with sessions like
+	wsgi.py sets them up. """
+	app = bottle.Bottle()
+	
+	@app.get('/value')
+	def get_value():
+		return bottle.request.environ['beaker.session'].get('value', '')
+	
+	@app.put('/value')
+	def put_value():
+		sess = bottle.request.environ['beaker.session']
+		sess['value'] = bottle.request.forms.get('value')
+		sess.save()
+		return 'ok'
+	
+	return SessionMiddleware(app, {
+		'session.type': 'file',
+		'session.data_dir': data_dir,
+		'session.save_accessed_time': False,
+		'session.lifetime': LIFETIME,
+		'session.namespace_class': namespace_class,
+	})
+
+
+class SessionExpiryTest(unittest.TestCase):
+	""" Sessions are gone `lifetime` seconds after they were last saved, no
+	matter how often they were read in between. """
+	
+	def setUp(self):
+		self.data_dir = tempfile.mkdtemp()
+		LRUNamespaceManager.sessions = None
+	
+	def tearDown(self):
+		shutil.rmtree(self.data_dir)
+		LRUNamespaceManager.sessions = None
+	
+	def check_expiry(self, namespace_class):
+		client = WSGIClient(session_app(namespace_class, self.data_dir))
+		self.assertEqual('ok', client.request('/value', 'PUT', 'value=kept')[2])
+		self.assertEqual('kept', client.request('/value')[2])
+		
+		# reading does not extend the lifetime, saving does
+		time.sleep(0.6 * LIFETIME)
+		self.assertEqual('kept', client.request('/value')[2])
+		client.request('/value', 'PUT', 'value=saved again')
+		time.sleep(0.6 * LIFETIME)
+		self.assertEqual('saved again', client.request('/value')[2])
+		
+		time.sleep(0.6 * LIFETIME)
+		self.assertEqual('', client.request('/value')[2])
+	
+	def test_file_sessions_expire(self):
+		self.check_expiry(ExpiringFileNamespaceManager)
+		session_dir = os.path.join(self.data_dir, 'container_file')
+		files = [name for path, dirs, names in os.walk(session_dir) for name in names]
+		self.assertEqual([], files, "the expired session file is removed")
+	
+	def test_memory_sessions_expire(self):
+		self.check_expiry(LRUNamespaceManager)
+
+
+class Sessions(object):
+	""" The sessions collection, with the pymongo 3 calls the manager uses. """
+	
+	def __init__(self):
+		self.docs = {}
+	
+	def find_one(self, query):
+		return self.docs.get(query['_id'])
+	
+	def replace_one(self, query, doc, upsert=False):
+		if upsert or query['_id'] in self.docs:
+			self.docs[query['_id']] = doc
+	
+	def delete_one(self, query):
+		self.docs.pop(query['_id'], None)
+
+
+class MongoNamespaceManagerTest(unittest.TestCase):
+	
+	url = 'mongodb://sessions.test:27017'
+	
+	def setUp(self):
+		self.sessions = Sessions()
+		MongoNamespaceManager._collections[self.url] = self.sessions
+	
+	def tearDown(self):
+		del MongoNamespaceManager._collections[self.url]
+	
+	def test_save_and_remove(self):
+		manager = MongoNamespaceManager('some-session', url=self.url, lifetime=60)
+		manager.acquire_write_lock()
+		manager['value'] = 'kept'
+		manager.release_write_lock()
+		self.assertEqual(['some-session'], self.sessions.docs.keys())
+		self.assertIn('expires', self.sessions.docs['some-session'])
+		
+		manager = MongoNamespaceManager('some-session', url=self.url)
+		self.assertEqual('kept', manager['value'])
+		manager.do_remove()
+		self.assertEqual({}, self.sessions.docs)
+	
+	def test_creation_lock(self):
+		manager = MongoNamespaceManager('some-session', url='mongodb://localhost:27017')
+		lock = manager.get_creation_lock('session')
+		self.assertTrue(lock.acquire(wait=False))
+		lock.release()
+
+
+if '__main__' == __name__:
+	unittest.main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from snomedtree import SNOMEDTree, build_closure, ISA_TYPE_ID
+from runindex import ExclusionIndex
+
+
+CLINICAL_FINDING = '404684003'
+DISEASE = '64572001'
+ARTHROPATHY = '399269003'
+RHEUMATOID_ARTHRITIS = '69896004'
+OSTEOARTHRITIS = '396275006'
+
+
+class SNOMEDTreeTest(unittest.TestCase):
+	""" Problems expand to their specific parents, not to the generic concepts
+	near the root that every problem shares. """
+	
+	def setUp(self):
+		self.tmp_dir = tempfile.mkdtemp()
+		rel_path = os.path.join(self.tmp_dir, 'snomed_rel.csv')
+		db_path = os.path.join(self.tmp_dir, 'snomed_closure.db')
+		
+		isa = [
+			(DISEASE, CLINICAL_FINDING),
+			(ARTHROPATHY, DISEASE),
+			(RHEUMATOID_ARTHRITIS, ARTHROPATHY),
+			(OSTEOARTHRITIS, ARTHROPATHY),
+		]
+		isa.extend([(str(100000 + i), DISEASE) for i in xrange(20)])
+		with open(rel_path, 'wb') as handle:
+			handle.write('id\teffectiveTime\tactive\tmoduleId\tsourceId\tdestinationId\trelationshipGroup\ttypeId\n')
+			for i, (source, destination) in enumerate(isa):
+				handle.write('%d\t20150131\t1\t900000000000207008\t%s\t%s\t0\t%s\n' % (i + 1, source, destination, ISA_TYPE_ID))
+		
+		build_closure(rel_path, db_path)
+		self.tree = SNOMEDTree(db_path)
+	
+	def tearDown(self):
+		shutil.rmtree(self.tmp_dir)
+	
+	def test_expand_skips_generic_ancestors(self):
+		self.assertEqual(set([ARTHROPATHY, DISEASE, CLINICAL_FINDING]), self.tree.ancestors(RHEUMATOID_ARTHRITIS))
+		self.assertEqual([RHEUMATOID_ARTHRITIS, ARTHROPATHY], self.tree.expand([RHEUMATOID_ARTHRITIS], max_descendants=5))
+		self.assertEqual([RHEUMATOID_ARTHRITIS, DISEASE, ARTHROPATHY], self.tree.expand([RHEUMATOID_ARTHRITIS], max_descendants=23))
+	
+	def test_sibling_does_not_match(self):
+		""" A patient with rheumatoid arthritis is excluded by a trial excluding
+		arthropathy, not by one excluding osteoarthritis or any disease. """
+		index = ExclusionIndex({
+			OSTEOARTHRITIS: set(['NCT00000001']),
+			DISEASE: set(['NCT00000002']),
+			CLINICAL_FINDING: set(['NCT00000003']),
+			ARTHROPATHY: set(['NCT00000004']),
+		})
+		codes = self.tree.expand([RHEUMATOID_ARTHRITIS], max_descendants=5)
+		self.assertEqual([('NCT00000004', ARTHROPATHY)], index.matches(codes))
+	
+	def test_codes_that_are_not_concept_ids(self):
+		for code in ['', 'C0003873', '6989600x', u'６９８９６００４', '1' * 30, None]:
+			self.assertEqual(set(), self.tree.ancestors(code))
+			self.assertEqual(set(), self.tree.descendants(code))
+			self.assertFalse(self.tree.is_descendant(code, ARTHROPATHY))
+			self.assertFalse(self.tree.is_descendant(RHEUMATOID_ARTHRITIS, code))
+		self.assertEqual(['C0003873', RHEUMATOID_ARTHRITIS, ARTHROPATHY], self.tree.expand(['C0003873', RHEUMATOID_ARTHRITIS], max_descendants=5))
+	
+	def test_old_closure_is_not_expanded(self):
+		self.tree.connection().execute('DROP TABLE descendant_counts')
+		self.assertEqual([RHEUMATOID_ARTHRITIS], self.tree.expand([RHEUMATOID_ARTHRITIS]))
+
+
+if '__main__' == __name__:
+	unittest.main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import termimport
+from termimport import SNOMEDDescriptionImport, RXNCONSOImport
+
+
+# (id, effectiveTime, active, conceptId, term), descriptions 2 and 5 have an
+# older and a newer version, the newer one of 5 inactivates it
+DESCRIPTIONS = [
+	(1, '20020131', 1, 69896004, 'Rheumatoid arthritis'),
+	(2, '20020131', 1, 396275006, 'Osteoarthrosis'),
+	(3, '20020131', 1, 399269003, 'Arthropathy'),
+	(2, '20150131', 1, 396275006, 'Osteoarthritis'),
+	(4, '20020131', 1, 64572001, 'Disease'),
+	(5, '20020131', 1, 404684003, 'Clinical finding'),
+	(6, '20020131', 1, 73211009, 'Diabetes mellitus'),
+	(5, '20150131', 0, 404684003, 'Clinical finding'),
+]
+
+# RXNCONSO.RRF lines, the third one is suppressed
+CONCEPTS = [
+	['161', 'ENG', '', '', '', '', '', '1', '', '', '', 'RXNORM', 'IN', '161', 'Acetaminophen', '0', 'N', ''],
+	['1191', 'ENG', '', '', '', '', '', '2', '', '', '', 'RXNORM', 'IN', '1191', 'Aspirin', '0', 'N', ''],
+	['1191', 'ENG', '', '', '', '', '', '3', '', '', '', 'RXNORM', 'SY', '1191', 'ASA', '0', 'O', ''],
+	['5640', 'ENG', '', '', '', '', '', '4', '', '', '', 'RXNORM', 'IN', '5640', 'Ibuprofen', '0', 'N', ''],
+	['6809', 'ENG', '', '', '', '', '', '5', '', '', '', 'RXNORM', 'IN', '6809', 'Metformin', '0', 'N', ''],
+]
+
+
+class Interrupted(Exception):
+	pass
+
+
+def interrupted_at(import_class, line):
+	""" A subclass of the import class that stops when it reaches the given
+	line, like a killed import. """
+	class InterruptedImport(import_class):
+		lines = 0
+		
+		def row(self, fields):
+			InterruptedImport.lines += 1
+			if InterruptedImport.lines >= line:
+				raise Interrupted()
+			return import_class.row(self, fields)
+	
+	return InterruptedImport
+
+
+class TermImportTest(unittest.TestCase):
+	""" An import that was stopped picks up at its last checkpoint and ends
+	with the same tables as one that ran through. """
+	
+	def setUp(self):
+		self.tmp_dir = tempfile.mkdtemp()
+		self.desc_path = os.path.join(self.tmp_dir, 'sct2_Description_Full.txt')
+		with open(self.desc_path, 'wb') as handle:
+			handle.write('id\teffectiveTime\tactive\tmoduleId\tconceptId\tlanguageCode\ttypeId\tterm\tcaseSignificanceId\n')
+			for desc_id, effective, active, concept_id, term in DESCRIPTIONS:
+				handle.write('%d\t%s\t%d\t900000000000207008\t%d\ten\t900000000000013009\t%s\t900000000000448009\n' % (desc_id, effective, active, concept_id, term))
+		
+		self.rrf_path = os.path.join(self.tmp_dir, 'RXNCONSO.RRF')
+		with open(self.rrf_path, 'wb') as handle:
+			for fields in CONCEPTS:
+				handle.write('|'.join(fields) + '|\n')
+	
+	def tearDown(self):
+		shutil.rmtree(self.tmp_dir)
+	
+	def rows(self, db_path, sql):
+		conn = sqlite3.connect(db_path)
+		rows = conn.execute(sql).fetchall()
+		conn.close()
+		return rows
+	
+	def resume(self, import_class, source_path, line, sql):
+		""" Imports once in one go and once stopped at `line` and resumed, in
+		batches of two rows. Returns the rows `sql` finds after both. """
+		complete_path = os.path.join(self.tmp_dir, 'complete.db')
+		self.assertTrue(import_class(source_path, complete_path, batch_size=2).run())
+		
+		db_path = os.path.join(self.tmp_dir, 'resumed.db')
+		self.assertRaises(Interrupted, interrupted_at(import_class, line)(source_path, db_path, batch_size=2).run)
+		offset, rows, finished = self.rows(db_path, 'SELECT offset, rows, finished FROM import_checkpoints')[0]
+		self.assertEqual((2, 0), (rows, finished))
+		self.assertTrue(offset > 0)
+		
+		resumed = import_class(source_path, db_path, batch_size=2)
+		self.assertTrue(resumed.run())
+		self.assertEqual(len(open(source_path).readlines()) - (1 if import_class.has_header else 0), resumed.rows_imported + resumed.rows_skipped)
+		self.assertFalse(import_class(source_path, db_path).run(), "a finished import is not run again")
+		
+		self.assertEqual(self.rows(complete_path, sql), self.rows(db_path, sql))
+		return self.rows(db_path, sql)
+	
+	def test_resume_rf2(self):
+		terms = self.resume(SNOMEDDescriptionImport, self.desc_path, 4, 'SELECT concept_id, term FROM descriptions ORDER BY concept_id')
+		self.assertEqual([64572001, 69896004, 73211009, 396275006, 399269003], [row[0] for row in terms])
+		self.assertIn((396275006, 'Osteoarthritis'), terms)
+	
+	def test_resume_rrf(self):
+		names = self.resume(RXNCONSOImport, self.rrf_path, 4, 'SELECT RXCUI, STR FROM RXNCONSO ORDER BY RXAUI')
+		self.assertEqual([('161', 'Acetaminophen'), ('1191', 'Aspirin'), ('5640', 'Ibuprofen'), ('6809', 'Metformin')], names)
+	
+	def test_old_sqlite(self):
+		""" RF2 imports need the UPSERT of SQLite 3.24 and fail before
+		touching the database with an older one. """
+		saved = termimport.sqlite3.sqlite_version_info
+		termimport.sqlite3.sqlite_version_info = (3, 22, 0)
+		db_path = os.path.join(self.tmp_dir, 'snomed.db')
+		try:
+			self.assertRaises(RuntimeError, SNOMEDDescriptionImport(self.desc_path, db_path).run)
+			self.assertFalse(os.path.exists(db_path))
+			self.assertTrue(RXNCONSOImport(self.rrf_path, db_path).run())
+		finally:
+			termimport.sqlite3.sqlite_version_info = saved
+
+
+if '__main__' == __name__:
+	unittest.main()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+import json
+import unittest
+
+import wsgi
+import trialfields
+from tests.wsgiclient import WSGIClient
+
+
+class Studies(object):
+	""" The studies collection, answering the projected queries of wsgi.py. """
+	
+	def __init__(self, docs):
+		self.docs = docs
+		self.projections = []
+	
+	def find(self, query, projection):
+		self.projections.append(projection)
+		ncts = query['_id']['$in']
+		return [dict((key, doc[key]) for key in ['_id'] + projection.keys() if key in doc) for nct, doc in self.docs.items() if nct in ncts]
+
+
+class Eligibility(object):
+	
+	def __init__(self, doc):
+		self.formatted_html = '<p>%s</p>' % doc['eligibility']['criteria']['textblock']
+
+
+class StoredTrial(object):
+	""" A Trial loading its document from `docs`. """
+	
+	docs = {}
+	loads = 0
+	
+	def __init__(self, nct):
+		self.nct = nct
+		self.doc = None
+	
+	def load(self):
+		StoredTrial.loads += 1
+		self.doc = dict(StoredTrial.docs[self.nct])
+		self.eligibility = Eligibility(self.doc)
+	
+	@classmethod
+	def retrieve(cls, ncts):
+		trials = [cls(nct) for nct in ncts]
+		for trial in trials:
+			trial.load()
+		return trials
+	
+	def json(self, fields=None):
+		return dict([(key, self.doc[key]) for key in fields if key in self.doc], nct=self.nct)
+
+
+class TrialETagTest(unittest.TestCase):
+	""" ETags follow the version of the stored trial, also when another
+	process (trialsync.py, ingest.py) updated it. """
+	
+	def setUp(self):
+		StoredTrial.docs = {
+			'NCT00000001': {'_id': 'NCT00000001', 'lastchanged_date': 'January 5, 2015', 'brief_summary': 'A study', 'eligibility': {'criteria': {'textblock': 'Adults'}}},
+			'NCT00000002': {'_id': 'NCT00000002', 'lastchanged_date': 'March 1, 2015', 'brief_summary': 'Another study', 'eligibility': {'criteria': {'textblock': 'Children'}}},
+		}
+		StoredTrial.loads = 0
+		self._saved = (wsgi.Trial, wsgi._studies, wsgi._criteria_html)
+		wsgi.Trial = StoredTrial
+		wsgi._studies = Studies(StoredTrial.docs)
+		wsgi._criteria_html = wsgi.LRUCache(10, 60)
+		self.client = WSGIClient(wsgi.app)
+	
+	def tearDown(self):
+		wsgi.Trial, wsgi._studies, wsgi._criteria_html = self._saved
+	
+	def check_revalidation(self, path):
+		status, headers, body = self.client.request(path)
+		self.assertEqual(200, status)
+		etag = headers['Etag']
+		loads = StoredTrial.loads
+		
+		# unchanged: 304 from the version alone
+		status, headers, body = self.client.request(path, headers={'If-None-Match': etag})
+		self.assertEqual(304, status)
+		self.assertEqual(loads, StoredTrial.loads)
+		self.assertEqual([{'lastchanged_date': 1}], wsgi._studies.projections[-1:])
+		
+		# updated by a sync: new content and etag
+		StoredTrial.docs['NCT00000001'].update({'lastchanged_date': 'June 7, 2015', 'eligibility': {'criteria': {'textblock': 'Adults over 21'}}})
+		status, headers, body = self.client.request(path, headers={'If-None-Match': etag})
+		self.assertEqual(200, status)
+		self.assertNotEqual(etag, headers['Etag'])
+		self.assertIn('Adults over 21', body)
+	
+	def test_trials(self):
+		self.check_revalidation('/trials/NCT00000001:NCT00000002?fields=eligibility')
+	
+	def test_criteria(self):
+		self.check_revalidation('/trials/NCT00000001/criteria_html')
+		
+		# rendered criteria of the current version are kept
+		loads = StoredTrial.loads
+		self.assertEqual(200, self.client.request('/trials/NCT00000001/criteria_html')[0])
+		self.assertEqual(loads, StoredTrial.loads)
+	
+	def test_fields(self):
+		""" Profiles and field lists are read with a projection. """
+		StoredTrial.docs['NCT00000001']['phase'] = 'Phase 2'
+		status, headers, body = self.client.request('/trials/NCT00000001?fields=list')
+		self.assertEqual(200, status)
+		self.assertEqual([{'nct': 'NCT00000001', 'phase': 'Phase 2'}], json.loads(body)['trials'])
+		self.assertEqual(trialfields.projection(trialfields.FIELD_PROFILES['list']), wsgi._studies.projections[-1])
+		
+		status, headers, body = self.client.request('/trials/NCT00000001')
+		self.assertEqual([{'nct': 'NCT00000001', 'phase': 'Phase 2', 'brief_summary': 'A study'}], json.loads(body)['trials'])
+		
+		status, headers, body = self.client.request('/trials/NCT00000001?fields=phase,eligibility,password')
+		self.assertEqual(400, status)
+		self.assertIn('Unknown field &quot;password&quot;', body)
+	
+	def test_without_version(self):
+		""" Trials without a last-changed date are hashed in full. """
+		del StoredTrial.docs['NCT00000002']['lastchanged_date']
+		status, headers, body = self.client.request('/trials/NCT00000002')
+		etag = headers['Etag']
+		self.assertEqual(304, self.client.request('/trials/NCT00000002', headers={'If-None-Match': etag})[0])
+		
+		StoredTrial.docs['NCT00000002']['brief_summary'] = 'A study of teenagers'
+		status, headers, body = self.client.request('/trials/NCT00000002', headers={'If-None-Match': etag})
+		self.assertEqual(200, status)
+		self.assertNotEqual(etag, headers['Etag'])
+
+
+if '__main__' == __name__:
+	unittest.main()
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+
+import requests
+
+from ctgxml import study_to_doc, content_hash, analyzed_text_hash, last_changed, parse_date
+from searchindex import TrialSearchIndex
+from trialsync import TrialSync, LAST_SYNC_ID, standin_app
+from tests.memorycollection import MemoryCollection
+
+
+STUDY_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<clinical_study rank="1">
+  <required_header>
+    <download_date>ClinicalTrials.gov processed this data on %(downloaded)s</download_date>
+    <url>http://clinicaltrials.gov/show/%(nct)s</url>
+  </required_header>
+  <id_info>
+    <org_study_id>RA-%(nct)s</org_study_id>
+    <nct_id>%(nct)s</nct_id>
+  </id_info>
+  <brief_title>%(title)s</brief_title>
+  <brief_summary>
+    <textblock>
+      Methotrexate in early rheumatoid arthritis.
+    </textblock>
+  </brief_summary>
+  <phase>Phase 2</phase>
+  <condition>Rheumatoid Arthritis</condition>
+  <intervention>
+    <intervention_type>Drug</intervention_type>
+    <intervention_name>Methotrexate</intervention_name>
+    <other_name>MTX</other_name>
+  </intervention>
+  <eligibility>
+    <criteria>
+      <textblock>%(criteria)s</textblock>
+    </criteria>
+    <gender>Both</gender>
+    <minimum_age>18 Years</minimum_age>
+    <maximum_age>N/A</maximum_age>
+  </eligibility>
+  <location>
+    <facility>
+      <name>Brigham and Women's Hospital</name>
+      <address>
+        <city>Boston</city>
+        <state>Massachusetts</state>
+        <zip>02115</zip>
+        <country>United States</country>
+      </address>
+    </facility>
+    <status>Recruiting</status>
+  </location>
+  <location>
+    <facility>
+      <name>Maine Medical Center</name>
+      <address>
+        <city>Portland</city>
+        <state>Maine</state>
+        <country>United States</country>
+      </address>
+    </facility>
+  </location>
+  <lastchanged_date>%(changed)s</lastchanged_date>
+  <keyword>arthritis</keyword>
+  <condition_browse>
+    <mesh_term>Arthritis, Rheumatoid</mesh_term>
+  </condition_browse>
+</clinical_study>
+'''
+
+
+def study_xml(nct, title='Methotrexate in Rheumatoid Arthritis', criteria='Inclusion Criteria: adults', changed='June 5, 2014', downloaded='June 6, 2014'):
+	""" The XML ClinicalTrials.gov serves for a study, with some of its
+	parts as given. """
+	return STUDY_XML % {'nct': nct, 'title': title, 'criteria': criteria, 'changed': changed, 'downloaded': downloaded}
+
+
+class QuietHandler(WSGIRequestHandler):
+	def log_message(self, *args):
+		pass
+
+
+class CountingSync(TrialSync):
+	""" Remembers which trials it downloaded, downloading the ones in
+	`unreachable` fails. """
+	
+	def __init__(self, *args, **kwargs):
+		self.unreachable = kwargs.pop('unreachable', [])
+		super(CountingSync, self).__init__(*args, **kwargs)
+		self.fetched = []
+	
+	def fetch(self, nct):
+		self.fetched.append(nct)
+		if nct in self.unreachable:
+			raise requests.ConnectionError('Connection reset by peer')
+		return super(CountingSync, self).fetch(nct)
+
+
+class CTGXMLTest(unittest.TestCase):
+	
+	def test_study_to_doc(self):
+		doc = study_to_doc(study_xml('NCT00000001', criteria='Inclusion Criteria:\n  - adults'))
+		self.assertEqual('NCT00000001', doc['_id'])
+		self.assertEqual('NCT00000001', doc['id_info']['nct_id'])
+		self.assertEqual('Methotrexate in early rheumatoid arthritis.', doc['brief_summary']['textblock'])
+		self.assertEqual('Inclusion Criteria:\n  - adults', doc['eligibility']['criteria']['textblock'])
+		self.assertEqual('18 Years', doc['eligibility']['minimum_age'])
+		
+		# repeatable elements are lists, also when there is only one
+		self.assertEqual(['Rheumatoid Arthritis'], doc['condition'])
+		self.assertEqual(['arthritis'], doc['keyword'])
+		self.assertEqual(['Arthritis, Rheumatoid'], doc['condition_browse']['mesh_term'])
+		self.assertEqual([{'intervention_type': 'Drug', 'intervention_name': 'Methotrexate', 'other_name': ['MTX']}], doc['intervention'])
+		self.assertEqual(['Boston', 'Portland'], [loc['facility']['address']['city'] for loc in doc['location']])
+		self.assertNotIn('rank', doc)
+		self.assertEqual(datetime(2014, 6, 5), last_changed(doc))
+	
+	def test_hashes(self):
+		""" Only the download date changing is no change, only criteria and
+		descriptions changing is a change of the analyzed text. """
+		doc = study_to_doc(study_xml('NCT00000001'))
+		redownloaded = study_to_doc(study_xml('NCT00000001', downloaded='July 1, 2014'))
+		retitled = study_to_doc(study_xml('NCT00000001', title='Methotrexate in RA'))
+		new_criteria = study_to_doc(study_xml('NCT00000001', criteria='Inclusion Criteria: adults over 21'))
+		
+		self.assertEqual(content_hash(doc), content_hash(redownloaded))
+		self.assertNotEqual(content_hash(doc), content_hash(retitled))
+		self.assertEqual(analyzed_text_hash(doc), analyzed_text_hash(retitled))
+		self.assertNotEqual(analyzed_text_hash(doc), analyzed_text_hash(new_criteria))
+	
+	def test_parse_date(self):
+		self.assertEqual(datetime(2014, 6, 5), parse_date('June 5, 2014'))
+		self.assertEqual(datetime(2014, 6, 1), parse_date('June 2014'))
+		self.assertIsNone(parse_date('sometime'))
+		self.assertIsNone(parse_date(None))
+
+
+class TrialSyncTest(unittest.TestCase):
+	""" Syncs against trialsync.py's stand-in for ClinicalTrials.gov serving
+	the XML files of a temporary directory. """
+	
+	ncts = ['NCT00000001', 'NCT00000002', 'NCT00000003']
+	
+	def setUp(self):
+		self.tmp_dir = tempfile.mkdtemp()
+		self.xml_dir = os.path.join(self.tmp_dir, 'xml')
+		os.mkdir(self.xml_dir)
+		for nct in self.ncts:
+			self.write_study(nct)
+		
+		self.server = make_server('localhost', 0, standin_app(self.xml_dir), handler_class=QuietHandler)
+		thread = threading.Thread(target=self.server.serve_forever)
+		thread.daemon = True
+		thread.start()
+		
+		self.studies = MemoryCollection([{'_id': nct} for nct in self.ncts])
+		self.state = MemoryCollection()
+		self.index = TrialSearchIndex(os.path.join(self.tmp_dir, 'trials_fts.db'))
+	
+	def tearDown(self):
+		self.server.shutdown()
+		self.server.server_close()
+		shutil.rmtree(self.tmp_dir)
+	
+	def write_study(self, nct, **kwargs):
+		with open(os.path.join(self.xml_dir, '%s.xml' % nct), 'wb') as handle:
+			handle.write(study_xml(nct, **kwargs))
+	
+	def sync(self, unreachable=None):
+		sync = CountingSync('http://localhost:%d' % self.server.server_port, self.studies, self.state, self.index, unreachable=unreachable or [])
+		return sync, sync.sync()
+	
+	def test_first_sync(self):
+		sync, result = self.sync()
+		self.assertEqual(self.ncts, result['updated'])
+		self.assertEqual(self.ncts, result['text_changed'])
+		self.assertEqual(self.ncts, sync.fetched)
+		self.assertEqual('Methotrexate in Rheumatoid Arthritis', self.studies.docs['NCT00000001']['brief_title'])
+		self.assertEqual(content_hash(study_to_doc(study_xml('NCT00000001'))), self.state.docs['NCT00000001']['hash'])
+		self.assertIn(LAST_SYNC_ID, self.state.docs)
+		self.assertEqual(self.ncts, sorted(self.index.search('methotrexate')))
+	
+	def test_date_cursor(self):
+		""" The next sync only downloads trials changed since the last one,
+		and only writes those whose content changed. """
+		self.sync()
+		today = datetime.utcnow().strftime('%B %d, %Y')
+		self.write_study('NCT00000001', criteria='Inclusion Criteria: adults over 21', changed=today)
+		self.write_study('NCT00000002', title='Methotrexate in RA', changed=today)
+		self.write_study('NCT00000003', downloaded=today)
+		
+		sync, result = self.sync()
+		self.assertEqual(['NCT00000001', 'NCT00000002'], sync.fetched)
+		self.assertEqual(['NCT00000001', 'NCT00000002'], result['updated'])
+		self.assertEqual(['NCT00000001'], result['text_changed'])
+		self.assertEqual(['NCT00000003'], result['unchanged'])
+		self.assertEqual('Methotrexate in RA', self.studies.docs['NCT00000002']['brief_title'])
+		self.assertEqual(['NCT00000002'], self.index.search('"methotrexate in ra"'))
+		
+		# listed as changed, but only the download date differs
+		self.write_study('NCT00000002', title='Methotrexate in RA', changed=today, downloaded='January 1, 2030')
+		sync, result = self.sync()
+		self.assertEqual(['NCT00000001', 'NCT00000002'], sync.fetched)
+		self.assertEqual([], result['updated'])
+		self.assertEqual(self.ncts, sorted(result['unchanged']))
+	
+	def test_partial_failure(self):
+		""" A trial that can not be downloaded does not advance the cursor, so
+		the next sync tries it again. """
+		self.sync()
+		last_sync = self.state.docs[LAST_SYNC_ID]['date']
+		today = datetime.utcnow().strftime('%B %d, %Y')
+		self.write_study('NCT00000001', title='Methotrexate in RA', changed=today)
+		self.write_study('NCT00000002', criteria='Inclusion Criteria: adults over 21', changed=today)
+		
+		sync, result = self.sync(unreachable=['NCT00000002'])
+		self.assertEqual(['NCT00000002'], result['failed'])
+		self.assertEqual(['NCT00000001'], result['updated'])
+		self.assertEqual(last_sync, self.state.docs[LAST_SYNC_ID]['date'])
+		self.assertEqual('Inclusion Criteria: adults', self.studies.docs['NCT00000002']['eligibility']['criteria']['textblock'])
+		
+		sync, result = self.sync()
+		self.assertEqual(['NCT00000001', 'NCT00000002'], sync.fetched)
+		self.assertEqual(['NCT00000002'], result['updated'])
+		self.assertEqual(['NCT00000002'], result['text_changed'])
+		self.assertEqual([], result['failed'])
+		self.assertTrue(self.state.docs[LAST_SYNC_ID]['date'] > last_sync)
+
+
+if '__main__' == __name__:
+	unittest.main()
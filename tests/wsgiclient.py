@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+#
+#  Calling the WSGI app in-process, keeping the session cookie like a browser.
+
+from StringIO import StringIO
+from wsgiref.util import setup_testing_defaults
+
+
+class WSGIClient(object):
+	""" One browser: requests go straight to the app and the session cookie
+	the app sets is sent with all later requests. """
+	
+	def __init__(self, app):
+		self.app = app
+		self.cookie = None
+	
+	def open(self, path, method='GET', form=None, headers=None):
+		""" Returns status code, headers and the (possibly streaming) body
+		iterable of the response. """
+		path, _, query = path.partition('?')
+		body = form or ''
+		environ = {
+			'PATH_INFO': path,
+			'QUERY_STRING': query,
+			'REQUEST_METHOD': method,
+			'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+			'CONTENT_LENGTH': str(len(body)),
+			'wsgi.input': StringIO(body),
+		}
+		setup_testing_defaults(environ)
+		if self.cookie is not None:
+			environ['HTTP_COOKIE'] = self.cookie
+		for name, value in (headers or {}).items():
+			environ['HTTP_' + name.upper().replace('-', '_')] = value
+		
+		response = {}
+		def start_response(status, response_headers, exc_info=None):
+			response['status'] = int(status.split()[0])
+			response['headers'] = dict(response_headers)
+			for name, value in response_headers:
+				if 'set-cookie' == name.lower():
+					self.cookie = value.split(';')[0]
+		
+		body = self.app(environ, start_response)
+		return response['status'], response['headers'], body
+	
+	def request(self, path, method='GET', form=None, headers=None):
+		""" Returns status code, headers and body of the response. """
+		status, headers, body = self.open(path, method, form, headers)
+		try:
+			return status, headers, ''.join(body)
+		finally:
+			if hasattr(body, 'close'):
+				body.close()
@@ -0,0 +1,111 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  The trial fields clients can ask for via "fields", and loading trials with
+#  only the document fields those need read from MongoDB. To compare loading
+#  cached trials in full with loading the fields of a profile:
+#
+#    $ python trialfields.py benchmark [num_trials] [profile]
+
+import sys
+import time
+
+
+# named sets of trial fields that can be requested via "fields"
+FIELD_PROFILES = {
+	'list': ['title', 'phase', 'keyword', 'location', 'intervention'],
+	'detail': ['keyword', 'brief_summary', 'location', 'phase', 'intervention', 'study_design', 'primary_outcome', 'overall_contact']
+}
+
+# top-level elements of the ClinicalTrials.gov study documents
+DOC_FIELDS = set([
+	'id_info', 'brief_title', 'acronym', 'official_title', 'sponsors', 'source',
+	'oversight_info', 'brief_summary', 'detailed_description', 'overall_status',
+	'why_stopped', 'start_date', 'completion_date', 'primary_completion_date',
+	'phase', 'study_type', 'study_design', 'primary_outcome', 'secondary_outcome',
+	'other_outcome', 'number_of_arms', 'number_of_groups', 'enrollment',
+	'condition', 'arm_group', 'intervention', 'biospec_retention',
+	'biospec_descr', 'eligibility', 'overall_official', 'overall_contact',
+	'overall_contact_backup', 'location', 'location_countries',
+	'removed_countries', 'link', 'reference', 'results_reference',
+	'verification_date', 'lastchanged_date', 'firstreceived_date',
+	'firstreceived_results_date', 'responsible_party', 'keyword',
+	'is_fda_regulated', 'is_section_801', 'has_expanded_access',
+	'condition_browse', 'intervention_browse', 'clinical_results',
+])
+
+# fields that are not document fields, with the document fields they are
+# made from; "reason", "distance" and "location_count" are added per run
+DERIVED_FIELDS = {
+	'nct': [],
+	'title': ['acronym', 'brief_title', 'official_title'],
+	'reason': [],
+	'distance': [],
+	'location_count': [],
+}
+
+
+def is_known_field(field):
+	return field in DOC_FIELDS or field in DERIVED_FIELDS
+
+
+def projection(fields):
+	""" The MongoDB projection reading the document fields needed for the
+	given trial fields. """
+	proj = {}
+	for field in fields:
+		for key in DERIVED_FIELDS.get(field, [field]):
+			proj[key] = 1
+	return proj
+
+
+def retrieve_trials(trial_class, studies, ncts, fields=None):
+	""" Loads the trials with the given NCTs, in that order, like
+	`trial_class.retrieve()`. With `fields` only the document fields they need
+	are read from the studies collection, trials not found are skipped. """
+	if fields is None:
+		return trial_class.retrieve(ncts)
+	
+	docs = dict((doc['_id'], doc) for doc in studies.find({'_id': {'$in': ncts}}, projection(fields)))
+	trials = []
+	for nct in ncts:
+		if nct in docs:
+			trial = trial_class(nct)
+			trial.doc = docs[nct]
+			trials.append(trial)
+	return trials
+
+
+def benchmark(num_trials=1000, profile='list', repeat=3):
+	""" Loads the first `num_trials` cached trials in full and with the fields
+	of the profile, printing the best time and the BSON size of the documents
+	read. """
+	import dbconfig			# configures MNGObject.database_uri
+	from bson import BSON
+	from ClinicalTrials.trial import Trial
+	
+	studies = dbconfig.database()['studies']
+	ncts = [doc['_id'] for doc in studies.find({}, {'_id': 1}).limit(num_trials)]
+	fields = FIELD_PROFILES[profile]
+	print "%d cached trials, \"%s\" profile" % (len(ncts), profile)
+	
+	for name, load_fields in [('full documents', None), ('profile fields', fields)]:
+		best = None
+		for i in xrange(repeat):
+			start = time.time()
+			trials = retrieve_trials(Trial, studies, ncts, load_fields)
+			[trial.json(fields) for trial in trials]
+			duration = time.time() - start
+			best = duration if best is None else min(best, duration)
+		size = sum([len(BSON.encode(trial.doc)) for trial in trials])
+		print "%-15s %7.1f ms, %8.1f KB read" % (name + ':', 1000 * best, size / 1024.0)
+
+
+if '__main__' == __name__:
+	if len(sys.argv) < 2 or 'benchmark' != sys.argv[1]:
+		print 'Usage: trialfields.py benchmark [num_trials] [profile]'
+		sys.exit(1)
+	
+	num_trials = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+	profile = sys.argv[3] if len(sys.argv) > 3 else 'list'
+	benchmark(num_trials, profile)
@@ -0,0 +1,210 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+#  Incrementally refreshing the trials cached in MongoDB.
+#
+#  Only trials that changed on ClinicalTrials.gov since the last sync are
+#  fetched, and only those whose content actually differs are written. Trials
+#  whose analyzed text changed are reported, with NLP output cached by text
+#  (see nlpcache.py) the pipelines of elig.py and test.py only run on those.
+#
+#    $ python trialsync.py sync
+#    $ python trialsync.py serve path/to/recorded/xml [port]
+#
+#  The latter serves recorded study XML files (named NCTxxxxxxxx.xml) the way
+#  ClinicalTrials.gov does, run a sync against it with CTGOV_URL set to
+#  http://localhost:port.
+
+import os
+import sys
+import logging
+from datetime import datetime, timedelta
+from xml.etree import cElementTree as ET
+
+import requests
+
+from ctgxml import study_to_doc, content_hash, analyzed_text_hash, last_changed, parse_date
+from searchindex import TrialSearchIndex
+from geocoder import geocode_doc
+
+
+CTGOV_URL = os.environ.get('CTGOV_URL', 'https://clinicaltrials.gov')
+LAST_SYNC_ID = '__last_sync__'
+
+
+class TrialSync(object):
+	""" Keeps the last-changed date and content hashes of every synced trial
+	in the "trial_sync" collection, next to the "studies" collection holding
+	the trials. Updated trials are also written to the local search index.
+	"""
+	
+	page_size = 1000
+	
+	def __init__(self, base_url=None, studies=None, state=None, index=None):
+		self.base_url = (base_url or CTGOV_URL).rstrip('/')
+		self.studies = studies
+		self.state = state
+		self.index = index if index is not None else TrialSearchIndex()
+		self.session = requests.Session()
+	
+	def connect(self):
+		""" Uses the collections of our MongoDB unless they were given. """
+		if self.studies is None or self.state is None:
+			import dbconfig
+			db = dbconfig.database()
+			self.studies = db['studies']
+			self.state = db['trial_sync']
+	
+	def changed_since(self, since):
+		""" Returns a dictionary of NCT -> last changed date of all trials
+		updated on ClinicalTrials.gov since the given date. """
+		changed = {}
+		start = 0
+		while True:
+			params = {'lup_s': since.strftime('%m/%d/%Y'), 'displayxml': 'true', 'count': self.page_size, 'start': start}
+			res = self.session.get('%s/ct2/results' % self.base_url, params=params, timeout=60)
+			res.raise_for_status()
+			
+			root = ET.fromstring(res.content)
+			found = root.findall('clinical_study')
+			for study in found:
+				changed[study.findtext('nct_id')] = parse_date(study.findtext('last_changed'))
+			
+			start += len(found)
+			if 0 == len(found) or start >= int(root.get('count') or 0):
+				break
+		
+		return changed
+	
+	def fetch(self, nct):
+		res = self.session.get('%s/ct2/show/%s' % (self.base_url, nct), params={'displayxml': 'true'}, timeout=60)
+		res.raise_for_status()
+		return study_to_doc(res.content)
+	
+	def sync(self, ncts=None):
+		""" Refreshes the given trials, all cached trials if None. Returns a
+		dictionary with lists of the NCTs that were "updated", whose analyzed
+		text changed ("text_changed"), that were "unchanged" and that "failed"
+		to download. """
+		self.connect()
+		started = datetime.utcnow()
+		if ncts is None:
+			ncts = [doc['_id'] for doc in self.studies.find({}, {'_id': 1})]
+		
+		known = dict((doc['_id'], doc) for doc in self.state.find({'_id': {'$in': ncts}}))
+		result = {'updated': [], 'text_changed': [], 'unchanged': [], 'failed': []}
+		
+		# only look at trials changed since the last sync and those never synced
+		last_sync = self.state.find_one({'_id': LAST_SYNC_ID})
+		if last_sync is not None:
+			changed = self.changed_since(last_sync['date'] - timedelta(days=1))		# upstream dates are not UTC
+			skipped = [nct for nct in ncts if nct in known and nct not in changed]
+			result['unchanged'].extend(skipped)
+			ncts = [nct for nct in ncts if nct not in known or nct in changed]
+		logging.info("Syncing %d trials" % len(ncts))
+		
+		updated = []
+		for nct in ncts:
+			try:
+				doc = self.fetch(nct)
+			except (requests.RequestException, SyntaxError) as e:
+				logging.warning("Failed to fetch %s: %s" % (nct, e))
+				result['failed'].append(nct)
+				continue
+			
+			prev = known.get(nct) or {}
+			digest = content_hash(doc)
+			if prev.get('hash') == digest:
+				self.state.update({'_id': nct}, {'$set': {'synced': started}})
+				result['unchanged'].append(nct)
+				continue
+			
+			state = sync_state(doc, started)
+			geocode_doc(doc)
+			updated.append(dict(doc))
+			del doc['_id']
+			self.studies.update({'_id': nct}, {'$set': doc}, upsert=True)
+			
+			if prev.get('text_hash') != state['text_hash']:
+				result['text_changed'].append(nct)
+			self.state.save(state)
+			result['updated'].append(nct)
+		
+		# failed trials will be looked at again next time
+		self.index.add(updated)
+		if 0 == len(result['failed']):
+			self.state.save({'_id': LAST_SYNC_ID, 'date': started})
+			self.index.mark_fresh()
+		
+		logging.info("Synced trials: %s" % ', '.join(['%d %s' % (len(v), k) for k, v in sorted(result.iteritems())]))
+		return result
+
+
+def sync_state(doc, synced):
+	""" The "trial_sync" document for a study document. """
+	return {
+		'_id': doc['_id'],
+		'last_changed': last_changed(doc),
+		'hash': content_hash(doc),
+		'text_hash': analyzed_text_hash(doc),
+		'synced': synced
+	}
+
+
+def standin_app(xml_dir):
+	""" A bottle app serving the recorded study XML files in `xml_dir` like
+	ClinicalTrials.gov's search and study endpoints. """
+	import bottle
+	app = bottle.Bottle()
+	
+	def studies():
+		for filename in sorted(os.listdir(xml_dir)):
+			if filename.endswith('.xml'):
+				with open(os.path.join(xml_dir, filename), 'rb') as handle:
+					yield filename[:-4], ET.fromstring(handle.read())
+	
+	@app.get('/ct2/results')
+	def results():
+		since = datetime.strptime(bottle.request.query.get('lup_s'), '%m/%d/%Y')
+		start = int(bottle.request.query.get('start') or 0)
+		count = int(bottle.request.query.get('count') or 20)
+		
+		changed = []
+		for nct, study in studies():
+			date = parse_date(study.findtext('lastchanged_date'))
+			if date is not None and date >= since:
+				changed.append((nct, study.findtext('lastchanged_date')))
+		
+		root = ET.Element('search_results', count=str(len(changed)))
+		for nct, date in changed[start:start + count]:
+			elem = ET.SubElement(root, 'clinical_study')
+			ET.SubElement(elem, 'nct_id').text = nct
+			ET.SubElement(elem, 'last_changed').text = date
+		
+		bottle.response.content_type = 'text/xml'
+		return ET.tostring(root)
+	
+	@app.get('/ct2/show/<nct>')
+	def show(nct):
+		path = os.path.join(xml_dir, '%s.xml' % os.path.basename(nct))
+		if not os.path.exists(path):
+			bottle.abort(404)
+		bottle.response.content_type = 'text/xml'
+		with open(path, 'rb') as handle:
+			return handle.read()
+	
+	return app
+
+
+if '__main__' == __name__:
+	logging.basicConfig(level=logging.INFO)
+	
+	if len(sys.argv) > 2 and 'serve' == sys.argv[1]:
+		import bottle
+		bottle.run(app=standin_app(sys.argv[2]), host='localhost', port=int(sys.argv[3]) if len(sys.argv) > 3 else 8009)
+	elif len(sys.argv) > 1 and 'sync' == sys.argv[1]:
+		import dbconfig			# configures MNGObject.database_uri
+		TrialSync().sync()
+	else:
+		print 'Usage: trialsync.py sync | serve xml_dir [port]'
+		sys.exit(1)
@@ -8,11 +8,12 @@ import json
 import re
 import markdown
 import codecs
+import time
+import hashlib
 from datetime import datetime
 
 # bottle
 import bottle
-from beaker.middleware import SessionMiddleware
 from jinja2 import Template, Environment, PackageLoader
 
 # settings
@@ -20,30 +21,96 @@ USE_SMART = int(os.environ.get('USE_SMART', False))
 USE_SMART_05 = int(os.environ.get('USE_SMART_05', False))
 USE_NLP = int(os.environ.get('USE_NLP', False))
 
+# debug logging, reloading and the /admin routes, never enable in production
+DEBUG = int(os.environ.get('DEBUG') or 0)
+
+# pushing run progress holds a connection per client, only enable with async workers
+USE_PROGRESS_STREAM = int(os.environ.get('USE_PROGRESS_STREAM', False))
+PROGRESS_STREAM_INTERVAL = 0.25		# seconds between status checks
+PROGRESS_STREAM_TIMEOUT = 60		# seconds until the client has to reconnect
+
+# session backend: "file", "memory" (single worker only) or "mongodb"
+SESSION_TYPE = os.environ.get('SESSION_TYPE', 'file')
+SESSION_LIFETIME = 3600
+MAX_SESSION_RUNS = 10				# run parameters we keep per session
+
+# a patient's demographics and problems are fetched from the SMART container
+# at most once per this many seconds
+PATIENT_DATA_TTL = 120
+
+# identical searches within this time reuse earlier results
+RUN_CACHE_SIZE = int(os.environ.get('RUN_CACHE_SIZE', 200))
+RUN_CACHE_TTL = int(os.environ.get('RUN_CACHE_TTL', 3600))
+
+# number of runs executing at the same time and number of runs waiting for
+# them, per server process (see RunQueue)
+RUN_WORKERS = int(os.environ.get('RUN_WORKERS', 2))
+RUN_QUEUE_DEPTH = int(os.environ.get('RUN_QUEUE_DEPTH', 20))
+
+# answer searches from the local index of cached trials (see searchindex.py)
+# while it has been synced within LOCAL_SEARCH_MAX_AGE seconds. Not with
+# USE_NLP: only a Runner runs NLP on the eligibility criteria of the trials
+USE_LOCAL_SEARCH = int(os.environ.get('USE_LOCAL_SEARCH', False))
+LOCAL_SEARCH_MAX_AGE = 86400
+
+# trial documents change at most daily, browsers may keep trial responses this long
+TRIAL_MAX_AGE = 3600
+
+# trials of a run are loaded from MongoDB this many at a time
+RUN_TRIALS_CHUNK = 100
+
 # SMART
 if USE_SMART and not USE_SMART_05:
 	from smart_client_python.client import SMARTClient
 if USE_SMART:
 	from rdflib.graph import Graph
 	from endpoints import ENDPOINTS
+	from patientdata import demographics_from_graph, problems_from_graph
 
 # App
 from ClinicalTrials.mngobject import MNGObject
+import dbconfig			# configures MNGObject.database_uri
 from ClinicalTrials.trial import Trial
 from ClinicalTrials.runner import Runner
-from ClinicalTrials.umls import SNOMEDLookup
+from runindex import RunIndex, DemographicsIndex, ExclusionIndex, FacetIndex, SiteIndex, PinIndex
+from snomedtree import SNOMEDTree
+from lookups import SNOMEDCodes
+from searchindex import TrialSearchIndex
+from geocoder import Gazetteer, geocode_doc
+from sessionstore import SessionMiddleware, ExpiringFileNamespaceManager, LRUNamespaceManager, MongoNamespaceManager
+from runcache import RunCache, copy_run
+from runqueue import RunQueue, RunQueueFull
+from trialfields import FIELD_PROFILES, is_known_field, retrieve_trials
+from caching import LRUCache
 
 
 # bottle, beaker and Jinja setup
+# sessions are only written when they were changed and saved via `save()`,
+# they expire SESSION_LIFETIME seconds after they were last saved
 session_opts = {
 	'session.type': 'file',
-	'session.timeout': 3600,
-	'session.cookie_expires': 3600,
+	'session.cookie_expires': SESSION_LIFETIME,
 	'session.data_dir': './session_data',
-	'session.auto': True
+	'session.save_accessed_time': False,
+	'session.lifetime': SESSION_LIFETIME
 }
+if 'file' == SESSION_TYPE:
+	session_opts['session.namespace_class'] = ExpiringFileNamespaceManager
+elif 'memory' == SESSION_TYPE:
+	session_opts['session.namespace_class'] = LRUNamespaceManager
+elif 'mongodb' == SESSION_TYPE:
+	session_opts['session.namespace_class'] = MongoNamespaceManager
 app = application = SessionMiddleware(bottle.app(), session_opts)		# "application" is needed for some services like AppFog
 _jinja_templates = Environment(loader=PackageLoader('wsgi', 'templates'), trim_blocks=True)
+_run_cache = RunCache(RUN_CACHE_SIZE, RUN_CACHE_TTL)
+_run_queue = RunQueue(RUN_WORKERS, RUN_QUEUE_DEPTH)
+_run_facets = LRUCache(100, 3600)
+_criteria_html = LRUCache(500, TRIAL_MAX_AGE)
+_studies = None
+_snomed_tree = SNOMEDTree()
+_search_index = TrialSearchIndex(max_age=LOCAL_SEARCH_MAX_AGE)
+_smart_clients = LRUCache(200, SESSION_LIFETIME)
+_patient_data = LRUCache(500, PATIENT_DATA_TTL)
 
 
 
@@ -51,6 +118,26 @@ _jinja_templates = Environment(loader=PackageLoader('wsgi', 'templates'), trim_b
 def _get_session():
 	return bottle.request.environ.get('beaker.session')		
 
+def _get_runner(run_id):
+	""" Returns the runner for the given run id, which takes over the results
+	of the run it was waiting for if that one has finished. """
+	runner = Runner.get(run_id)
+	if runner is not None:
+		_run_cache.settle(runner)
+	return runner
+
+def _run_status(runner):
+	""" The status text for the given run, reporting the queue position if
+	the run (or the run it waits for) has not yet started. """
+	runner = _run_cache.leader_of(runner)
+	position = _run_queue.position(runner.run_id)
+	if position is not None:
+		if 1 == position:
+			return "Waiting for a free slot, we're next"
+		return "Waiting for a free slot, %d search%s ahead of us" % (position - 1, 'es' if position > 2 else '')
+	
+	return runner.status
+
 # only used for SMART v0.6+
 def _get_smart():
 	if not USE_SMART:
@@ -87,6 +174,13 @@ def _get_smart():
 		
 		sess['consumer_key'] = cons_key = server.get('consumer_key')
 		sess['consumer_secret'] = cons_sec = server.get('consumer_secret')
+		sess.save()
+	
+	# reuse the client (and its connection) of the session's record and token
+	key = _smart_key(sess)
+	smart = _smart_clients.get(key)
+	if smart is not None:
+		return smart
 	
 	# init client
 	config = {
@@ -99,34 +193,103 @@ def _get_smart():
 		smart.record_id = sess.get('record_id')
 	except Exception as e:
 		logging.warning("Failed to instantiate SMART client: %s" % e)
-		smart = None
+		return None
 	
-	# if we have tokens, update the client
+	# if we have tokens, update the client; only authorized clients are kept
 	token = sess.get('token')
 	if token is not None:
 		smart.update_token(token)
+		_smart_clients.set(key, smart)
 	
 	return smart
 
+def _smart_key(sess):
+	""" Identifies the container, record and token of the session, the key
+	of our SMART clients and of the patient data fetched with them. """
+	token = sess.get('token')
+	if isinstance(token, dict):
+		token = token.get('oauth_token')
+	return (sess.get('api_base'), sess.get('record_id'), token)
+
+def _forget_smart(sess):
+	""" Drops the SMART client and patient data kept for the session's
+	token, e.g. because the container no longer accepts it. """
+	key = _smart_key(sess)
+	_smart_clients.remove(key)
+	_patient_data.remove(key + ('demographics',))
+	_patient_data.remove(key + ('problems',))
+
 def _test_record_token():
 	""" Tries to fetch demographics with the given token and returns a bool
-	whether thas was successful. """
+	whether thas was successful. The demographics are kept, the page asks for
+	them right after. """
+	return _get_patient_data('demographics') is not None
+
+def _get_patient_data(kind):
+	""" Returns the current patient's "demographics" or "problems", as
+	served by the endpoints of the same name, or None if they could not be
+	retrieved. Results are kept for PATIENT_DATA_TTL seconds per record and
+	token, so the token test, the page and the problem filter share one
+	request to the container. """
+	sess = _get_session()
+	if sess is None:
+		return None
 	
-	smart = _get_smart()
-	if smart is None:
-		return False
+	# SMART 0.5 fallback (the JS client writes patient data to session storage)
+	if USE_SMART_05:
+		rdf = sess.get(kind)
+		if rdf is None:
+			logging.error("No %s in the session" % kind)
+			return None
+		key = ('v05', kind, hashlib.md5(rdf.encode('utf-8') if isinstance(rdf, unicode) else rdf).hexdigest())
+	elif USE_SMART:
+		key = _smart_key(sess) + (kind,)
+	else:
+		return None
 	
-	# try to get demographics
-	try:
-		ret = smart.get_demographics()
+	data = _patient_data.get(key)
+	if data is None:
+		data = _fetch_patient_data(kind, rdf if USE_SMART_05 else None)
+		if data is not None:
+			_patient_data.set(key, data)
+	
+	return data
+
+def _fetch_patient_data(kind, rdf=None):
+	""" Parses the patient's demographics or problems from SMART 0.5 RDF
+	or fetches them from the SMART container. """
+	graph = None
+	
+	# use session data; SMART 0.5's "v:" vcard prefix comes out as "vcard:"
+	# like in 0.6 since CURIEs are made by namespace (see patientdata.py)
+	if rdf is not None:
+		try:
+			graph = Graph().parse(data=rdf)
+		except Exception as e:
+			logging.error("Failed to parse %s: %s\n%s" % (kind, e, rdf))
+			return None
+	
+	# SMART 0.6+
+	else:
+		smart = _get_smart()
+		if smart is None:
+			return None
 		
-		# did work!
-		if 200 == int(ret.response.status):
-			return True
-	except Exception as e:
-		pass
+		try:
+			ret = smart.get_demographics() if 'demographics' == kind else smart.get_problems()
+		except Exception as e:
+			logging.error("Failed to get %s: %s" % (kind, e))
+			return None
+		
+		if 200 != int(ret.response.status):
+			logging.error("Failed to get %s: %d" % (kind, int(ret.response.status)))
+			return None
+		graph = ret.graph
 	
-	return False
+	# extract the interesting pieces straight from the graph
+	if 'demographics' == kind:
+		return demographics_from_graph(graph)
+	return problems_from_graph(graph)
 
 def _reset_session(with_runs=False):
 	""" Removes patient-related session settings. """
@@ -152,6 +315,8 @@ def _reset_session(with_runs=False):
 			del sess['demographics']
 		if 'problems' in sess:
 			del sess['problems']
+	
+	sess.save()
 
 # ------------------------------------------------------------------------------ Index
 @bottle.get('/')
@@ -163,7 +328,9 @@ def index():
 	# look at URL params first, if they are there store them in the session
 	api_base = bottle.request.query.get('api_base') if USE_SMART else 'none'
 	if api_base is not None:
-		sess['api_base'] = api_base
+		if sess.get('api_base') != api_base:
+			sess['api_base'] = api_base
+			sess.save()
 	else:
 		api_base = sess.get('api_base')
 	
@@ -185,6 +352,7 @@ def index():
 		# set (or don't) the record id
 		if '0' != record_id:
 			sess['record_id'] = record_id
+			sess.save()
 		else:
 			record_id = None
 	else:
@@ -210,9 +378,11 @@ def index():
 		
 		# still here, test the token
 		if not _test_record_token():
+			_forget_smart(sess)
 			smart.token = None
 			try:
 				sess['token'] = smart.fetch_request_token()
+				sess.save()
 			except Exception as e:
 				_reset_session()
 				logging.error("Failed getting request token. %s" % e)
@@ -228,6 +398,7 @@ def index():
 	defs = {
 		'use_smart': USE_SMART,
 		'smart_v05': USE_SMART_05,
+		'progress_stream': USE_PROGRESS_STREAM,
 		'google_api_key': os.environ.get('GOOGLE_API_KEY')
 	}
 	
@@ -273,7 +444,9 @@ def authorize():
 	
 	try:
 		sess = _get_session()
+		_forget_smart(sess)
 		sess['token'] = smart.exchange_token(verifier)
+		sess.save()
 	except Exception as e:
 		logging.error("Token exchange failed: %s" % e)
 		return str(e)
@@ -291,6 +464,7 @@ def endpoints():
 	sess = _get_session()
 	if 'api_base' in sess:
 		del sess['api_base']
+		sess.save()
 	
 	# get the callback
 	# NOTE: this is done very cheaply, we need to make sure to end the url with either "?" or "&"
@@ -328,106 +502,111 @@ def session():
 
 @bottle.get('/demographics')
 def demographics():
-	""" Returns the current patient's demographics as JSON extracted from JSON-LD.
+	""" Returns the current patient's demographics as JSON-LD style dictionary.
 	"""
-	
-	demo_ld = None
-	d = {}	
-	
-	# SMART 0.5 fallback (the JS client writes demographics to session storage)
-	if USE_SMART_05:
-		sess = _get_session()
-		demo_rdf = sess.get('demographics') if sess is not None else None
-		
-		# use session data (parse RDF, convert to json-ld-serialization, load json... :P)
-		try:
-			# hack v0.5 format to be similar to v0.6 format, part 1
-			demo_rdf = demo_rdf.replace('xmlns:v=', 'xmlns:vcard=')
-			demo_rdf = demo_rdf.replace('<v:', '<vcard:')
-			demo_rdf = demo_rdf.replace('</v:', '</vcard:')
-			graph = Graph().parse(data=demo_rdf)
-		except Exception as e:
-			logging.error("Failed to parse demographics: %s" % e)
-			return d
-		
-		# hack v0.5 format to be similar to v0.6 format, part 2
-		demo_ld = {u"@graph": [json.loads(graph.serialize(format='json-ld'))]}
-	
-	# SMART 0.6+
-	elif USE_SMART:
-		smart = _get_smart()
-		if smart is None:
-			return d
-		
-		ret = smart.get_demographics()
-		if 200 == int(ret.response.status):
-			demo_ld = json.loads(ret.graph.serialize(format='json-ld')) if ret.graph is not None else None
-		else:
-			logging.error("Failed to get demographics: %d" % int(ret.response.status))
-	
-	# extract interesting pieces
-	if demo_ld is not None:
-		for gr in demo_ld.get("@graph", []):
-			if "sp:Demographics" == gr.get("@type"):
-				d = gr
-				break
-	
-	return d
+	return _get_patient_data('demographics') or {}
 
 
 @bottle.get('/problems')
 def problems():
-	""" Returns the current patient's problems as JSON extracted from JSON-LD.
+	""" Returns the current patient's problems as JSON-LD style dictionaries.
 	"""
-	
-	prob_ld = None
+	return _get_patient_data('problems') or {'problems': []}
 
-	# SMART 0.5 fallback (the JS client writes problem data to session storage)
-	if USE_SMART_05:
-		sess = _get_session()
-		prob_rdf = sess.get('problems') if sess is not None else None
-		
-		# use session data (parse RDF, convert to json-ld-serialization, load json... :P)
-		try:
-			graph = Graph().parse(data=prob_rdf)
-		except Exception as e:
-			logging.error("Failed to parse problems: %s\n%s" % (e, prob_rdf))
-			return {'problems': []}
-		
-		prob_ld = json.loads(graph.serialize(format='json-ld'))
-	
-	# SMART 0.6+
-	elif USE_SMART:
-		smart = _get_smart()
-		if smart is not None:
-			ret = smart.get_problems()
-			if 200 == int(ret.response.status):
-				prob_ld = json.loads(ret.graph.serialize(format='json-ld')) if ret.graph is not None else None
-			else:
-				logging.error("Failed to get problems: %d" % int(ret.response.status))
-	
-	# pick out the individual problems
-	problems = []
-	if prob_ld is not None:
-		for gr in prob_ld.get("@graph", []):
-			if "sp:Problem" == gr.get("@type"):
-				problems.append(gr)
+
+# ------------------------------------------------------------------------------ Trials
+TRIAL_FIELDS_ALWAYS = ['nct', 'reason']
+
+def _requested_fields(default=None):
+	""" Returns the list of trial fields requested via the "fields" query
+	parameter, which is either the name of a profile or a comma-separated list
+	of fields (see trialfields.py). """
+	fields = bottle.request.query.get('fields')
+	if not fields:
+		return FIELD_PROFILES.get(default)
+	if fields in FIELD_PROFILES:
+		return FIELD_PROFILES[fields]
+	
+	fields = [f.strip() for f in fields.split(',') if f.strip()]
+	for field in fields:
+		if not is_known_field(field):
+			bottle.abort(400, 'Unknown field "%s"' % field)
+	return fields
+
+
+def _studies_collection():
+	""" The MongoDB collection holding the trial documents. """
+	global _studies
+	if _studies is None:
+		_studies = dbconfig.database()['studies']
+	return _studies
+
+def _trials_etag(trials, fields=None):
+	""" An ETag for the given trials, hashed from their stored documents. """
+	md5 = hashlib.md5()
+	for trial in trials:
+		md5.update(json.dumps(trial.doc, sort_keys=True, default=str))
+	if fields is not None:
+		md5.update(','.join(fields))
+	return '"%s"' % md5.hexdigest()
+
+def _trials_version_etag(ncts, fields=None):
+	""" An ETag for the given trials from the "lastchanged_date" stored with
+	them, which changes whenever trialsync.py or ingest.py write a new version,
+	reading only that field. None if a trial has no such date, use `_trials_etag()` on the
+	loaded trials then. """
+	if 0 == len(ncts):
+		return None
+	try:
+		docs = _studies_collection().find({'_id': {'$in': ncts}}, {'lastchanged_date': 1})
+		versions = dict((doc['_id'], doc.get('lastchanged_date')) for doc in docs)
+	except Exception as e:
+		logging.warning("Failed to read trial versions: %s" % e)
+		return None
 	
-	return {'problems': problems}
+	md5 = hashlib.md5()
+	for nct in ncts:
+		if not versions.get(nct):
+			return None
+		md5.update('%s|%s\n' % (nct, versions[nct]))
+	if fields is not None:
+		md5.update(','.join(fields))
+	return '"%s"' % md5.hexdigest()
+
+def _not_modified(etag):
+	""" Sets the caching headers for a response with the given ETag and
+	returns True if the client already has this version, in which case the
+	response status is set to 304. """
+	bottle.response.set_header('ETag', etag)
+	bottle.response.set_header('Cache-Control', 'max-age=%d' % TRIAL_MAX_AGE)
+	
+	if_none_match = bottle.request.headers.get('If-None-Match') or ''
+	if etag in [tag.strip() for tag in if_none_match.split(',')]:
+		bottle.response.status = 304
+		return True
+	return False
 
 
-# ------------------------------------------------------------------------------ Trials
 @bottle.get('/trials/<nct_list>')
 def get_trials(nct_list):
-	""" Returns one or more trials, multiple NCTs can be separated by colon. """
+	""" Returns one or more trials, multiple NCTs can be separated by colon.
+	Supply "fields" with a profile ("list" or "detail", the default) or a
+	comma-separated list of trial fields to only get those. """
 	trials = []
+	fields = _requested_fields('detail')
+	ncts = nct_list.split(':') if nct_list else []
 	
-	if nct_list:
-		ncts = nct_list.split(':')
-		found = Trial.retrieve(ncts)
-		
-		for trial in found:
-			trials.append(trial.json(['keyword', 'brief_summary', 'location', 'phase', 'intervention', 'study_design', 'primary_outcome', 'overall_contact']))
+	# a client revalidating a response only needs the trials' versions
+	etag = _trials_version_etag(ncts, fields)
+	if etag is not None and _not_modified(etag):
+		return ''
+	
+	found = retrieve_trials(Trial, _studies_collection(), ncts, fields) if len(ncts) > 0 else []
+	if etag is None and _not_modified(_trials_etag(found, fields)):
+		return ''
+	
+	for trial in found:
+		trials.append(trial.json(fields))
 	
 	return {'trials': trials}
 
@@ -435,11 +614,22 @@ def get_trials(nct_list):
 @bottle.get('/trials/<nct>/criteria_html')
 def get_trial_criteria(nct):
 	""" Returns JSON containing HTML formatted eligibility criteria for one
-	trial. """
-	trial = Trial(nct)
-	trial.load()
-	
-	return {'criteria': trial.eligibility.formatted_html}
+	trial. Rendered criteria are kept for each version of a trial. """
+	etag = _trials_version_etag([nct])
+	if etag is not None and _not_modified(etag):
+		return ''
+	
+	html = _criteria_html.get(etag) if etag is not None else None
+	if html is None:
+		trial = Trial(nct)
+		trial.load()
+		html = trial.eligibility.formatted_html
+		if etag is not None:
+			_criteria_html.set(etag, html)
+		elif _not_modified(_trials_etag([trial])):
+			return ''
+	
+	return {'criteria': html}
 
 
 # ------------------------------------------------------------------------------ Trial Runs
@@ -462,7 +652,6 @@ def find_trials():
 	runner = Runner.get(run_id)
 	if runner is None:
 		runner = Runner(run_id, "run-server")
-		runner.in_background = True
 	
 	# configure
 	cond = bottle.request.query.get('cond')
@@ -500,6 +689,10 @@ def find_trials():
 		'age': int(age) if age else None,
 		'latlng': latlng
 	}
+	
+	# only keep the latest runs (run ids are ISO dates and sort by time)
+	for old_id in sorted(runs.keys())[:-MAX_SESSION_RUNS]:
+		del runs[old_id]
 	sess['runs'] = runs
 	
 	if 'true' == bottle.request.query.get('remember_input'):
@@ -507,9 +700,29 @@ def find_trials():
 			sess['last_manual_input'] = cond or term
 		elif 'last_manual_input' in sess:
 			del sess['last_manual_input']
-	
-	# launch and return id
-	runner.run(['id', 'acronym', 'keyword', 'brief_title', 'official_title', 'brief_summary', 'overall_contact', 'eligibility', 'location', 'attributes', 'intervention', 'intervention_browse', 'phase', 'study_design', 'primary_outcome'])
+	sess.save()
+	
+	# launch (or reuse the results of an identical recent run) and return id
+	fields = ['id', 'acronym', 'keyword', 'brief_title', 'official_title', 'brief_summary', 'overall_contact', 'eligibility', 'location', 'attributes', 'intervention', 'intervention_browse', 'phase', 'study_design', 'primary_outcome']
+	source = _run_cache.attach(runner, fields)
+	ncts = None
+	if source is None and USE_LOCAL_SEARCH and not USE_NLP:
+		ncts = _search_index.search(runner.term, runner.condition)
+	
+	if ncts is not None:
+		runner.write_ncts(ncts)
+		runner.status = 'done'
+	elif source is None:
+		try:
+			_run_queue.submit(runner, fields)
+		except RunQueueFull as e:
+			logging.warning("Rejecting run %s: %s" % (run_id, e))
+			runner.status = "Error: too many searches running, please try again in a minute"
+			bottle.response.status = 503
+			bottle.response.set_header('Retry-After', '60')
+			return runner.status
+	elif source.done:
+		copy_run(source, runner)
 	
 	return run_id
 
@@ -523,35 +736,131 @@ def trial_progress(run_id):
 	if runner is None:
 		bottle.abort(404)
 	
-	return runner.status
+	return _run_status(runner)
+
+
+@bottle.get('/trial_runs/<run_id>/progress/stream')
+def trial_progress_stream(run_id):
+	""" Pushes status changes of the given run as server-sent events until
+	the run is done or has failed. Streams close after a while, EventSource
+	clients reconnect automatically.
+	Only available with USE_PROGRESS_STREAM, clients fall back to polling
+	/trial_runs/<run_id>/progress otherwise. """
+	
+	if not USE_PROGRESS_STREAM:
+		bottle.abort(404)
+	
+	runner = Runner.get(run_id)
+	if runner is None:
+		bottle.abort(404)
+	
+	bottle.response.content_type = 'text/event-stream'
+	bottle.response.set_header('Cache-Control', 'no-cache')
+	
+	def stream():
+		last_status = None
+		started = time.time()
+		while time.time() - started < PROGRESS_STREAM_TIMEOUT:
+			status = _run_status(runner)
+			if status != last_status:
+				last_status = status
+				yield ''.join(['data: %s\n' % line for line in (status or '').split('\n')]) + '\n'
+				
+				if 'done' == status or re.match(r'^error', status or '', re.I):
+					break
+			
+			time.sleep(PROGRESS_STREAM_INTERVAL)
+	
+	return stream()
 
 
 @bottle.get('/trial_runs/<run_id>/overview')
 def run_overview(run_id):
 	""" Overview results for a run. """
 	
-	runner = Runner.get(run_id)
+	runner = _get_runner(run_id)
 	if runner is None:
 		bottle.abort(404)
 	
 	try:
-		overview = runner.overview()
+		facets = _run_facet_index(runner)
 	except Exception as e:
 		bottle.abort(400, e)
 	
-	return json.dumps(overview)
+	return json.dumps(facets.overview)
+
+
+def _run_reasons(runner):
+	""" Dictionary of NCT -> the reason the run's filters gave the trial,
+	None if it passed. """
+	return dict((tpl[0], tpl[1] if len(tpl) > 1 else None) for tpl in runner.get_ncts(restrict='none'))
+
+def _run_facet_index(runner, reasons=None):
+	""" Returns the FacetIndex over the trials of the run, built from the
+	run's overview and trials and kept with their site distances and map
+	pins. Only NCTs, bitsets and coordinates are kept, not the trials.
+	The index is rebuilt once the run's filter reasons have changed, which
+	the run stores so every worker notices. """
+	if reasons is None:
+		reasons = _run_reasons(runner)
+	version = hashlib.md5(json.dumps(sorted(reasons.items()))).hexdigest()
+	
+	facets = _run_facets.get(runner.run_id)
+	if facets is None or facets.version != version:
+		overview = runner.overview()
+		all_types = (overview.get('intervention_types') or {}).keys()
+		trials = runner.trials_json(all_types, [])
+		
+		# trials fetched before the gazetteer was imported may lack coordinates
+		for trial in trials:
+			geocode_doc(trial)
+		facets = FacetIndex(trials)
+		facets.version = version
+		
+		# count the same way as when filtering
+		overview['intervention_types'] = facets.type_counts()
+		overview['drug_phases'] = facets.phase_counts(facets.types.keys())
+		facets.overview = overview
+		facets.sites = SiteIndex.for_reference(trials, getattr(runner, 'reference_location', None))
+		facets.pins = PinIndex(trials)
+		_run_facets.set(runner.run_id, facets)
+	
+	return facets
+
+def _run_trials_json(ncts, reasons, fields=None):
+	""" Yields the JSON of the given trials in order, with the "reason" the
+	run's filters gave them. Trials are loaded RUN_TRIALS_CHUNK at a time, with
+	only the given fields read. """
+	for start in xrange(0, len(ncts), RUN_TRIALS_CHUNK):
+		chunk = ncts[start:start + RUN_TRIALS_CHUNK]
+		loaded = dict((trial.nct, trial) for trial in retrieve_trials(Trial, _studies_collection(), chunk, fields))
+		for nct in chunk:
+			trial = loaded.get(nct)
+			data = trial.json(fields) if trial is not None else {'nct': nct}
+			geocode_doc(data)
+			if reasons.get(nct):
+				data['reason'] = reasons[nct]
+			yield data
 
 
 @bottle.get('/trial_runs/<run_id>/trials')
 def run_trials(run_id):
 	""" Returns the trials from a given run-id.
 	You can filter the returned trias by supplying 'intv' for intervention
-	types to be included and 'phases' for trial phases to be active """
+	types to be included and 'phases' for trial phases to be active.
+	Supply 'offset' and 'limit' to get one page of trials, the response's
+	'next' is the offset of the next page or null if this was the last.
+	With 'fields' (see `get_trials()`) trials only contain those fields.
+	
+	Distances are measured from the run's "latlng": 'sort=distance' orders
+	trials by their closest site, 'max_km' drops trials without a site that
+	close and 'sites' limits each trial's locations to that many closest
+	ones. Trials then carry their "distance" and "location_count". """
 	
 	# from pycallgraph import PyCallGraph
 	# from pycallgraph.output import GraphvizOutput
 	# with PyCallGraph(output=GraphvizOutput()):
-	runner = Runner.get(run_id)
+	runner = _get_runner(run_id)
 	if runner is None:
 		bottle.abort(404)
 	
@@ -564,19 +873,133 @@ def run_trials(run_id):
 	phases = bottle.request.query.phases
 	phases = phases.split('|') if phases else []
 	reload_phases = bottle.request.query.reload_phases
+	try:
+		offset = int(bottle.request.query.offset or 0)
+		limit = int(bottle.request.query.limit or 0)
+		num_sites = int(bottle.request.query.sites) if bottle.request.query.sites else None
+		max_km = float(bottle.request.query.max_km) if bottle.request.query.max_km else None
+	except ValueError:
+		bottle.abort(400, '"offset", "limit", "sites" and "max_km" must be numbers')
+	if offset < 0 or limit < 0 or (num_sites is not None and num_sites < 0):
+		bottle.abort(400, '"offset", "limit" and "sites" must not be negative')
+	by_distance = 'distance' == bottle.request.query.sort
+	fields = _requested_fields()
+	keep = set(fields + TRIAL_FIELDS_ALWAYS + ['distance', 'location_count']) if fields is not None else None
+	
+	# filtering and counting phases are bit operations on the run's facets,
+	# distances have been computed with them
+	reasons = _run_reasons(runner)
+	facets = _run_facet_index(runner, reasons)
+	sites = facets.sites if (by_distance or max_km is not None or num_sites is not None) else None
+	load_fields = fields + ['location'] if (fields is not None and sites is not None) else fields
+	indices = facets.indices(intv, phases)
+	if sites is not None:
+		if by_distance:
+			indices = sites.sort(indices, max_km)
+		elif max_km is not None:
+			indices = sites.within(indices, max_km)
+	
+	total = len(indices)
+	end = min(total, offset + limit) if limit > 0 else total
+	next_offset = end if end < total else None
+	drug_phases = facets.phase_counts(intv) if reload_phases else None
+	
+	# load and encode a few trials at a time instead of building the whole
+	# JSON string
+	def stream():
+		yield '{"trials": ['
+		page = indices[offset:end]
+		for n, trial in enumerate(_run_trials_json([facets.ncts[i] for i in page], reasons, load_fields)):
+			if sites is not None:
+				trial = sites.nearest(page[n], trial, num_sites)
+			if keep is not None:
+				trial = dict((k, v) for k, v in trial.iteritems() if k in keep)
+			yield (', ' if n > 0 else '') + json.dumps(trial)
+		yield '], "total": %d, "next": %s' % (total, json.dumps(next_offset))
+		if drug_phases is not None:
+			yield ', "drug_phases": %s' % json.dumps(drug_phases)
+		yield '}'
+	
+	bottle.response.content_type = 'application/json'
+	return stream()
+
+
+@bottle.get('/trial_runs/<run_id>/trials/<nct>/sites')
+def run_trial_sites(run_id, nct):
+	""" The sites of one trial of the run, closest to the run's "latlng"
+	first. Supply 'offset' to skip the sites the client already has. """
+	runner = _get_runner(run_id)
+	if runner is None:
+		bottle.abort(404)
 	
-	ret_dict = {
-		'trials': runner.trials_json(intv, phases)
-	}
-	if reload_phases:
-		ret_dict['drug_phases'] = runner.trial_phases(intv)
+	if not runner.done:
+		bottle.abort(400, "Trials are not yet available")
+	
+	try:
+		offset = int(bottle.request.query.offset or 0)
+	except ValueError:
+		bottle.abort(400, '"offset" must be an integer')
+	if offset < 0:
+		bottle.abort(400, '"offset" must not be negative')
+	
+	facets = _run_facet_index(runner)
+	if nct not in facets.ncts:
+		bottle.abort(404)
+	
+	trial = next(_run_trials_json([nct], {}, ['location']))
+	if facets.sites is not None:
+		trial = facets.sites.nearest(facets.ncts.index(nct), trial)
+	locations = trial.get('location') or []
+	return {'location': locations[offset:], 'location_count': len(locations)}
+
+
+@bottle.get('/trial_runs/<run_id>/pins')
+def run_pins(run_id):
+	""" Map pins for the sites of the run's trials, clustered for the map's
+	'zoom' level. Supply 'bbox' as "south,west,north,east", the format of
+	Google Maps' `LatLngBounds.toUrlValue()`, to only get the clusters in the
+	viewport, and 'intv' and 'phases' as for /trials.
+	Clusters have "lat", "lng", the number of sites and trials as "count"
+	and "trials" and either the "sites" or their "bounds". """
+	runner = _get_runner(run_id)
+	if runner is None:
+		bottle.abort(404)
 	
-	return json.dumps(ret_dict)
+	if not runner.done:
+		bottle.abort(400, "Trials are not yet available")
+	
+	intv = bottle.request.query.intv
+	intv = intv.split('|') if intv else []
+	phases = bottle.request.query.phases
+	phases = phases.split('|') if phases else []
+	try:
+		zoom = int(bottle.request.query.zoom or 3)
+		bbox = [float(x) for x in bottle.request.query.bbox.split(',')] if bottle.request.query.bbox else None
+	except ValueError:
+		bottle.abort(400, '"zoom" must be an integer and "bbox" four comma-separated numbers')
+	if bbox is not None and 4 != len(bbox):
+		bottle.abort(400, '"bbox" must be four comma-separated numbers')
+	
+	# the grid of every zoom level is built once per run
+	facets = _run_facet_index(runner)
+	clusters, total = facets.pins.clusters(zoom, facets.mask(intv, phases), bbox)
+	
+	# small clusters list their sites, with the locations of their trials
+	listed = sorted(set([site['nct'] for cluster in clusters for site in cluster.get('sites', [])]))
+	if len(listed) > 0:
+		locations = dict((trial['nct'], trial.get('location') or []) for trial in _run_trials_json(listed, {}, ['location']))
+		for n, cluster in enumerate(clusters):
+			if 'sites' in cluster:
+				cluster = dict(cluster)
+				cluster['sites'] = [{'nct': site['nct'], 'location': locations[site['nct']][site['site']]} for site in cluster['sites'] if site['site'] < len(locations.get(site['nct'], []))]
+				clusters[n] = cluster
+	
+	return {'clusters': clusters, 'total': total}
 
 
 @bottle.get('/trial_runs/<run_id>/filter/<filter_by>')
 def trials_filter_by(run_id, filter_by):
-	runner = Runner.get(run_id)
+	runner = _get_runner(run_id)
 	if runner is None:
 		bottle.abort(404)
 	
@@ -590,36 +1013,22 @@ def trials_filter_by(run_id, filter_by):
 	# demographics - get age and gender
 	if 'demographics' == filter_by:
 		f_gender = run_data.get('gender')
-		f_age = int(run_data.get('age', 0))
+		f_age = int(run_data.get('age') or 0)
 		
-		for tpl in ncts:
-			nct = tpl[0]
-			reason = tpl[1] if len(tpl) > 1 else None
-			
-			if not reason:
-				trial = Trial(nct)
-				trial.load()
-				
-				# filter gender
-				if f_gender:
-					if 'male' == f_gender:
-						if trial.eligibility.gender == 2:
-							reason = "Limited to women"
-					else:
-						if trial.eligibility.gender == 1:
-							reason = "Limited to men"
-				
-				# filter age
-				if f_age > 0:
-					if trial.eligibility.min_age and trial.eligibility.min_age > f_age:
-						reason = "Patient is too young (min age %d)" % trial.eligibility.min_age
-					elif trial.eligibility.max_age and trial.eligibility.max_age < f_age:
-						reason = "Patient is too old (max age %d)" % trial.eligibility.max_age
-			
-			# TODO: REFACTOR into runner class!
-			if reason:
+		# the demographics index is built once per run, filtering again with
+		# other demographics does not need to load any trial
+		index = RunIndex.get(run_id)
+		if index.demographics is None:
+			trials = Trial.retrieve([tpl[0] for tpl in ncts]) if len(ncts) > 0 else []
+			index.demographics = DemographicsIndex.from_trials(trials)
+		
+		# TODO: REFACTOR into runner class!
+		filtered = set([tpl[0] for tpl in ncts if len(tpl) > 1 and tpl[1]])
+		for nct, reason in index.demographics.rejected(f_gender, f_age):
+			if nct not in filtered:
 				runner.write_trial_reason(nct, reason)
 		
+		# write all reasons at once
 		runner.commit_transactions()
 	
 	# problems (only if NLP is on)
@@ -628,7 +1037,6 @@ def trials_filter_by(run_id, filter_by):
 			probs = problems().get('problems', [])
 			
 			# extract snomed codes from patient's problem list
-			snomed = SNOMEDLookup()
 			exclusion_codes = []
 			for problem in probs:
 				snomed_url = problem.get('sp:problemName', {}).get('sp:code', {}).get('@id')
@@ -636,23 +1044,26 @@ def trials_filter_by(run_id, filter_by):
 					snomed_code = os.path.basename(snomed_url)
 					exclusion_codes.append(snomed_code)
 			
-			# look at trial criteria
-			for tpl in ncts:
-				nct = tpl[0]
-				reason = tpl[1] if len(tpl) > 1 else None
-				
-				# if we already have a reason, this trial has already been filtered
-				if not reason:
-					trial = Trial(nct)
-					trial.load()
-					
-					# exclusion criterion matched
-					if trial.filter_snomed(exclusion_codes) is not None:
-						reason = 'Matches exclusion criterium "%s" (SNOMED %s)'  % (snomed.lookup_code_meaning(match, True, True), match)
-						break
-				
-				# TODO: REFACTOR
-				# runner.write_trial_reason(nct, reason)
+			# criteria naming a parent concept of a problem exclude as well
+			if _snomed_tree.available():
+				exclusion_codes = _snomed_tree.expand(exclusion_codes)
+			
+			# the exclusion index is built once per run, matching another
+			# problem list is a set lookup per problem
+			index = RunIndex.get(run_id)
+			if index.exclusions is None:
+				trials = Trial.retrieve([tpl[0] for tpl in ncts]) if len(ncts) > 0 else []
+				index.exclusions = ExclusionIndex.from_trials(trials)
+			
+			filtered = set([tpl[0] for tpl in ncts if len(tpl) > 1 and tpl[1]])
+			matches = [(nct, code) for nct, code in index.exclusions.matches(exclusion_codes) if nct not in filtered]
+			meanings = SNOMEDCodes.shared().lookup_code_meanings([code for nct, code in matches])
+			for nct, code in matches:
+				reason = 'Matches exclusion criterium "%s" (SNOMED %s)' % (meanings.get(code, ''), code)
+				runner.write_trial_reason(nct, reason)
+			
+			# write all reasons at once
+			runner.commit_transactions()
 	
 	# unknown filtering property
 	else:
@@ -685,6 +1096,25 @@ def ejs(ejs_name):
 	return _serve_static('%s.ejs' % ejs_name, 'templates')
 
 
+# ------------------------------------------------------------------------------ Admin
+@bottle.get('/admin/caches')
+def cache_stats():
+	""" Returns size and hit/miss counts of our caches as JSON, only when
+	running with DEBUG. """
+	if not DEBUG:
+		bottle.abort(404)
+	
+	return {
+		'runs': _run_cache.stats(),
+		'run_queue': _run_queue.stats(),
+		'criteria_html': _criteria_html.stats(),
+		'snomed_codes': SNOMEDCodes.shared().stats(),
+		'gazetteer': Gazetteer.shared().stats(),
+		'smart_clients': _smart_clients.stats(),
+		'patient_data': _patient_data.stats()
+	}
+
+
 # ------------------------------------------------------------------------------ MongoDB
 @bottle.get('/mongo')
 def mongotest():
@@ -695,32 +1125,10 @@ def mongotest():
 	
 	return body
 
-def mongodb_uri():
-	""" Determine our MongoDB URI. """
-	
-	# Heroku/MongoHQ
-	if 'MONGOHQ_URL' in os.environ:
-		return os.environ['MONGOHQ_URL']
-	
-	# AppFog
-	services = json.loads(os.getenv("VCAP_SERVICES", "{}"))
-	if services and 'mongodb-1.8' in services:
-		try:
-			return services['mongodb-1.8'][0]['credentials']['url']
-		except Exception as e:
-			logging.error("Failed getting MongoDB credentials: %s" % e)
-	
-	# default
-	return "mongodb://localhost:27017"
-
-
-# remaining setup
-MNGObject.database_uri = mongodb_uri()
-
 
 # start the server
 if '__main__' == __name__:
-	if os.environ.get('DEBUG'):
+	if DEBUG:
 		logging.basicConfig(level=logging.DEBUG)
 		bottle.run(app=app, host='0.0.0.0', port=8008, reloader=True)
 	else: